@@ -0,0 +1 @@
+# Admission package
@@ -0,0 +1,212 @@
+"""
+Admission-control primitives.
+
+TokenBucketLimiter gives every key (tenant) its own token bucket, so one
+customer's bulk script is throttled at its own rate instead of draining
+the shared database pool.
+
+ConcurrencyLimiter caps how many requests run against the database at
+once. Requests that find it full wait in a bounded queue, served by class:
+
+1. PREFERRED - touches a critical/high priority order
+2. WRITE     - POST, PUT, PATCH, DELETE
+3. READ      - everything else
+
+Reads may hold at most read_share of the slots, so writes always find
+headroom, and when the queue overflows the newest waiter of the lowest
+class is shed first: under overload reads go before writes, and writes
+before preferred requests.
+
+Waiters may come from different event loops (TestClient, several
+workers' threads), so state is guarded by a threading.Lock and waiters are
+woken with call_soon_threadsafe.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from app.monitoring.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT
+
+PREFERRED = "preferred"
+WRITE = "write"
+READ = "read"
+
+# Highest first
+REQUEST_CLASSES = (PREFERRED, WRITE, READ)
+
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+EVICTED = "evicted"
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets refilling at `rate` tokens/second up to `burst`."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: str, now: Optional[float] = None) -> float:
+        """
+        Take one token from key's bucket.
+
+        Returns:
+            0 if a token was taken, else seconds until one is available
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                if len(self._buckets) > self.max_keys:
+                    self._prune(now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+    def _prune(self, now: float):
+        # A bucket that has refilled completely is the same as no bucket
+        full_after = self.burst / self.rate
+        for key in [key for key, (_, updated) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
+
+
+class _Waiter:
+    __slots__ = ("request_class", "loop", "future", "outcome")
+
+    def __init__(self, request_class: str, loop: asyncio.AbstractEventLoop):
+        self.request_class = request_class
+        self.loop = loop
+        self.future = loop.create_future()
+        # None while queued, then "admitted" or a rejection reason
+        self.outcome: Optional[str] = None
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class ConcurrencyLimiter:
+    """Global cap on requests in flight, with a class-ordered wait queue."""
+
+    def __init__(self, max_concurrency: int, max_queue: int, read_share: float = 1.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.read_limit = max(1, int(max_concurrency * read_share))
+        self._in_flight = {request_class: 0 for request_class in REQUEST_CLASSES}
+        self._queues = {request_class: deque() for request_class in REQUEST_CLASSES}
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return sum(self._in_flight.values())
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def saturated(self) -> bool:
+        """Whether a new request would have to queue (a hint; not reserved)."""
+        return self.in_flight >= self.max_concurrency or self.queued > 0
+
+    def _can_run(self, request_class: str) -> bool:
+        if self.in_flight >= self.max_concurrency:
+            return False
+        return request_class != READ or self._in_flight[READ] < self.read_limit
+
+    def _queued_ahead(self, request_class: str) -> bool:
+        rank = REQUEST_CLASSES.index(request_class)
+        return any(self._queues[ahead] for ahead in REQUEST_CLASSES[:rank + 1])
+
+    def _start(self, request_class: str):
+        self._in_flight[request_class] += 1
+        ADMISSION_IN_FLIGHT.labels(request_class=request_class).inc()
+
+    def _resolve(self, waiter: _Waiter, outcome: str):
+        waiter.outcome = outcome
+        waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+
+    def _dispatch(self):
+        """Start queued requests, highest class first, while slots are free."""
+        for request_class in REQUEST_CLASSES:
+            queue = self._queues[request_class]
+            while queue and self._can_run(request_class):
+                waiter = queue.popleft()
+                self._start(request_class)
+                self._resolve(waiter, "admitted")
+            ADMISSION_QUEUE_DEPTH.labels(request_class=request_class).set(len(queue))
+
+    def _enqueue(self, waiter: _Waiter) -> bool:
+        """Queue a waiter, shedding a lower-class one if full; False if it was shed itself."""
+        if self.queued >= self.max_queue:
+            rank = REQUEST_CLASSES.index(waiter.request_class)
+            lower = [request_class for request_class in REQUEST_CLASSES[rank + 1:] if self._queues[request_class]]
+            if not lower:
+                return False
+            victim_class = lower[-1]
+            self._resolve(self._queues[victim_class].pop(), EVICTED)
+            ADMISSION_QUEUE_DEPTH.labels(request_class=victim_class).set(len(self._queues[victim_class]))
+        self._queues[waiter.request_class].append(waiter)
+        ADMISSION_QUEUE_DEPTH.labels(request_class=waiter.request_class).set(len(self._queues[waiter.request_class]))
+        return True
+
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """Remove a still-queued waiter; False if it was already admitted or shed."""
+        if waiter.outcome is not None:
+            return False
+        queue = self._queues[waiter.request_class]
+        queue.remove(waiter)
+        ADMISSION_QUEUE_DEPTH.labels(request_class=waiter.request_class).set(len(queue))
+        return True
+
+    async def acquire(self, request_class: str, timeout: float) -> Optional[str]:
+        """
+        Wait up to `timeout` seconds for a slot.
+
+        Returns:
+            None once admitted (call release() when done), else the
+            rejection reason: QUEUE_FULL, QUEUE_TIMEOUT or EVICTED
+        """
+        with self._lock:
+            if not self._queued_ahead(request_class) and self._can_run(request_class):
+                self._start(request_class)
+                ADMISSION_WAIT.labels(request_class=request_class).observe(0)
+                return None
+            waiter = _Waiter(request_class, asyncio.get_running_loop())
+            if not self._enqueue(waiter):
+                return QUEUE_FULL
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait([waiter.future], timeout=timeout)
+        except BaseException:
+            # Cancelled (client went away): give back whatever we were granted
+            with self._lock:
+                if not self._withdraw(waiter) and waiter.outcome == "admitted":
+                    self._in_flight[request_class] -= 1
+                    ADMISSION_IN_FLIGHT.labels(request_class=request_class).dec()
+                    self._dispatch()
+            raise
+
+        with self._lock:
+            if self._withdraw(waiter):
+                return QUEUE_TIMEOUT
+        if waiter.outcome != "admitted":
+            return waiter.outcome
+        ADMISSION_WAIT.labels(request_class=request_class).observe(time.perf_counter() - started)
+        return None
+
+    def release(self, request_class: str):
+        """Free a slot taken by a successful acquire()."""
+        with self._lock:
+            self._in_flight[request_class] -= 1
+            ADMISSION_IN_FLIGHT.labels(request_class=request_class).dec()
+            self._dispatch()
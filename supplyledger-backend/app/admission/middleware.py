@@ -0,0 +1,355 @@
+"""
+Admission control for the database-bound routers.
+
+AdmissionMiddleware is a plain ASGI middleware (like MetricsMiddleware)
+that runs every request under ADMISSION_PATH_PREFIXES through:
+
+1. A per-user token bucket (ADMISSION_USER_RATE requests/second, bursts of
+   ADMISSION_USER_BURST). The bucket belongs to the authenticated user
+   (scope["user"], set by an authentication middleware) when there is one;
+   otherwise to the client address together with the route's user_id
+   (path or query parameter), so nobody can use up another user's limit
+   just by sending their user_id. Behind a reverse proxy listed in
+   ADMISSION_TRUSTED_PROXIES the client address is taken from
+   X-Forwarded-For, so tenants don't share the proxy's bucket. Over the
+   limit: 429.
+2. The global ConcurrencyLimiter (ADMISSION_MAX_CONCURRENCY, sized to the
+   default connection pool of 5 + 10 overflow). Requests that find it full
+   queue for up to ADMISSION_QUEUE_TIMEOUT_SECONDS, reads only for
+   ADMISSION_READ_TIMEOUT_SECONDS; timed out or shed: 503.
+
+Only when a request has to queue is it checked for preferred admission: a
+priority in its JSON body, or the cached priority of the order or
+shipment it names, in ADMISSION_PREFERRED_PRIORITIES. Admission never
+queries the database, since the pool is exhausted exactly when the
+limiter is saturated. A cache miss admits without preference; the
+priority is then looked up in the background after the response, and
+only while fewer than half of the slots are in use.
+
+Rejections carry Retry-After and a FastAPI-style {"detail": ...} body.
+ADMISSION_CONTROL=0 disables the middleware.
+"""
+
+import asyncio
+import ipaddress
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from starlette.routing import Match
+
+from app.admission.limiter import (
+    PREFERRED,
+    READ,
+    WRITE,
+    ConcurrencyLimiter,
+    TokenBucketLimiter
+)
+from app.database.database import ReadSessionLocal
+from app.database.models import Order, Shipment
+from app.monitoring.metrics import ADMISSION_LIMIT, ADMISSION_REJECTIONS
+from app.utils.ids import normalize_order_id
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1").lower() not in ("0", "false", "no")
+ADMISSION_PATH_PREFIXES = tuple(
+    prefix.strip() for prefix in
+    os.getenv("ADMISSION_PATH_PREFIXES", "/orders,/shipments,/users,/analytics,/spatial,/search,/dispatch,/auth").split(",")
+    if prefix.strip()
+)
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "20"))
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "40"))
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "15"))
+ADMISSION_READ_SHARE = float(os.getenv("ADMISSION_READ_SHARE", "0.8"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "2"))
+ADMISSION_READ_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_READ_TIMEOUT_SECONDS", "0.5"))
+ADMISSION_PREFERRED_PRIORITIES = frozenset(
+    priority.strip().lower() for priority in
+    os.getenv("ADMISSION_PREFERRED_PRIORITIES", "critical,high").split(",")
+    if priority.strip()
+)
+ADMISSION_PRIORITY_CACHE_SECONDS = float(os.getenv("ADMISSION_PRIORITY_CACHE_SECONDS", "300"))
+# Proxy addresses or networks whose X-Forwarded-For is believed, e.g. "10.0.0.0/8,127.0.0.1"
+ADMISSION_TRUSTED_PROXIES = tuple(
+    ipaddress.ip_network(proxy.strip(), strict=False) for proxy in
+    os.getenv("ADMISSION_TRUSTED_PROXIES", "").split(",")
+    if proxy.strip()
+)
+
+_READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Request bodies larger than this are not inspected for a priority
+_MAX_INSPECTED_BODY = 64 * 1024
+
+_priority_cache: Dict[Tuple[str, str], Tuple[Optional[str], float]] = {}
+_priority_cache_lock = threading.Lock()
+
+
+def _priority_key(kind: str, key: str) -> Tuple[str, str]:
+    return kind, normalize_order_id(key) if kind == "order" else key
+
+
+def _cached_priority(kind: str, key: str) -> Tuple[bool, Optional[str]]:
+    """(hit, priority) for an order (by order_id) or a shipment's order (by id); never queries."""
+    with _priority_cache_lock:
+        cached = _priority_cache.get(_priority_key(kind, key))
+    if cached is not None and cached[1] > time.monotonic():
+        return True, cached[0]
+    return False, None
+
+
+def _stored_priority(kind: str, key: str) -> Optional[str]:
+    """Look up the priority of an order or of a shipment's order and cache it."""
+    kind, key = _priority_key(kind, key)
+    if kind == "order":
+        statement = select(Order.priority).where(Order.order_id == key)
+    else:
+        statement = (
+            select(Order.priority)
+            .join(Shipment, Shipment.order_id == Order.order_id)
+            .where(Shipment.id == int(key))
+        )
+    with ReadSessionLocal() as db:
+        priority = db.execute(statement).scalar()
+
+    now = time.monotonic()
+    with _priority_cache_lock:
+        # Bounded the same way as the replica stickiness map
+        if len(_priority_cache) > 10000:
+            for stale in [k for k, (_, expires) in _priority_cache.items() if expires <= now]:
+                del _priority_cache[stale]
+        _priority_cache[(kind, key)] = (priority, now + ADMISSION_PRIORITY_CACHE_SECONDS)
+    return priority
+
+
+def _priority_target(path_params: dict) -> Optional[Tuple[str, str]]:
+    """("order", order_id) or ("shipment", shipment_id) named by a request, if any."""
+    if path_params.get("order_id") is not None:
+        return "order", str(path_params["order_id"])
+    if path_params.get("shipment_id") is not None:
+        return "shipment", str(path_params["shipment_id"])
+    return None
+
+
+def _trusted(address: str, trusted_proxies) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def _client_address(scope, trusted_proxies=ADMISSION_TRUSTED_PROXIES) -> Optional[str]:
+    """
+    The caller's address.
+
+    When the peer is a trusted proxy, X-Forwarded-For is read right to
+    left and the first address not itself a trusted proxy is the client;
+    anything further left was supplied by the client and is ignored.
+    """
+    client = scope.get("client")
+    address = client[0] if client else None
+    if address is None or not _trusted(address, trusted_proxies):
+        return address
+
+    forwarded: List[str] = []
+    for name, value in scope.get("headers") or ():
+        if name == b"x-forwarded-for":
+            forwarded.extend(hop.strip() for hop in value.decode("latin-1").split(","))
+    for hop in reversed(forwarded):
+        if not hop:
+            continue
+        if not _trusted(hop, trusted_proxies):
+            return hop
+        address = hop
+    return address
+
+
+def _user_key(scope, path_params: dict, trusted_proxies=ADMISSION_TRUSTED_PROXIES) -> str:
+    """Token bucket key: the authenticated user, else client address plus the claimed user_id."""
+    user = scope.get("user")
+    if user is not None and getattr(user, "is_authenticated", False):
+        return f"user:{user.identity}"
+
+    address = _client_address(scope, trusted_proxies)
+    key = f"client:{address}" if address else "client:unknown"
+    user_id = path_params.get("user_id")
+    if user_id is None:
+        values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("user_id")
+        user_id = values[0] if values else None
+    if user_id is not None:
+        key += f":user:{user_id}"
+    return key
+
+
+async def _read_body(receive):
+    """Read the whole request body; returns it and a receive() that replays it."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            # Client disconnected; let the app see it
+            first = message
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            first = {"type": "http.request", "body": b"".join(chunks), "more_body": False}
+            break
+
+    replayed = False
+
+    async def replay():
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return first
+        return await receive()
+
+    return first.get("body", b""), replay
+
+
+async def _reject(send, status_code: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Per-user rate limits and a global concurrency limit with prioritized shedding."""
+
+    def __init__(
+        self,
+        app,
+        routes=(),
+        path_prefixes=ADMISSION_PATH_PREFIXES,
+        user_rate: float = ADMISSION_USER_RATE,
+        user_burst: float = ADMISSION_USER_BURST,
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+        read_share: float = ADMISSION_READ_SHARE,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        enabled: bool = ADMISSION_CONTROL
+    ):
+        """
+        Args:
+            app: Downstream ASGI app
+            routes: The application's routes, used to find path parameters
+                (user_id, order_id, shipment_id) before routing
+        """
+        self.app = app
+        self.routes = routes
+        self.path_prefixes = tuple(path_prefixes)
+        self.enabled = enabled
+        self.buckets = TokenBucketLimiter(user_rate, user_burst)
+        self.limiter = ConcurrencyLimiter(max_concurrency, max_queue, read_share)
+        self._warming = set()   # background priority lookups, referenced until done
+
+        ADMISSION_LIMIT.labels(limit="user_rate").set(user_rate)
+        ADMISSION_LIMIT.labels(limit="user_burst").set(user_burst)
+        ADMISSION_LIMIT.labels(limit="max_concurrency").set(max_concurrency)
+        ADMISSION_LIMIT.labels(limit="read_concurrency").set(self.limiter.read_limit)
+        ADMISSION_LIMIT.labels(limit="max_queue").set(max_queue)
+
+    def _match(self, scope) -> dict:
+        for route in self.routes:
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return child_scope
+        return {}
+
+    async def _is_preferred(self, scope, path_params: dict, receive):
+        """Whether the request touches a preferred-priority order; also returns the receive to use."""
+        priority = None
+        if scope["method"] not in _READ_METHODS:
+            headers = dict(scope.get("headers") or ())
+            content_length = headers.get(b"content-length", b"")
+            if (headers.get(b"content-type", b"").startswith(b"application/json")
+                    and content_length.isdigit() and int(content_length) <= _MAX_INSPECTED_BODY):
+                body, receive = await _read_body(receive)
+                try:
+                    payload = json.loads(body) if body else None
+                except ValueError:
+                    payload = None
+                if isinstance(payload, dict):
+                    priority = payload.get("priority")
+                    if priority is None and payload.get("order_id") is not None:
+                        path_params = {**path_params, "order_id": payload["order_id"]}
+
+        if priority is None:
+            target = _priority_target(path_params)
+            if target is not None:
+                _, priority = _cached_priority(*target)
+
+        return isinstance(priority, str) and priority.lower() in ADMISSION_PREFERRED_PRIORITIES, receive
+
+    def _warm_priority(self, path_params: dict):
+        """Cache the priority of the order or shipment a request named, if there is spare capacity."""
+        target = _priority_target(path_params)
+        if target is None or _cached_priority(*target)[0]:
+            return
+        if self.limiter.in_flight >= self.limiter.max_concurrency // 2:
+            return
+        task = asyncio.ensure_future(run_in_threadpool(_stored_priority, *target))
+        self._warming.add(task)
+        task.add_done_callback(self._warmed)
+
+    def _warmed(self, task: asyncio.Future):
+        self._warming.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Priority lookup for admission failed: %s", task.exception())
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        child_scope = self._match(scope)
+        path_params = child_scope.get("path_params", {})
+        request_class = READ if scope["method"] in _READ_METHODS else WRITE
+
+        retry_after = self.buckets.try_acquire(_user_key(scope, path_params))
+        if retry_after:
+            await self._reject(scope, child_scope, send, "rate_limited", request_class, 429,
+                               "Rate limit exceeded; slow down", retry_after)
+            return
+
+        if self.limiter.saturated():
+            preferred, receive = await self._is_preferred(scope, path_params, receive)
+            if preferred:
+                request_class = PREFERRED
+
+        timeout = ADMISSION_READ_TIMEOUT_SECONDS if request_class == READ else ADMISSION_QUEUE_TIMEOUT_SECONDS
+        reason = await self.limiter.acquire(request_class, timeout)
+        if reason is not None:
+            await self._reject(scope, child_scope, send, reason, request_class, 503,
+                               "Server is overloaded; retry shortly", timeout)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(request_class)
+        self._warm_priority(path_params)
+
+    async def _reject(self, scope, child_scope, send, reason, request_class, status_code, detail, retry_after):
+        ADMISSION_REJECTIONS.labels(reason=reason, request_class=request_class).inc()
+        # Label the rejection with its route template in request metrics
+        if "route" in child_scope:
+            scope["route"] = child_scope["route"]
+        await _reject(send, status_code, detail, retry_after)
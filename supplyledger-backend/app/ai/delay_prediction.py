@@ -1,14 +1,25 @@
-from app.utils.maps import get_route_data
-from app.utils.weather import get_weather_factor
+from app.utils.maps import ROUTE_SOURCE_LIVE, fetch_route
+from app.utils.weather import WEATHER_SOURCE_LIVE, fetch_weather_factor
 from app.utils.traffic import get_traffic_factor
+from app.routing.speed_profiles import speed_profiles
+from app.utils.singleflight import SingleFlight
 
+# Route source when distance, base time and traffic come from a learned lane profile
+ROUTE_SOURCE_PROFILE = "speed_profile"
 
-def predict_delay(source_coords, dest_coords, destination_city):
+_predictions_in_flight = SingleFlight("predict_delay")
+
+
+def predict_delay(source_coords, dest_coords, destination_city, source_city=None, departure=None):
     """
     Predict shipment delay using real-time data from maps, traffic, and weather APIs.
+
+    Lanes with a learned speed profile take distance, base time and the
+    hour-of-week traffic factor from memory; only lanes without enough
+    history call the routing API.
     
     Formula:
-        Base Time = Expected travel duration from map API
+        Base Time = Expected travel duration from map API (or lane profile)
         Traffic Delay = Base Time × Traffic Factor
         Weather Delay = Base Time × Weather Factor
         Total Delay = Traffic Delay + Weather Delay
@@ -17,19 +28,43 @@ def predict_delay(source_coords, dest_coords, destination_city):
         source_coords: [longitude, latitude] of source location
         dest_coords: [longitude, latitude] of destination location
         destination_city: Destination city name (string) for weather lookup
+        source_city: Source city name, used to find the lane's speed profile
+        departure: Time the traffic factor applies to (defaults to now, UTC)
     
     Returns:
-        dict: Comprehensive delay prediction with breakdown
+        dict: Comprehensive delay prediction with breakdown. When a provider
+        was unavailable (error or open circuit breaker) its local fallback is
+        listed under "fallbacks" and reflected in "data_source".
+        Concurrent identical calls share one computation and result.
     """
+    key = (
+        tuple(source_coords or ()),
+        tuple(dest_coords or ()),
+        destination_city,
+        source_city,
+        departure,
+    )
+    return _predictions_in_flight.do(
+        key, _predict_delay, source_coords, dest_coords, destination_city, source_city, departure
+    )
+
+
+def _predict_delay(source_coords, dest_coords, destination_city, source_city, departure):
     try:
-        # STEP 1: Get real route distance and expected duration from maps API
-        distance_km, duration_min = get_route_data(source_coords, dest_coords)
+        profile = speed_profiles.lookup(source_city, destination_city, departure) if source_city else None
+        if profile:
+            # STEP 1+2: Lane profile gives distance, base time and traffic factor
+            distance_km, duration_min, traffic_factor = profile
+            route_source = ROUTE_SOURCE_PROFILE
+        else:
+            # STEP 1: Get real route distance and expected duration from maps API
+            distance_km, duration_min, route_source = fetch_route(source_coords, dest_coords)
 
-        # STEP 2: Calculate traffic congestion factor
-        traffic_factor = get_traffic_factor(distance_km, duration_min)
+            # STEP 2: Calculate traffic congestion factor
+            traffic_factor = get_traffic_factor(distance_km, duration_min)
 
         # STEP 3: Get weather conditions and convert to delay factor
-        weather_factor = get_weather_factor(destination_city)
+        weather_factor, weather_source = fetch_weather_factor(destination_city)
 
         # STEP 4: Calculate delays
         base_time = duration_min
@@ -45,6 +80,19 @@ def predict_delay(source_coords, dest_coords, destination_city):
         else:
             risk = "LOW"
 
+        fallbacks = []
+        if route_source not in (ROUTE_SOURCE_LIVE, ROUTE_SOURCE_PROFILE):
+            fallbacks.append(route_source)
+        if weather_source != WEATHER_SOURCE_LIVE:
+            fallbacks.append(weather_source)
+
+        if fallbacks:
+            data_source = f"Fallback ({', '.join(fallbacks)})"
+        elif route_source == ROUTE_SOURCE_PROFILE:
+            data_source = "Lane speed profile + Weather API"
+        else:
+            data_source = "Live (Maps API + Weather API)"
+
         return {
             "distance_km": round(distance_km, 2),
             "base_time_min": round(base_time, 2),
@@ -54,7 +102,10 @@ def predict_delay(source_coords, dest_coords, destination_city):
             "weather_delay_min": round(weather_delay, 2),
             "total_delay_min": round(total_delay, 2),
             "risk_level": risk,
-            "data_source": "Live (Maps API + Weather API)"
+            "data_source": data_source,
+            "route_source": route_source,
+            "weather_source": weather_source,
+            "fallbacks": fallbacks
         }
     
     except Exception as e:
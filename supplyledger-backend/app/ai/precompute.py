@@ -0,0 +1,199 @@
+"""
+Background precomputation of shipment delay predictions.
+
+A periodic worker walks every shipment that has not been delivered,
+runs predict_delay() for it and upserts the result into
+shipment_predictions. The predict-delay endpoint then serves the stored
+row while it is younger than PREDICTION_MAX_AGE_SECONDS, so a read is a
+single indexed lookup instead of two provider calls.
+
+Shipments archived while a batch is being predicted are skipped when
+the batch is stored, and each run ends by deleting predictions whose
+shipment is gone, so archival (which deletes a shipment's prediction
+with it) never leaves orphan rows behind.
+
+When several API processes run the worker, a PostgreSQL advisory lock
+makes sure only one of them refreshes at a time; the others skip the run.
+
+Usage:
+    python -m app.ai.precompute           # refresh once and exit
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import delete, exists, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.ai.delay_prediction import predict_delay
+from app.database.database import SessionLocal
+from app.database.locks import PREDICTION_LOCK_KEY, advisory_lock
+from app.database.models import Shipment, ShipmentPrediction
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_REFRESH_SECONDS = float(os.getenv("PREDICTION_REFRESH_SECONDS", "900"))
+PREDICTION_MAX_AGE_SECONDS = float(os.getenv("PREDICTION_MAX_AGE_SECONDS", "1800"))
+PREDICTION_BATCH_SIZE = int(os.getenv("PREDICTION_BATCH_SIZE", "200"))
+
+
+def is_fresh(computed_at: Optional[datetime], max_age_seconds: float = PREDICTION_MAX_AGE_SECONDS) -> bool:
+    """Whether a stored prediction is recent enough to serve."""
+    if computed_at is None:
+        return False
+    return datetime.utcnow() - computed_at <= timedelta(seconds=max_age_seconds)
+
+
+def store_predictions(connection, rows: Iterable[Dict[str, Any]]):
+    """
+    Insert or replace stored predictions.
+
+    Args:
+        connection: SQLAlchemy Connection inside the caller's transaction
+        rows: [{"shipment_id", "prediction", "computed_at"}]
+    """
+    rows = list(rows)
+    if not rows:
+        return
+
+    table = ShipmentPrediction.__table__
+    dialect = connection.dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        insert = pg_insert if dialect == "postgresql" else sqlite_insert
+        statement = insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=["shipment_id"],
+            set_={
+                "prediction": statement.excluded.prediction,
+                "computed_at": statement.excluded.computed_at,
+            }
+        )
+        connection.execute(statement)
+        return
+
+    for row in rows:
+        result = connection.execute(
+            table.update()
+            .where(table.c.shipment_id == row["shipment_id"])
+            .values(prediction=row["prediction"], computed_at=row["computed_at"])
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+def _active_shipments_after(last_id: int, limit: int):
+    return (
+        select(Shipment.id, Shipment.source_coords, Shipment.dest_coords, Shipment.source, Shipment.destination)
+        .where(
+            Shipment.id > last_id,
+            or_(Shipment.status.is_(None), Shipment.status != "DELIVERED"),
+            Shipment.source_coords.is_not(None),
+            Shipment.dest_coords.is_not(None),
+        )
+        .order_by(Shipment.id)
+        .limit(limit)
+    )
+
+
+def _still_present(db, rows: list) -> list:
+    """Rows whose shipment still exists (not archived since the batch was read)."""
+    if not rows:
+        return rows
+    present = set(db.scalars(select(Shipment.id).where(Shipment.id.in_([row["shipment_id"] for row in rows]))))
+    return [row for row in rows if row["shipment_id"] in present]
+
+
+def delete_orphan_predictions(db) -> int:
+    """Delete stored predictions whose shipment no longer exists; returns the count."""
+    return db.execute(
+        delete(ShipmentPrediction).where(~exists().where(Shipment.id == ShipmentPrediction.shipment_id))
+    ).rowcount
+
+
+def _refresh_all(session_factory, batch_size: int) -> int:
+    refreshed = 0
+    last_id = 0
+    # Shipments on the same lane share one provider round-trip per run
+    lane_predictions: Dict[tuple, Dict[str, Any]] = {}
+
+    while True:
+        db = session_factory()
+        try:
+            batch = db.execute(_active_shipments_after(last_id, batch_size)).all()
+        finally:
+            db.close()
+        if not batch:
+            break
+
+        # Provider calls happen outside any transaction
+        rows = []
+        for shipment_id, source_coords, dest_coords, source, destination in batch:
+            lane = (tuple(source_coords), tuple(dest_coords), source, destination)
+            if lane not in lane_predictions:
+                lane_predictions[lane] = predict_delay(source_coords, dest_coords, destination, source_city=source)
+            prediction = lane_predictions[lane]
+            if "error" in prediction:
+                continue
+            rows.append({"shipment_id": shipment_id, "prediction": prediction, "computed_at": datetime.utcnow()})
+
+        db = session_factory()
+        try:
+            rows = _still_present(db, rows)
+            store_predictions(db.connection(), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        refreshed += len(rows)
+        last_id = batch[-1][0]
+
+    # Catches shipments archived between the check above and the commit
+    db = session_factory()
+    try:
+        orphans = delete_orphan_predictions(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    if orphans:
+        logger.info("Deleted %d predictions of archived shipments", orphans)
+    return refreshed
+
+
+def refresh_predictions(session_factory=SessionLocal, batch_size: int = PREDICTION_BATCH_SIZE) -> int:
+    """
+    Recompute and store predictions for all non-delivered shipments.
+
+    Args:
+        session_factory: Session factory (one short session per batch)
+        batch_size: Shipments read and written per batch
+
+    Returns:
+        Number of predictions stored (0 if another worker holds the lock)
+    """
+    with session_factory() as db:
+        bind = db.get_bind()
+
+    with advisory_lock(bind, PREDICTION_LOCK_KEY) as acquired:
+        if not acquired:
+            logger.info("Prediction refresh already running elsewhere; skipping")
+            return 0
+        refreshed = _refresh_all(session_factory, batch_size)
+
+    logger.info("Refreshed %d shipment delay predictions", refreshed)
+    return refreshed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    stored = refresh_predictions()
+    print(f"✅ Stored {stored} delay predictions")
@@ -1,29 +1,87 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from app.database.database import get_db
+from datetime import date, datetime, timedelta
+from typing import Optional
+from app.database.database import get_read_db
 from app.database.models import Order, OrderAnalytics
 from app.schemas import OrderAnalyticsResponse, DashboardStats
+from app.analytics.rollups import fetch_daily_rollups, fetch_user_totals
+from app.analytics.lanes import LANE_STREAMS, ORDER_LANES, lane_tracker
 
 router = APIRouter()
 
+TIMESERIES_GRANULARITIES = ("day", "week", "month")
+TIMESERIES_GROUPINGS = ("status", "priority")
+DEFAULT_TIMESERIES_DAYS = 30
+
+
+def _period_start(day: date, granularity: str) -> date:
+    """First day of the bucket a day falls into (weeks start on Monday)."""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _count(totals: dict, key: str) -> int:
+    """Order count for one status/priority from fetch_user_totals()."""
+    return totals.get(key, (0, 0.0, 0.0))[0]
+
+
+@router.get("/lanes/top")
+def get_top_lanes(k: int = 10, stream: str = ORDER_LANES):
+    """
+    Get the busiest origin→destination lanes across all users.
+
+    Answered from in-memory heavy-hitter and count-min sketches (kept in
+    sync with the checkpoint in lane_sketches), without scanning orders.
+    Counts are upper bounds; max_overcount bounds the error per lane.
+    """
+    if stream not in LANE_STREAMS:
+        raise HTTPException(status_code=400, detail=f"stream must be one of: {', '.join(LANE_STREAMS)}")
+    if k < 1:
+        raise HTTPException(status_code=400, detail="k must be at least 1")
+
+    return {
+        "stream": stream,
+        "total": lane_tracker.total(stream),
+        "lanes": lane_tracker.top(stream, k)
+    }
+
+
+@router.get("/lanes/estimate")
+def get_lane_estimate(origin: str, destination: str, stream: str = ORDER_LANES):
+    """Estimate how many orders (or shipments) used one lane (count-min upper bound)"""
+    if stream not in LANE_STREAMS:
+        raise HTTPException(status_code=400, detail=f"stream must be one of: {', '.join(LANE_STREAMS)}")
+
+    return {
+        "stream": stream,
+        "origin": origin,
+        "destination": destination,
+        "count": lane_tracker.estimate(stream, origin, destination)
+    }
+
 
 @router.get("/dashboard/{user_id}", response_model=DashboardStats)
-def get_dashboard_stats(user_id: int, db: Session = Depends(get_db)):
+def get_dashboard_stats(user_id: int, db: Session = Depends(get_read_db)):
     """Get dashboard statistics for a user"""
-    orders = db.query(Order).filter(Order.user_id == user_id).all()
+    totals = fetch_user_totals(db, user_id, "status")
     
     stats = {
-        "total_shipments": len(orders),
-        "in_transit": len([o for o in orders if o.status == "In Transit"]),
-        "delivered": len([o for o in orders if o.status == "Delivered"]),
-        "pending": len([o for o in orders if o.status == "Pending"])
+        "total_shipments": sum(count for count, _, _ in totals.values()),
+        "in_transit": _count(totals, "In Transit"),
+        "delivered": _count(totals, "Delivered"),
+        "pending": _count(totals, "Pending")
     }
     
     return stats
 
 
 @router.get("/user-analytics/{user_id}", response_model=OrderAnalyticsResponse)
-def get_user_analytics(user_id: int, db: Session = Depends(get_db)):
+def get_user_analytics(user_id: int, db: Session = Depends(get_read_db)):
     """Get detailed analytics for a user"""
     analytics = db.query(OrderAnalytics).filter(OrderAnalytics.user_id == user_id).first()
     
@@ -34,44 +92,48 @@ def get_user_analytics(user_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/order-status-breakdown/{user_id}")
-def get_status_breakdown(user_id: int, db: Session = Depends(get_db)):
+def get_status_breakdown(user_id: int, db: Session = Depends(get_read_db)):
     """Get order status breakdown"""
-    orders = db.query(Order).filter(Order.user_id == user_id).all()
+    totals = fetch_user_totals(db, user_id, "status")
     
     breakdown = {
-        "delivered": len([o for o in orders if o.status == "Delivered"]),
-        "in_transit": len([o for o in orders if o.status == "In Transit"]),
-        "pending": len([o for o in orders if o.status == "Pending"])
+        "delivered": _count(totals, "Delivered"),
+        "in_transit": _count(totals, "In Transit"),
+        "pending": _count(totals, "Pending")
     }
     
     return breakdown
 
 
 @router.get("/priority-breakdown/{user_id}")
-def get_priority_breakdown(user_id: int, db: Session = Depends(get_db)):
+def get_priority_breakdown(user_id: int, db: Session = Depends(get_read_db)):
     """Get priority level breakdown"""
-    orders = db.query(Order).filter(Order.user_id == user_id).all()
+    totals = fetch_user_totals(db, user_id, "priority")
     
     breakdown = {
-        "critical": len([o for o in orders if o.priority == "critical"]),
-        "high": len([o for o in orders if o.priority == "high"]),
-        "medium": len([o for o in orders if o.priority == "medium"]),
-        "low": len([o for o in orders if o.priority == "low"])
+        "critical": _count(totals, "critical"),
+        "high": _count(totals, "high"),
+        "medium": _count(totals, "medium"),
+        "low": _count(totals, "low")
     }
     
     return breakdown
 
 
 @router.get("/destination-breakdown/{user_id}")
-def get_destination_breakdown(user_id: int, db: Session = Depends(get_db)):
-    """Get top destinations by order count"""
-    orders = db.query(Order).filter(Order.user_id == user_id).all()
-    
-    destinations = {}
-    for order in orders:
-        if order.destination not in destinations:
-            destinations[order.destination] = 0
-        destinations[order.destination] += 1
+def get_destination_breakdown(user_id: int, db: Session = Depends(get_read_db)):
+    """
+    Get top destinations by order count (counted in the database).
+
+    Only active orders are counted: archived ones no longer shape where a
+    user ships today, and the archive is not read on the dashboard path.
+    """
+    counts = (
+        db.query(Order.destination, func.count(Order.id))
+        .filter(Order.user_id == user_id)
+        .group_by(Order.destination)
+    )
+    destinations = dict(counts.all())
     
     # Sort and return top 5
     sorted_destinations = sorted(destinations.items(), key=lambda x: x[1], reverse=True)[:5]
@@ -85,15 +147,77 @@ def get_destination_breakdown(user_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/value-metrics/{user_id}")
-def get_value_metrics(user_id: int, db: Session = Depends(get_db)):
+def get_value_metrics(user_id: int, db: Session = Depends(get_read_db)):
     """Get shipment value metrics"""
-    orders = db.query(Order).filter(Order.user_id == user_id).all()
+    totals = fetch_user_totals(db, user_id, "status")
     
-    total_value = sum(o.value for o in orders)
-    avg_value = total_value / len(orders) if orders else 0
+    total_orders = sum(count for count, _, _ in totals.values())
+    total_value = sum(value for _, _, value in totals.values())
+    avg_value = total_value / total_orders if total_orders else 0
     
     return {
         "total_value": total_value,
         "average_value": avg_value,
-        "total_orders": len(orders)
+        "total_orders": total_orders
+    }
+
+
+@router.get("/timeseries/{user_id}")
+def get_order_timeseries(
+    user_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: str = "day",
+    group_by: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get order count, weight and value per day, week or month.
+
+    Reads the daily rollup table, so a year of history touches at most
+    365 days per user. Defaults to the last 30 days. Optionally split
+    each period by status or priority.
+    """
+    if granularity not in TIMESERIES_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of: {', '.join(TIMESERIES_GRANULARITIES)}")
+    if group_by and group_by not in TIMESERIES_GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(TIMESERIES_GROUPINGS)}")
+
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=DEFAULT_TIMESERIES_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    buckets = {}
+    for row in fetch_daily_rollups(db, user_id, start, end, group_by):
+        day = row[0]
+        if isinstance(day, str):
+            day = date.fromisoformat(day)
+        dimension = row[1] if group_by else None
+        orders, weight, value = row[-3:]
+
+        key = (_period_start(day, granularity), dimension)
+        bucket = buckets.setdefault(key, {"orders": 0, "weight": 0.0, "value": 0.0})
+        bucket["orders"] += orders or 0
+        bucket["weight"] += weight or 0
+        bucket["value"] += value or 0
+
+    series = []
+    for (period, dimension), totals in sorted(buckets.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+        if not totals["orders"]:
+            # Keys whose orders all moved on (status change, delete) net out to zero
+            continue
+        point = {"period": period.isoformat()}
+        if group_by:
+            point[group_by] = dimension
+        point.update(totals)
+        series.append(point)
+
+    return {
+        "user_id": user_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "granularity": granularity,
+        "group_by": group_by,
+        "series": series
     }
@@ -0,0 +1,406 @@
+"""
+Global lane analytics with streaming sketches.
+
+Every committed order and shipment adds its origin→destination lane to two
+sketches per stream ("orders", "shipments"):
+1. Count-min sketch — bounded-error frequency estimate for any lane
+2. Space-saving summary — the candidate heavy-hitter lanes
+
+Each process counts into a pending delta and periodically merges it into
+the checkpoint row in lane_sketches (row-locked), so several workers can
+share one global view. Top-K queries never scan the orders table.
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.database.models import ArchivedOrder, ArchivedShipment, LaneSketch, Order, Shipment
+from app.utils.city_coords import normalize_city_name
+
+logger = logging.getLogger(__name__)
+
+ORDER_LANES = "orders"
+SHIPMENT_LANES = "shipments"
+LANE_STREAMS = (ORDER_LANES, SHIPMENT_LANES)
+
+CMS_WIDTH = int(os.getenv("LANE_SKETCH_WIDTH", "2048"))
+CMS_DEPTH = int(os.getenv("LANE_SKETCH_DEPTH", "4"))
+HEAVY_HITTER_CAPACITY = int(os.getenv("LANE_HEAVY_HITTERS", "256"))
+LANE_CHECKPOINT_SECONDS = float(os.getenv("LANE_CHECKPOINT_SECONDS", "60"))
+
+_LANE_SEPARATOR = "|"
+
+
+def lane_key(origin: str, destination: str) -> str:
+    """Normalized lane key, e.g. "mumbai|delhi"."""
+    return f"{normalize_city_name(origin)}{_LANE_SEPARATOR}{normalize_city_name(destination)}"
+
+
+def split_lane_key(key: str) -> Tuple[str, str]:
+    origin, _, destination = key.partition(_LANE_SEPARATOR)
+    return origin, destination
+
+
+class CountMinSketch:
+    """Count-min sketch with double hashing over a 128-bit BLAKE2b digest."""
+
+    def __init__(self, width: int = CMS_WIDTH, depth: int = CMS_DEPTH, table: Optional[List[List[int]]] = None):
+        self.width = width
+        self.depth = depth
+        self.table = table or [[0] * width for _ in range(depth)]
+
+    def _indexes(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, key: str, count: int = 1):
+        for row, index in enumerate(self._indexes(key)):
+            self.table[row][index] += count
+
+    def estimate(self, key: str) -> int:
+        return min(self.table[row][index] for row, index in enumerate(self._indexes(key)))
+
+    def merge(self, other: "CountMinSketch"):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Cannot merge count-min sketches of different shapes")
+        for row, other_row in zip(self.table, other.table):
+            for index, value in enumerate(other_row):
+                if value:
+                    row[index] += value
+
+    def to_dict(self) -> dict:
+        return {"width": self.width, "depth": self.depth, "table": self.table}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CountMinSketch":
+        return cls(data["width"], data["depth"], [list(row) for row in data["table"]])
+
+
+class SpaceSaving:
+    """Space-saving heavy-hitter summary: key -> [count, overestimate]."""
+
+    def __init__(self, capacity: int = HEAVY_HITTER_CAPACITY, counters: Optional[Dict[str, List[int]]] = None):
+        self.capacity = capacity
+        self.counters: Dict[str, List[int]] = counters or {}
+
+    def add(self, key: str, count: int = 1):
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += count
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[key] = [count, 0]
+            return
+        # Replace the smallest counter; its count becomes the new key's error bound
+        victim = min(self.counters, key=lambda k: self.counters[k][0])
+        floor = self.counters.pop(victim)[0]
+        self.counters[key] = [floor + count, floor]
+
+    def _floor(self) -> int:
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(counter[0] for counter in self.counters.values())
+
+    def merge(self, other: "SpaceSaving"):
+        own_floor, other_floor = self._floor(), other._floor()
+        merged = {}
+        for key in set(self.counters) | set(other.counters):
+            own = self.counters.get(key, [own_floor, own_floor])
+            theirs = other.counters.get(key, [other_floor, other_floor])
+            merged[key] = [own[0] + theirs[0], own[1] + theirs[1]]
+        keep = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)[:self.capacity]
+        self.counters = dict(keep)
+
+    def top(self, k: int) -> List[Tuple[str, int, int]]:
+        ranked = sorted(self.counters.items(), key=lambda item: item[1][0], reverse=True)[:k]
+        return [(key, count, error) for key, (count, error) in ranked]
+
+    def to_dict(self) -> dict:
+        return {"capacity": self.capacity, "counters": self.counters}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SpaceSaving":
+        return cls(data["capacity"], {key: list(value) for key, value in data["counters"].items()})
+
+
+class LaneSummary:
+    """Count-min sketch plus heavy-hitter summary for one lane stream."""
+
+    def __init__(self, sketch: Optional[CountMinSketch] = None, heavy_hitters: Optional[SpaceSaving] = None, total: int = 0):
+        self.sketch = sketch or CountMinSketch()
+        self.heavy_hitters = heavy_hitters or SpaceSaving()
+        self.total = total
+
+    def add(self, key: str, count: int = 1):
+        self.sketch.add(key, count)
+        self.heavy_hitters.add(key, count)
+        self.total += count
+
+    def merge(self, other: "LaneSummary"):
+        self.sketch.merge(other.sketch)
+        self.heavy_hitters.merge(other.heavy_hitters)
+        self.total += other.total
+
+    def to_dict(self) -> dict:
+        return {"sketch": self.sketch.to_dict(), "heavy_hitters": self.heavy_hitters.to_dict(), "total": self.total}
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "LaneSummary":
+        if not data:
+            return cls()
+        return cls(
+            CountMinSketch.from_dict(data["sketch"]),
+            SpaceSaving.from_dict(data["heavy_hitters"]),
+            data.get("total", 0)
+        )
+
+
+class LaneTracker:
+    """
+    Process-wide lane sketches.
+
+    `merged` mirrors the last checkpoint read from the database; `pending`
+    holds lanes counted by this process since then. Reads combine both.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self.merged: Dict[str, LaneSummary] = {stream: LaneSummary() for stream in LANE_STREAMS}
+        self.pending: Dict[str, LaneSummary] = {stream: LaneSummary() for stream in LANE_STREAMS}
+
+    def record(self, stream: str, origin: str, destination: str, count: int = 1):
+        self.record_counts(stream, {(origin, destination): count})
+
+    def record_many(self, stream: str, lanes: Iterable[Tuple[str, str]]):
+        counts: Dict[Tuple[str, str], int] = {}
+        for lane in lanes:
+            counts[lane] = counts.get(lane, 0) + 1
+        self.record_counts(stream, counts)
+
+    def record_counts(self, stream: str, counts: Dict[Tuple[str, str], int]):
+        """Add {(origin, destination): count} to this process's pending sketch."""
+        with self._lock:
+            summary = self.pending[stream]
+            for (origin, destination), count in counts.items():
+                if origin and destination and count:
+                    summary.add(lane_key(origin, destination), count)
+
+    def estimate(self, stream: str, origin: str, destination: str) -> int:
+        key = lane_key(origin, destination)
+        with self._lock:
+            return self.merged[stream].sketch.estimate(key) + self.pending[stream].sketch.estimate(key)
+
+    def total(self, stream: str) -> int:
+        with self._lock:
+            return self.merged[stream].total + self.pending[stream].total
+
+    def top(self, stream: str, k: int = 10) -> List[dict]:
+        """
+        Top-k lanes for a stream.
+
+        Candidates come from the heavy-hitter summaries; each count is the
+        tighter of the space-saving and count-min overestimates.
+        """
+        with self._lock:
+            candidates = SpaceSaving(HEAVY_HITTER_CAPACITY, {
+                key: list(value) for key, value in self.merged[stream].heavy_hitters.counters.items()
+            })
+            candidates.merge(self.pending[stream].heavy_hitters)
+            ranked = []
+            for key, count, error in candidates.top(len(candidates.counters)):
+                sketch_estimate = self.merged[stream].sketch.estimate(key) + self.pending[stream].sketch.estimate(key)
+                ranked.append((key, min(count, sketch_estimate), error))
+
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        lanes = []
+        for key, count, error in ranked[:k]:
+            origin, destination = split_lane_key(key)
+            lanes.append({"origin": origin, "destination": destination, "count": count, "max_overcount": error})
+        return lanes
+
+    def load(self, session_factory=SessionLocal):
+        """Replace the merged view with the latest checkpoints."""
+        db = session_factory()
+        try:
+            rows = {row.name: row for row in db.query(LaneSketch).all()}
+        finally:
+            db.close()
+
+        with self._lock:
+            for stream in LANE_STREAMS:
+                row = rows.get(stream)
+                self.merged[stream] = LaneSummary.from_dict(row.state if row else None)
+
+    def checkpoint(self, session_factory=SessionLocal):
+        """
+        Merge this process's pending counts into the shared checkpoint rows.
+
+        The checkpoint row is locked while merging so concurrent workers
+        don't overwrite each other. On failure, pending counts are kept.
+        """
+        with self._checkpoint_lock:
+            with self._lock:
+                has_pending = any(summary.total for summary in self.pending.values())
+            if not has_pending:
+                # Nothing to write; just pick up other workers' checkpoints
+                self.load(session_factory)
+                return
+
+            with self._lock:
+                flushing = self.pending
+                self.pending = {stream: LaneSummary() for stream in LANE_STREAMS}
+
+            db = session_factory()
+            try:
+                refreshed = {}
+                for stream in LANE_STREAMS:
+                    row = db.query(LaneSketch).filter(LaneSketch.name == stream).with_for_update().first()
+                    summary = LaneSummary.from_dict(row.state if row else None)
+                    summary.merge(flushing[stream])
+                    if row is None:
+                        row = LaneSketch(name=stream)
+                        db.add(row)
+                    row.state = summary.to_dict()
+                    row.total = summary.total
+                    row.updated_at = datetime.utcnow()
+                    refreshed[stream] = summary
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    for stream in LANE_STREAMS:
+                        flushing[stream].merge(self.pending[stream])
+                    self.pending = flushing
+                raise
+            finally:
+                db.close()
+
+            with self._lock:
+                self.merged = refreshed
+
+
+lane_tracker = LaneTracker()
+
+
+# ---------------------------------------------------------------------------
+# Session hooks: count lanes of inserted orders and shipments once committed
+# ---------------------------------------------------------------------------
+
+# Pending lanes are tagged with the savepoint they were written in (None
+# outside one), so rolling a savepoint back drops just its lanes.
+
+def _pending(session: Session) -> list:
+    """[(savepoint, stream, {(origin, destination): count})] awaiting commit."""
+    return session.info.setdefault("new_lanes", [])
+
+
+def _within(transaction, savepoint) -> bool:
+    while transaction is not None:
+        if transaction is savepoint:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_new_lanes(session: Session, flush_context):
+    counts = {ORDER_LANES: defaultdict(int), SHIPMENT_LANES: defaultdict(int)}
+    for instance in session.new:
+        if isinstance(instance, Order):
+            counts[ORDER_LANES][(instance.origin, instance.destination)] += 1
+        elif isinstance(instance, Shipment):
+            counts[SHIPMENT_LANES][(instance.source, instance.destination)] += 1
+    savepoint = session.get_nested_transaction()
+    _pending(session).extend((savepoint, stream, dict(lanes)) for stream, lanes in counts.items() if lanes)
+
+
+def record_lane_counts_on_commit(session: Session, stream: str, counts: Dict[Tuple[str, str], int]):
+    """Count lanes of rows written outside the ORM (bulk import) once the session commits."""
+    _pending(session).append((session.get_nested_transaction(), stream, counts))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _record_committed_lanes(session: Session):
+    if session.in_nested_transaction():
+        # A released savepoint; its lanes wait for the outer commit
+        return
+    for _, stream, counts in session.info.pop("new_lanes", ()):
+        lane_tracker.record_counts(stream, counts)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_lanes(session: Session, previous_transaction):
+    # after_rollback also fires for savepoints, so it can't tell which lanes to keep
+    if "new_lanes" not in session.info:
+        return
+    if previous_transaction.nested:
+        session.info["new_lanes"] = [
+            entry for entry in session.info["new_lanes"]
+            if not _within(entry[0], previous_transaction)
+        ]
+    elif previous_transaction.parent is None:
+        session.info.pop("new_lanes", None)
+
+
+def rebuild_lane_sketches(db: Session) -> Dict[str, int]:
+    """
+    Rebuild both checkpoints from the orders and shipments tables, archive included (backfill).
+
+    Returns:
+        {stream: total lanes counted}
+    """
+    sources = {
+        ORDER_LANES: [
+            select(model.origin, model.destination, func.count(model.id)).group_by(model.origin, model.destination)
+            for model in (Order, ArchivedOrder)
+        ],
+        SHIPMENT_LANES: [
+            select(model.source, model.destination, func.count(model.id)).group_by(model.source, model.destination)
+            for model in (Shipment, ArchivedShipment)
+        ],
+    }
+
+    totals = {}
+    for stream, statements in sources.items():
+        summary = LaneSummary()
+        for statement in statements:
+            for origin, destination, count in db.execute(statement):
+                if origin and destination:
+                    summary.add(lane_key(origin, destination), count)
+
+        row = db.query(LaneSketch).filter(LaneSketch.name == stream).with_for_update().first()
+        if row is None:
+            row = LaneSketch(name=stream)
+            db.add(row)
+        row.state = summary.to_dict()
+        row.total = summary.total
+        row.updated_at = datetime.utcnow()
+        totals[stream] = summary.total
+
+    db.commit()
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild lane sketches from the orders and shipments tables")
+    parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        counted = rebuild_lane_sketches(session)
+    finally:
+        session.close()
+    print(f"✅ Rebuilt lane sketches: {counted}")
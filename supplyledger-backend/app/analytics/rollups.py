@@ -0,0 +1,355 @@
+"""
+Daily order rollups.
+
+One row per (user_id, day, status, priority) holding the order count and
+weight/value sums. Rows are kept current incrementally:
+1. ORM writes — an after_flush hook turns inserted, updated and deleted
+   orders into +/- deltas against the affected keys
+2. Bulk writes — callers that bypass the ORM pass their rows to
+   record_new_orders() (COPY, Core INSERTs) or record_status_change()
+   (Core UPDATEs, e.g. dispatch)
+
+Time-range analytics read these rows instead of scanning orders, so a
+year of history is at most 365 days per user. Archiving moves orders
+with Core statements, which the hook does not see, so rollups keep
+counting archived orders.
+
+Orders written before the rollup table existed are only counted once
+the rollups are rebuilt: the API does this on startup when the table is
+empty, and `python -m app.analytics.rollups` repairs it at any time.
+"""
+
+import argparse
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, attributes
+
+from app.database.database import SessionLocal
+from app.database.locks import ROLLUP_BACKFILL_LOCK_KEY, advisory_lock
+from app.database.models import ArchivedOrder, Order, OrderDailyRollup
+
+logger = logging.getLogger(__name__)
+
+# (user_id, day, status, priority)
+RollupKey = Tuple[int, date, str, str]
+
+# Order attributes that feed a rollup row
+TRACKED_ATTRIBUTES = ("user_id", "created_at", "status", "priority", "weight", "value")
+
+_UPSERT_BATCH_SIZE = 500
+
+
+def _rollup_key(user_id, created_at, status, priority) -> Optional[RollupKey]:
+    if user_id is None:
+        return None
+    day = (created_at or datetime.utcnow()).date()
+    return (user_id, day, status or "Pending", priority or "medium")
+
+
+def _add(deltas: Dict[RollupKey, list], key: Optional[RollupKey], sign: int, weight, value):
+    if key is None:
+        return
+    delta = deltas[key]
+    delta[0] += sign
+    delta[1] += sign * (weight or 0)
+    delta[2] += sign * (value or 0)
+
+
+def apply_rollup_deltas(connection, deltas: Dict[RollupKey, Iterable[float]]):
+    """
+    Add (count, weight, value) deltas to their rollup rows, creating rows as needed.
+
+    Uses INSERT ... ON CONFLICT DO UPDATE on PostgreSQL and SQLite; other
+    backends fall back to update-then-insert per key.
+
+    Args:
+        connection: SQLAlchemy Connection inside the caller's transaction
+        deltas: {(user_id, day, status, priority): (count, weight, value)}
+    """
+    rows = [
+        {
+            "user_id": key[0],
+            "day": key[1],
+            "status": key[2],
+            "priority": key[3],
+            "order_count": int(count),
+            "total_weight": weight,
+            "total_value": value,
+            "updated_at": datetime.utcnow(),
+        }
+        for key, (count, weight, value) in deltas.items()
+        if count or weight or value
+    ]
+    if not rows:
+        return
+
+    table = OrderDailyRollup.__table__
+    dialect = connection.dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        insert = pg_insert if dialect == "postgresql" else sqlite_insert
+        for start in range(0, len(rows), _UPSERT_BATCH_SIZE):
+            statement = insert(table).values(rows[start:start + _UPSERT_BATCH_SIZE])
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id", "day", "status", "priority"],
+                set_={
+                    "order_count": table.c.order_count + statement.excluded.order_count,
+                    "total_weight": table.c.total_weight + statement.excluded.total_weight,
+                    "total_value": table.c.total_value + statement.excluded.total_value,
+                    "updated_at": statement.excluded.updated_at,
+                }
+            )
+            connection.execute(statement)
+        return
+
+    for row in rows:
+        key_filter = (
+            (table.c.user_id == row["user_id"])
+            & (table.c.day == row["day"])
+            & (table.c.status == row["status"])
+            & (table.c.priority == row["priority"])
+        )
+        result = connection.execute(
+            table.update().where(key_filter).values(
+                order_count=table.c.order_count + row["order_count"],
+                total_weight=table.c.total_weight + row["total_weight"],
+                total_value=table.c.total_value + row["total_value"],
+                updated_at=row["updated_at"],
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+def record_new_orders(connection, rows: Iterable[Dict[str, Any]]):
+    """Count orders inserted outside the ORM (e.g. bulk COPY) into the rollups."""
+    deltas: Dict[RollupKey, list] = defaultdict(lambda: [0, 0.0, 0.0])
+    for row in rows:
+        key = _rollup_key(row["user_id"], row.get("created_at"), row.get("status"), row.get("priority"))
+        _add(deltas, key, 1, row.get("weight"), row.get("value"))
+    apply_rollup_deltas(connection, deltas)
+
+
+def record_status_change(connection, rows: Iterable[Dict[str, Any]], new_status: str):
+    """Move orders whose status was changed outside the ORM to their new rollup rows."""
+    deltas: Dict[RollupKey, list] = defaultdict(lambda: [0, 0.0, 0.0])
+    for row in rows:
+        old_key = _rollup_key(row["user_id"], row.get("created_at"), row.get("status"), row.get("priority"))
+        new_key = _rollup_key(row["user_id"], row.get("created_at"), new_status, row.get("priority"))
+        _add(deltas, old_key, -1, row.get("weight"), row.get("value"))
+        _add(deltas, new_key, 1, row.get("weight"), row.get("value"))
+    apply_rollup_deltas(connection, deltas)
+
+
+def _previous_value(order: Order, name: str):
+    history = attributes.get_history(order, name)
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(order, name)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _track_order_changes(session: Session, flush_context):
+    """Turn flushed Order inserts, updates and deletes into rollup deltas."""
+    deltas: Dict[RollupKey, list] = defaultdict(lambda: [0, 0.0, 0.0])
+
+    for order in session.new:
+        if isinstance(order, Order):
+            key = _rollup_key(order.user_id, order.created_at, order.status, order.priority)
+            _add(deltas, key, 1, order.weight, order.value)
+
+    for order in session.deleted:
+        if isinstance(order, Order):
+            key = _rollup_key(order.user_id, order.created_at, order.status, order.priority)
+            _add(deltas, key, -1, order.weight, order.value)
+
+    for order in session.dirty:
+        if not isinstance(order, Order) or order in session.deleted:
+            continue
+        if not any(attributes.get_history(order, name).has_changes() for name in TRACKED_ATTRIBUTES):
+            continue
+
+        before = {name: _previous_value(order, name) for name in TRACKED_ATTRIBUTES}
+        old_key = _rollup_key(before["user_id"], before["created_at"], before["status"], before["priority"])
+        new_key = _rollup_key(order.user_id, order.created_at, order.status, order.priority)
+        _add(deltas, old_key, -1, before["weight"], before["value"])
+        _add(deltas, new_key, 1, order.weight, order.value)
+
+    if deltas:
+        apply_rollup_deltas(session.connection(), deltas)
+
+
+def rebuild_rollups(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recompute rollups from the orders and orders_archive tables (backfill or repair).
+
+    Args:
+        db: Database session (committed on success)
+        user_id: Limit the rebuild to one user
+
+    Returns:
+        Number of rollup rows written
+    """
+    clear = delete(OrderDailyRollup)
+    if user_id is not None:
+        clear = clear.where(OrderDailyRollup.user_id == user_id)
+
+    deltas: Dict[RollupKey, list] = {}
+    for model in (Order, ArchivedOrder):
+        day = func.date(model.created_at)
+        statement = (
+            select(
+                model.user_id,
+                day,
+                model.status,
+                model.priority,
+                func.count(model.id),
+                func.coalesce(func.sum(model.weight), 0),
+                func.coalesce(func.sum(model.value), 0),
+            )
+            .where(model.user_id.is_not(None))
+            .group_by(model.user_id, day, model.status, model.priority)
+        )
+        if user_id is not None:
+            statement = statement.where(model.user_id == user_id)
+
+        for owner, created_day, status, priority, count, weight, value in db.execute(statement):
+            if isinstance(created_day, str):
+                created_day = date.fromisoformat(created_day)
+            key = (owner, created_day, status or "Pending", priority or "medium")
+            existing = deltas.setdefault(key, [0, 0.0, 0.0])
+            existing[0] += count
+            existing[1] += weight
+            existing[2] += value
+
+    db.execute(clear)
+    apply_rollup_deltas(db.connection(), deltas)
+    db.commit()
+    return len(deltas)
+
+
+def _needs_backfill(db: Session) -> bool:
+    """True when orders exist but no rollup row has been written yet."""
+    if db.execute(select(OrderDailyRollup.id).limit(1)).first() is not None:
+        return False
+    return any(
+        db.execute(select(model.id).where(model.user_id.is_not(None)).limit(1)).first() is not None
+        for model in (Order, ArchivedOrder)
+    )
+
+
+def backfill_rollups(session_factory=SessionLocal) -> int:
+    """
+    Rebuild the rollups if the table is empty but orders exist (first start after upgrading).
+
+    On PostgreSQL an advisory lock keeps the rebuild to one worker; the
+    others skip it.
+
+    Args:
+        session_factory: Session factory
+
+    Returns:
+        Number of rollup rows written (0 if nothing needed backfilling)
+    """
+    with session_factory() as db:
+        bind = db.get_bind()
+        if not _needs_backfill(db):
+            return 0
+
+    with advisory_lock(bind, ROLLUP_BACKFILL_LOCK_KEY) as acquired:
+        if not acquired:
+            logger.info("Rollup backfill already running elsewhere; skipping")
+            return 0
+        # Another worker may have finished the rebuild before we got the lock
+        with session_factory() as db:
+            written = rebuild_rollups(db) if _needs_backfill(db) else 0
+
+    logger.info("Backfilled %d daily rollup rows", written)
+    return written
+
+
+def fetch_daily_rollups(
+    db: Session,
+    user_id: int,
+    start: date,
+    end: date,
+    group_by: Optional[str] = None
+):
+    """
+    Per-day totals for a user between start and end (both inclusive).
+
+    Args:
+        group_by: None, "status" or "priority"
+
+    Returns:
+        Rows of (day, [dimension,] order_count, total_weight, total_value)
+    """
+    columns = [OrderDailyRollup.day]
+    if group_by:
+        columns.append(getattr(OrderDailyRollup, group_by))
+
+    statement = (
+        select(
+            *columns,
+            func.sum(OrderDailyRollup.order_count),
+            func.sum(OrderDailyRollup.total_weight),
+            func.sum(OrderDailyRollup.total_value),
+        )
+        .where(
+            OrderDailyRollup.user_id == user_id,
+            OrderDailyRollup.day >= start,
+            OrderDailyRollup.day <= end,
+        )
+        .group_by(*columns)
+        .order_by(*columns)
+    )
+    return db.execute(statement).all()
+
+
+def fetch_user_totals(db: Session, user_id: int, group_by: str = "status") -> Dict[str, Tuple[int, float, float]]:
+    """
+    All-time totals for a user, including archived orders.
+
+    Args:
+        group_by: "status" or "priority"
+
+    Returns:
+        {status or priority: (order_count, total_weight, total_value)}
+    """
+    dimension = getattr(OrderDailyRollup, group_by)
+    statement = (
+        select(
+            dimension,
+            func.sum(OrderDailyRollup.order_count),
+            func.sum(OrderDailyRollup.total_weight),
+            func.sum(OrderDailyRollup.total_value),
+        )
+        .where(OrderDailyRollup.user_id == user_id)
+        .group_by(dimension)
+    )
+    return {
+        key: (int(count or 0), float(weight or 0), float(value or 0))
+        for key, count, weight, value in db.execute(statement)
+        if count
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild daily order rollups from the orders and orders_archive tables")
+    parser.add_argument("--user-id", type=int, help="Only rebuild this user's rollups")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        written = rebuild_rollups(session, args.user_id)
+    finally:
+        session.close()
+    print(f"✅ Rebuilt {written} daily rollup rows")
@@ -0,0 +1 @@
+# Bulk import/export package
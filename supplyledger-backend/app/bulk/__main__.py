@@ -0,0 +1,102 @@
+"""
+Bulk data command line.
+
+Usage:
+    python -m app.bulk import --user-id 7 orders.csv
+    python -m app.bulk import --user-id 7 --format ndjson - < orders.ndjson
+    python -m app.bulk export orders --format parquet -o orders.parquet
+    python -m app.bulk export shipments --user-id 7 --from 2024-01-01 --status DELIVERED > shipments.csv
+    python -m app.bulk export orders --include-archived -o orders.csv
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime
+
+from app.database.database import SessionLocal
+from app.bulk import exporter
+from app.bulk.importer import DEFAULT_CHUNK_SIZE, SUPPORTED_FORMATS, detect_format, import_orders
+
+
+def _run_import(args) -> int:
+    fmt = args.format or detect_format(filename=args.path)
+
+    if args.path == "-":
+        stream = sys.stdin
+    else:
+        stream = open(args.path, "r", encoding="utf-8-sig", newline="")
+
+    db = SessionLocal()
+    try:
+        result = import_orders(db, args.user_id, stream, fmt=fmt, chunk_size=args.chunk_size)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+        if stream is not sys.stdin:
+            stream.close()
+
+    print(json.dumps(result, indent=2))
+    return 0 if result["failed"] == 0 else 1
+
+
+def _run_export(args) -> int:
+    chunks = exporter.export_stream(
+        args.kind,
+        fmt=args.format,
+        user_id=args.user_id,
+        date_from=args.date_from,
+        date_to=args.date_to,
+        status=args.status,
+        batch_size=args.batch_size,
+        include_archived=args.include_archived
+    )
+
+    if args.output == "-":
+        output = sys.stdout.buffer
+    else:
+        output = open(args.output, "wb")
+
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+        else:
+            output.flush()
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.bulk", description="SupplyLedger bulk data tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Import orders from CSV or NDJSON")
+    import_parser.add_argument("path", help="Input file, or - for stdin")
+    import_parser.add_argument("--user-id", type=int, required=True, help="Owner of the imported orders")
+    import_parser.add_argument("--format", choices=SUPPORTED_FORMATS, help="Input format (default: from file extension)")
+    import_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows loaded per batch")
+    import_parser.set_defaults(handler=_run_import)
+
+    export_parser = commands.add_parser("export", help="Export orders or shipments as CSV or Parquet")
+    export_parser.add_argument("kind", choices=exporter.SUPPORTED_EXPORTS)
+    export_parser.add_argument("--format", choices=exporter.SUPPORTED_FORMATS, default=exporter.CSV_FORMAT)
+    export_parser.add_argument("-o", "--output", default="-", help="Output file, or - for stdout")
+    export_parser.add_argument("--user-id", type=int, help="Only rows owned by this user")
+    export_parser.add_argument("--from", dest="date_from", type=datetime.fromisoformat, help="Created at or after (ISO date)")
+    export_parser.add_argument("--to", dest="date_to", type=datetime.fromisoformat, help="Created before (ISO date)")
+    export_parser.add_argument("--status", help="Only rows with this status")
+    export_parser.add_argument("--batch-size", type=int, default=exporter.EXPORT_BATCH_SIZE, help="Rows per fetch / row group")
+    export_parser.add_argument("--include-archived", action="store_true", help="Also export archived rows")
+    export_parser.set_defaults(handler=_run_export)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+Streaming export of orders and shipments.
+
+Rows come off a server-side cursor in fixed-size batches and are written
+straight out as CSV text or Parquet row groups, so memory stays constant
+no matter how many rows match the filters.
+"""
+
+import csv
+import io
+import os
+from datetime import date, datetime
+from typing import Any, Callable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import select, union_all
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.database.models import ArchivedOrder, ArchivedShipment, Order, Shipment
+from app.utils.serialization import arrow_schema, column_python_types
+
+CSV_FORMAT = "csv"
+PARQUET_FORMAT = "parquet"
+SUPPORTED_FORMATS = (CSV_FORMAT, PARQUET_FORMAT)
+
+ORDERS_EXPORT = "orders"
+SHIPMENTS_EXPORT = "shipments"
+SUPPORTED_EXPORTS = (ORDERS_EXPORT, SHIPMENTS_EXPORT)
+
+MEDIA_TYPES = {
+    CSV_FORMAT: "text/csv",
+    PARQUET_FORMAT: "application/vnd.apache.parquet",
+}
+
+# Rows fetched per cursor round-trip; also the Parquet row group size
+EXPORT_BATCH_SIZE = int(os.getenv("BULK_EXPORT_BATCH_SIZE", "10000"))
+
+def _order_export_columns(model):
+    return [
+        model.id,
+        model.order_id,
+        model.user_id,
+        model.origin,
+        model.destination,
+        model.weight,
+        model.priority,
+        model.status,
+        model.due_date,
+        model.value,
+        model.created_at,
+        model.updated_at,
+    ]
+
+
+def _shipment_export_columns(model):
+    return [
+        model.id.label("shipment_id"),
+        model.order_id,
+        model.source,
+        model.destination,
+        model.distance_km,
+        model.status,
+        model.blockchain_hash,
+        model.estimated_delivery,
+        model.created_at,
+        model.updated_at,
+    ]
+
+
+ORDER_EXPORT_COLUMNS = _order_export_columns(Order)
+SHIPMENT_EXPORT_COLUMNS = _shipment_export_columns(Shipment)
+
+
+def export_columns(kind: str):
+    """Column attributes exported for "orders" or "shipments"."""
+    if kind == ORDERS_EXPORT:
+        return ORDER_EXPORT_COLUMNS
+    if kind == SHIPMENTS_EXPORT:
+        return SHIPMENT_EXPORT_COLUMNS
+    raise ValueError(f"Unknown export '{kind}', expected one of {SUPPORTED_EXPORTS}")
+
+
+def _filtered_select(kind, archived, user_id, date_from, date_to, status):
+    order_model = ArchivedOrder if archived else Order
+    if kind == ORDERS_EXPORT:
+        model = order_model
+        statement = select(*_order_export_columns(model))
+    else:
+        model = ArchivedShipment if archived else Shipment
+        statement = select(*_shipment_export_columns(model))
+
+    if user_id is not None:
+        if model is not order_model:
+            statement = statement.join(order_model, order_model.order_id == model.order_id)
+        statement = statement.where(order_model.user_id == user_id)
+    if date_from is not None:
+        statement = statement.where(model.created_at >= date_from)
+    if date_to is not None:
+        statement = statement.where(model.created_at < date_to)
+    if status:
+        statement = statement.where(model.status == status)
+    return statement, model
+
+
+def build_export_query(
+    kind: str,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    status: Optional[str] = None,
+    include_archived: bool = False
+):
+    """
+    Build the SELECT for an export.
+
+    Shipments carry no user_id, so the user filter joins through orders.
+    Date filters apply to created_at (date_from inclusive, date_to exclusive).
+    With include_archived, rows from orders_archive / shipments_archive are
+    UNIONed in; archived rows keep their ids, so the result stays in id order.
+    """
+    export_columns(kind)
+    statement, model = _filtered_select(kind, False, user_id, date_from, date_to, status)
+    if not include_archived:
+        return statement.order_by(model.id)
+
+    archived, _ = _filtered_select(kind, True, user_id, date_from, date_to, status)
+    combined = union_all(statement, archived)
+    return combined.order_by(combined.selected_columns[0])
+
+
+def iter_row_batches(db: Session, statement, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Sequence[Any]]:
+    """Fetch rows through a server-side cursor, batch_size rows at a time."""
+    result = db.execute(statement.execution_options(stream_results=True, yield_per=batch_size))
+    for partition in result.partitions():
+        yield partition
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(columns: Sequence[str], batches: Iterator[Sequence[Any]]) -> Iterator[bytes]:
+    """Encode row batches as CSV, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    for batch in batches:
+        for row in batch:
+            writer.writerow([_csv_value(value) for value in row])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(
+    columns: Sequence[str],
+    python_types: Sequence[type],
+    batches: Iterator[Sequence[Any]]
+) -> Iterator[bytes]:
+    """Encode row batches as Parquet, one row group per batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(columns, python_types)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in batches:
+            column_values = list(zip(*batch))
+            arrays = [pa.array(values, type=field.type) for values, field in zip(column_values, schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_stream(
+    kind: str,
+    fmt: str = CSV_FORMAT,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    status: Optional[str] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    session_factory: Callable[[], Session] = SessionLocal,
+    include_archived: bool = False
+) -> Iterator[bytes]:
+    """
+    Stream an export as encoded bytes.
+
+    The generator owns its session, so it can outlive the request handler
+    that returned it (e.g. inside a StreamingResponse).
+
+    Args:
+        kind: "orders" or "shipments"
+        fmt: "csv" or "parquet"
+        user_id, date_from, date_to, status: Optional filters
+        batch_size: Rows per cursor fetch / Parquet row group
+        session_factory: Callable returning a new Session
+        include_archived: Also export archived rows
+
+    Yields:
+        Chunks of the encoded file
+    """
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}', expected one of {SUPPORTED_FORMATS}")
+
+    column_attributes = export_columns(kind)
+    columns = [column.key for column in column_attributes]
+    statement = build_export_query(kind, user_id, date_from, date_to, status, include_archived)
+
+    db = session_factory()
+    try:
+        batches = iter_row_batches(db, statement, batch_size)
+        if fmt == CSV_FORMAT:
+            yield from stream_csv(columns, batches)
+        else:
+            yield from stream_parquet(columns, column_python_types(column_attributes), batches)
+    finally:
+        db.close()
+
+
+def export_filename(kind: str, fmt: str) -> str:
+    """Download filename for an export, e.g. orders-20240101T000000.csv"""
+    return f"{kind}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.{fmt}"
@@ -0,0 +1,241 @@
+"""
+Streaming bulk order import.
+
+Reads CSV or NDJSON one record at a time, validates each record against
+OrderCreate, and loads valid rows in chunks:
+1. PostgreSQL — COPY ... FROM STDIN on the session's own connection
+2. Other backends — batched executemany INSERTs
+
+Daily rollups are updated per chunk; analytics are recomputed once, after
+the last chunk, and lane sketches are updated once the caller commits.
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.analytics.lanes import ORDER_LANES, record_lane_counts_on_commit
+from app.analytics.rollups import record_new_orders
+from app.database.models import Order
+from app.orders.order_service import calculate_order_value, generate_order_id, update_user_analytics
+from app.schemas import OrderCreate
+from app.spatial.spatial_service import order_location_fields
+
+CSV_FORMAT = "csv"
+NDJSON_FORMAT = "ndjson"
+SUPPORTED_FORMATS = (CSV_FORMAT, NDJSON_FORMAT)
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_CHUNK_SIZE", "5000"))
+
+# Row errors beyond this are counted but not listed, to keep memory bounded
+MAX_REPORTED_ERRORS = 1000
+
+# Column order used for both COPY and batched inserts
+IMPORT_COLUMNS = (
+    "order_id",
+    "user_id",
+    "origin",
+    "destination",
+    "weight",
+    "priority",
+    "status",
+    "due_date",
+    "value",
+    "version",
+    "origin_lat",
+    "origin_lon",
+    "origin_geohash",
+    "destination_lat",
+    "destination_lon",
+    "destination_geohash",
+    "created_at",
+    "updated_at",
+)
+
+Record = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def detect_format(filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
+    """
+    Work out the import format from a filename or content type.
+
+    Returns:
+        "csv" or "ndjson" (defaults to csv when nothing matches)
+    """
+    content_type = (content_type or "").lower()
+    filename = (filename or "").lower()
+
+    if "ndjson" in content_type or "jsonlines" in content_type or "json" in content_type:
+        return NDJSON_FORMAT
+    if filename.endswith((".ndjson", ".jsonl", ".json")):
+        return NDJSON_FORMAT
+    return CSV_FORMAT
+
+
+def iter_csv_records(stream: TextIO) -> Iterator[Record]:
+    """Yield (row_number, record, parse_error) for each CSV data row."""
+    reader = csv.DictReader(stream)
+    for row_number, row in enumerate(reader, start=1):
+        # Blank cells fall back to the OrderCreate defaults
+        record = {key.strip(): value for key, value in row.items() if key and value not in (None, "")}
+        yield row_number, record, None
+
+
+def iter_ndjson_records(stream: TextIO) -> Iterator[Record]:
+    """Yield (row_number, record, parse_error) for each non-blank NDJSON line."""
+    row_number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, "Each line must be a JSON object"
+            continue
+        yield row_number, record, None
+
+
+def _validation_messages(error: ValidationError) -> List[Dict[str, str]]:
+    return [
+        {"field": ".".join(str(part) for part in err["loc"]), "message": err["msg"]}
+        for err in error.errors()
+    ]
+
+
+def _copy_chunk(db: Session, rows: List[Dict[str, Any]]):
+    """Load a chunk through PostgreSQL COPY on the session's connection."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in (row[column] for column in IMPORT_COLUMNS)
+        ])
+    buffer.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {Order.__tablename__} ({', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _insert_chunk(db: Session, rows: List[Dict[str, Any]]):
+    """Load a chunk with a single executemany INSERT."""
+    db.execute(insert(Order), rows)
+
+
+def import_orders(
+    db: Session,
+    user_id: int,
+    stream: TextIO,
+    fmt: str = CSV_FORMAT,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Import orders for a user from a CSV or NDJSON text stream.
+
+    Valid rows are loaded in chunks within the caller's transaction (the
+    request's unit of work), along with the recomputed analytics. Invalid
+    rows are skipped and reported with their row number.
+
+    Args:
+        db: Database session
+        user_id: Owner of the imported orders
+        stream: Text stream positioned at the start of the data
+        fmt: "csv" or "ndjson"
+        chunk_size: Rows validated and loaded per batch
+
+    Returns:
+        {
+            'user_id': int,
+            'imported': int,
+            'failed': int,
+            'errors': [{'row': int, 'errors': [{'field': str, 'message': str}]}],
+            'errors_truncated': bool
+        }
+    """
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported import format '{fmt}', expected one of {SUPPORTED_FORMATS}")
+
+    records = iter_csv_records(stream) if fmt == CSV_FORMAT else iter_ndjson_records(stream)
+    load_chunk = _copy_chunk if db.get_bind().dialect.name == "postgresql" else _insert_chunk
+
+    imported = 0
+    failed = 0
+    errors: List[Dict[str, Any]] = []
+    chunk: List[Dict[str, Any]] = []
+    lane_counts: Dict[Tuple[str, str], int] = {}
+
+    def report(row_number: int, messages: List[Dict[str, str]]):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": row_number, "errors": messages})
+
+    for row_number, record, parse_error in records:
+        if parse_error:
+            report(row_number, [{"field": "", "message": parse_error}])
+            continue
+
+        try:
+            order_data = OrderCreate(**record)
+        except ValidationError as e:
+            report(row_number, _validation_messages(e))
+            continue
+
+        now = datetime.utcnow()
+        chunk.append({
+            "order_id": generate_order_id(),
+            "user_id": user_id,
+            "origin": order_data.origin,
+            "destination": order_data.destination,
+            "weight": order_data.weight,
+            "priority": order_data.priority,
+            "status": "Pending",
+            "due_date": order_data.due_date,
+            "value": calculate_order_value(order_data.weight),
+            "version": 1,
+            **order_location_fields(order_data.origin, order_data.destination),
+            "created_at": now,
+            "updated_at": now,
+        })
+        lane = (order_data.origin, order_data.destination)
+        lane_counts[lane] = lane_counts.get(lane, 0) + 1
+
+        if len(chunk) >= chunk_size:
+            load_chunk(db, chunk)
+            record_new_orders(db.connection(), chunk)
+            imported += len(chunk)
+            chunk = []
+
+    if chunk:
+        load_chunk(db, chunk)
+        record_new_orders(db.connection(), chunk)
+        imported += len(chunk)
+
+    # One analytics rescan for the whole import
+    update_user_analytics(user_id, db)
+    record_lane_counts_on_commit(db, ORDER_LANES, lane_counts)
+
+    return {
+        "user_id": user_id,
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+    }
@@ -0,0 +1,288 @@
+"""
+Hot/cold archival of finished orders.
+
+Orders that are Delivered or Cancelled and untouched for ARCHIVE_AFTER_DAYS
+move, with all their shipments, from orders/shipments into
+orders_archive/shipments_archive. A consolidated shipment (app/dispatch)
+moves together with every order it carries, once all of them are
+archivable. Each batch is one transaction of INSERT ... SELECT followed
+by DELETE, so rows keep their ids, hashes and timestamps and are never
+in both tiers (or neither) at once. Stored delay predictions for moved
+shipments are dropped.
+
+The moves are Core statements, so the ORM rollup hook does not see them:
+daily rollups (and the analytics read from them) keep counting archived
+orders. Detail, ledger and verification lookups fall through to the
+archive via find_order() / find_shipment(); per-user lists and hot-path
+queries read the hot tables only.
+
+A periodic task runs the job every ARCHIVE_INTERVAL_SECONDS (0 disables
+it); on PostgreSQL an advisory lock keeps it to one worker at a time.
+
+Usage:
+    python -m app.database.archive
+    python -m app.database.archive --older-than-days 30
+"""
+
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import DateTime, and_, delete, insert, literal, or_, select
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.database.locks import ARCHIVE_LOCK_KEY, advisory_lock
+from app.database.models import ArchivedOrder, ArchivedShipment, Order, Shipment, ShipmentOrder, ShipmentPrediction
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+ARCHIVABLE_ORDER_STATUSES = ("Delivered", "Cancelled")
+
+
+def find_order(db: Session, order_id: str):
+    """Order by order_id from the hot table, else the archive (read-only)."""
+    order = db.query(Order).filter(Order.order_id == order_id).first()
+    if order is None:
+        order = db.query(ArchivedOrder).filter(ArchivedOrder.order_id == order_id).first()
+    return order
+
+
+def find_shipment(db: Session, shipment_id: int):
+    """Shipment by id from the hot table, else the archive (read-only)."""
+    shipment = db.query(Shipment).filter(Shipment.id == shipment_id).first()
+    if shipment is None:
+        shipment = db.query(ArchivedShipment).filter(ArchivedShipment.id == shipment_id).first()
+    return shipment
+
+
+def find_order_version(db: Session, order_id: str):
+    """(user_id, version, updated_at) of an order in either tier, without loading the row."""
+    for model in (Order, ArchivedOrder):
+        row = db.execute(
+            select(model.user_id, model.version, model.updated_at).where(model.order_id == order_id)
+        ).first()
+        if row is not None:
+            return row
+    return None
+
+
+def find_shipment_version(db: Session, shipment_id: int):
+    """(owner user_id, version, updated_at, blockchain_hash) of a shipment in either tier."""
+    # Archival moves a shipment together with its order, so the owner is in the same tier
+    for model, order_model in ((Shipment, Order), (ArchivedShipment, ArchivedOrder)):
+        owner = select(order_model.user_id).where(order_model.order_id == model.order_id).limit(1).scalar_subquery()
+        row = db.execute(
+            select(owner.label("user_id"), model.version, model.updated_at, model.blockchain_hash)
+            .where(model.id == shipment_id)
+        ).first()
+        if row is not None:
+            return row
+    return None
+
+
+def is_archived(db: Session, order_id: str) -> bool:
+    """Whether an order has moved to the archive."""
+    return db.query(ArchivedOrder.id).filter(ArchivedOrder.order_id == order_id).first() is not None
+
+
+def _copy(source, target, condition, archived_at: datetime):
+    """INSERT INTO target SELECT <source columns>, archived_at FROM source WHERE condition."""
+    names = [column.name for column in source.__table__.columns]
+    rows = select(*source.__table__.columns, literal(archived_at, DateTime)).where(condition)
+    return insert(target).from_select(names + ["archived_at"], rows)
+
+
+def _carrier_groups(db: Session, order_ids: Iterable[str]) -> List[Tuple[Set[str], Set[int]]]:
+    """
+    Split orders into groups that must move together, with their hot shipments.
+
+    A shipment is linked to its lead order (Shipment.order_id) and, when
+    consolidated, to every order in shipment_orders; orders sharing a
+    shipment, directly or through other shipments, form one group.
+
+    Returns:
+        [(order_ids, shipment_ids)] per group
+    """
+    parent: Dict[tuple, tuple] = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(shipment_id, order_id):
+        parent[find(("shipment", shipment_id))] = find(("order", order_id))
+
+    seen_orders: Set[str] = set()
+    seen_shipments: Set[int] = set()
+    frontier = set(order_ids)
+    while frontier:
+        seen_orders |= frontier
+        for order_id in frontier:
+            find(("order", order_id))
+
+        linked = select(ShipmentOrder.shipment_id).where(ShipmentOrder.order_id.in_(frontier))
+        carriers = db.execute(
+            select(Shipment.id, Shipment.order_id).where(or_(Shipment.order_id.in_(frontier), Shipment.id.in_(linked)))
+        ).all()
+        new_shipments = {shipment_id for shipment_id, _ in carriers} - seen_shipments
+        seen_shipments |= new_shipments
+
+        edges = list(carriers)
+        if new_shipments:
+            edges += db.execute(
+                select(ShipmentOrder.shipment_id, ShipmentOrder.order_id)
+                .where(ShipmentOrder.shipment_id.in_(new_shipments))
+            ).all()
+        for shipment_id, order_id in edges:
+            union(shipment_id, order_id)
+        frontier = {order_id for _, order_id in edges} - seen_orders
+
+    groups: Dict[tuple, Tuple[Set[str], Set[int]]] = {}
+    for node in list(parent):
+        kind, key = node
+        members = groups.setdefault(find(node), (set(), set()))
+        (members[0] if kind == "order" else members[1]).add(key)
+    return list(groups.values())
+
+
+def _archivable(cutoff: datetime):
+    return and_(Order.status.in_(ARCHIVABLE_ORDER_STATUSES), Order.updated_at < cutoff)
+
+
+def _move_batch(db: Session, orders: List[Tuple[int, str]], cutoff: datetime) -> Tuple[int, int]:
+    """
+    Move one batch of orders and their shipments; returns (orders, shipments) moved.
+
+    Orders travel with every shipment that carries them, and a
+    consolidated shipment with every order it carries, so a group moves
+    only once all of its hot orders are archivable; groups with an order
+    still in progress wait for a later run. Linked order IDs with no hot
+    row (deleted orders) are ignored. Groups can pull in orders
+    outside the batch. shipment_orders rows stay where they are: archived
+    rows keep their ids, and lookups read the links for both tiers.
+
+    The groups' rows are locked (FOR UPDATE) before the check, shipments
+    first as request handlers write them, so on PostgreSQL nothing can
+    change them before the move. The copy and delete repeat the check; if
+    an order changed anyway (SQLite has no row locks) the batch is rolled
+    back and left for the next run.
+    """
+    groups = _carrier_groups(db, [order_id for _, order_id in orders])
+    group_orders = set().union(*(order_ids for order_ids, _ in groups))
+    group_shipments = set().union(*(shipment_ids for _, shipment_ids in groups))
+    if group_shipments:
+        db.execute(select(Shipment.id).where(Shipment.id.in_(group_shipments)).with_for_update())
+    locked = db.execute(
+        select(Order.order_id, Order.status, Order.updated_at)
+        .where(Order.order_id.in_(group_orders))
+        .with_for_update()
+    ).all()
+    # Links can name orders that are not hot (deleted, or a bad ID); they have nothing to move
+    hot = {order_id for order_id, _, _ in locked}
+    blocked = {
+        order_id
+        for order_id, status, updated_at in locked
+        if status not in ARCHIVABLE_ORDER_STATUSES or updated_at is None or updated_at >= cutoff
+    }
+
+    order_ids: Set[str] = set()
+    shipment_ids: Set[int] = set()
+    for group_order_ids, group_shipment_ids in groups:
+        group_order_ids = group_order_ids & hot
+        if group_order_ids and not group_order_ids & blocked:
+            order_ids |= group_order_ids
+            shipment_ids |= group_shipment_ids
+    if not order_ids:
+        return 0, 0
+
+    now = datetime.utcnow()
+    still_archivable = and_(Order.order_id.in_(order_ids), _archivable(cutoff))
+    if db.execute(_copy(Order, ArchivedOrder, still_archivable, now)).rowcount != len(order_ids):
+        logger.info("Orders changed while archiving; leaving the batch for the next run")
+        db.rollback()
+        return 0, 0
+    if shipment_ids:
+        db.execute(_copy(Shipment, ArchivedShipment, Shipment.id.in_(shipment_ids), now))
+        db.execute(delete(ShipmentPrediction).where(ShipmentPrediction.shipment_id.in_(shipment_ids)))
+        db.execute(delete(Shipment).where(Shipment.id.in_(shipment_ids)))
+    db.execute(delete(Order).where(still_archivable))
+    return len(order_ids), len(shipment_ids)
+
+
+def _archive_all(session_factory, cutoff: datetime, batch_size: int) -> Tuple[int, int]:
+    moved_orders = moved_shipments = 0
+    last_id = 0
+    while True:
+        db = session_factory()
+        try:
+            orders = db.execute(
+                select(Order.id, Order.order_id)
+                .where(Order.id > last_id, _archivable(cutoff))
+                .order_by(Order.id)
+                .limit(batch_size)
+            ).all()
+            if not orders:
+                return moved_orders, moved_shipments
+            orders_moved, shipments_moved = _move_batch(db, orders, cutoff)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        moved_orders += orders_moved
+        moved_shipments += shipments_moved
+        last_id = orders[-1][0]
+
+
+def archive_finished_orders(
+    session_factory=SessionLocal,
+    older_than_days: float = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    now: Optional[datetime] = None
+) -> Tuple[int, int]:
+    """
+    Move finished orders older than the cutoff, and their shipments, to the archive.
+
+    Args:
+        session_factory: Session factory (one short transaction per batch)
+        older_than_days: Minimum age since the order was last updated
+        batch_size: Orders moved per transaction
+
+    Returns:
+        (orders moved, shipments moved); (0, 0) if another worker holds the lock
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    with session_factory() as db:
+        bind = db.get_bind()
+
+    with advisory_lock(bind, ARCHIVE_LOCK_KEY) as acquired:
+        if not acquired:
+            logger.info("Archival already running elsewhere; skipping")
+            return 0, 0
+        moved = _archive_all(session_factory, cutoff, batch_size)
+
+    logger.info("Archived %d orders and %d shipments", *moved)
+    return moved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move finished orders and their shipments to the archive tables")
+    parser.add_argument("--older-than-days", type=float, default=ARCHIVE_AFTER_DAYS,
+                        help="Minimum days since the order was last updated")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    orders, shipments = archive_finished_orders(older_than_days=args.older_than_days, batch_size=args.batch_size)
+    print(f"✅ Archived {orders} orders and {shipments} shipments")
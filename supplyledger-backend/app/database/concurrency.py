@@ -0,0 +1,172 @@
+"""
+Optimistic concurrency for orders and shipments.
+
+Order and Shipment carry a version column managed by SQLAlchemy
+(version_id_col): every ORM flush runs
+
+    UPDATE ... SET ..., version = :read + 1 WHERE id = :id AND version = :read
+
+and raises StaleDataError when another writer got there first, so two
+hub scans can no longer silently overwrite each other's status and hash.
+No row locks are held between read and write.
+
+1. Request handlers flush through flush_or_conflict(), which turns a
+   lost race into a 409 carrying the row's current state. Clients may also
+   send the version they last read; check_version() rejects the write with
+   the same 409 if the row has moved on since.
+2. Follow-on writes (e.g. marking an order Delivered after its shipment)
+   go through retry_on_conflict(), which re-reads and re-applies inside a
+   savepoint, so the rest of the request's unit of work is kept.
+3. Bulk jobs write with bulk_compare_and_swap(): one executemany per
+   batch, conflicting rows re-read and recomputed, at most
+   CONFLICT_RETRY_ATTEMPTS times.
+"""
+
+import logging
+import os
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, inspect, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+logger = logging.getLogger(__name__)
+
+CONFLICT_RETRY_ATTEMPTS = int(os.getenv("CONFLICT_RETRY_ATTEMPTS", "3"))
+
+
+def conflict(instance, schema, message: Optional[str] = None) -> HTTPException:
+    """409 carrying the current state of a row (None if it is gone)."""
+    name = type(instance).__name__ if instance is not None else "Record"
+    return HTTPException(
+        status_code=409,
+        detail={
+            "message": message or f"{name} was modified by another request; re-read and retry",
+            "current": schema.model_validate(instance).model_dump(mode="json") if instance is not None else None
+        }
+    )
+
+
+def check_version(instance, expected: Optional[int], schema):
+    """
+    Reject a write based on a stale read.
+
+    Raises:
+        HTTPException: 409 with the current state if expected is given and differs
+    """
+    if expected is not None and expected != instance.version:
+        raise conflict(instance, schema)
+
+
+def flush_or_conflict(db: Session, instance, schema):
+    """
+    Flush a request's changes to a versioned row (the unit of work commits).
+
+    Raises:
+        HTTPException: 409 with the current state if another writer
+            updated (or archived/deleted) the row since it was read
+    """
+    model = type(instance)
+    identity = inspect(instance).identity
+    try:
+        db.flush()
+    except StaleDataError:
+        db.rollback()
+        current = db.get(model, identity, populate_existing=True)
+        if current is None:
+            name = model.__name__
+            raise conflict(None, schema, f"{name} was archived or deleted by another request")
+        raise conflict(current, schema)
+
+
+def retry_on_conflict(db: Session, apply: Callable[[], None], attempts: int = CONFLICT_RETRY_ATTEMPTS) -> bool:
+    """
+    Run apply() and flush it in a savepoint, re-running it on version conflicts.
+
+    apply() must re-read what it changes; rolling back the savepoint expires
+    the rows it modified. Earlier changes in the session are flushed first
+    and survive a conflict.
+
+    Returns:
+        True once flushed, False after `attempts` conflicts
+    """
+    for _ in range(attempts):
+        try:
+            with db.begin_nested():
+                apply()
+            return True
+        except StaleDataError:
+            pass
+    logger.warning("Giving up after %d conflicting attempts", attempts)
+    return False
+
+
+def compare_and_swap(db: Session, model, changes: List[dict]) -> List[int]:
+    """
+    Write each change only if its row still has the version it was read at.
+
+    Args:
+        changes: {"id", "version" (as read), column: new value, ...}, with
+            the same columns in every change
+
+    Returns:
+        Ids of rows changed underneath and therefore not written (rows
+        deleted meanwhile are not reported)
+    """
+    table = model.__table__
+    columns = [key for key in changes[0] if key not in ("id", "version")]
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"), table.c.version == bindparam("b_version"))
+        .values({**{column: bindparam(f"b_{column}") for column in columns}, "version": table.c.version + 1})
+    )
+    db.execute(statement, [{f"b_{key}": value for key, value in change.items()} for change in changes])
+
+    # Rows holding the new values were written (or already equal); the rest lost a race.
+    # Written rows stay locked until commit, so this read cannot be overtaken.
+    wanted = {change["id"]: change for change in changes}
+    current = db.execute(
+        select(table.c.id, *(table.c[column] for column in columns)).where(table.c.id.in_(wanted))
+    )
+    return [
+        row.id for row in current
+        if any(getattr(row, column) != wanted[row.id][column] for column in columns)
+    ]
+
+
+def bulk_compare_and_swap(
+    db: Session,
+    model,
+    changes: List[dict],
+    recompute: Callable[[List[int]], List[dict]],
+    attempts: int = CONFLICT_RETRY_ATTEMPTS
+) -> int:
+    """
+    compare_and_swap() with bounded retries for background/bulk writers.
+
+    Args:
+        changes: As for compare_and_swap
+        recompute: Re-reads the given ids and returns fresh changes (with
+            current versions); may drop rows that no longer need writing
+        attempts: Retries after the first write
+
+    Returns:
+        Rows written
+    """
+    written = 0
+    for attempt in range(attempts + 1):
+        if not changes:
+            break
+        conflicted = compare_and_swap(db, model, changes)
+        written += len(changes) - len(conflicted)
+        if not conflicted:
+            break
+        if attempt == attempts:
+            logger.warning(
+                "Skipped %d %s rows still conflicting after %d retries",
+                len(conflicted), model.__tablename__, attempts
+            )
+            break
+        changes = recompute(conflicted)
+    return written
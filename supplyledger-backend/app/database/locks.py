@@ -0,0 +1,57 @@
+"""
+Single-worker background jobs.
+
+Every API process starts the same periodic tasks. Jobs that write
+database-wide state take advisory_lock() with their own key, so on
+PostgreSQL one process runs each job at a time and the others skip it.
+Other databases are single-process deployments; the lock is always
+granted there.
+
+Keys for pg_try_advisory_lock are numbered sequentially from a fixed
+base ("SL" in the high bytes), so they stay distinct from each other and
+from advisory locks other applications take on the same database. Add new
+jobs at the end; never renumber, or old and new processes would run a job
+at the same time during a rolling deploy.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+_LOCK_KEY_BASE = 0x534C0000
+
+ROLLUP_BACKFILL_LOCK_KEY = _LOCK_KEY_BASE + 1
+PREDICTION_LOCK_KEY = _LOCK_KEY_BASE + 2
+SPEED_PROFILE_LOCK_KEY = _LOCK_KEY_BASE + 3
+ARCHIVE_LOCK_KEY = _LOCK_KEY_BASE + 4
+
+
+@contextmanager
+def advisory_lock(bind: Engine, key: int) -> Iterator[bool]:
+    """
+    Try to take a PostgreSQL advisory lock for the duration of the block.
+
+    The lock is session-level, on a dedicated autocommit connection, so
+    commits on the job's own sessions inside the block don't release it.
+
+    Args:
+        bind: Engine the job writes through
+        key: Lock key (one of the *_LOCK_KEY constants)
+
+    Yields:
+        True if this process holds the lock, False if another one does
+    """
+    if bind.dialect.name != "postgresql":
+        yield True
+        return
+
+    with bind.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        acquired = bool(connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar())
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
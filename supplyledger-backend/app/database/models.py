@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, JSON, LargeBinary, Index, Table, UniqueConstraint, DDL, event, func, text
 from datetime import datetime
 from app.database.database import Base
 
@@ -31,9 +31,21 @@ class Order(Base):
     status = Column(String, default="Pending")
     due_date = Column(DateTime)
     value = Column(Float, default=0)
+    # City locations for spatial queries (see app/utils/geohash.py)
+    origin_lat = Column(Float, nullable=True)
+    origin_lon = Column(Float, nullable=True)
+    origin_geohash = Column(String(12), nullable=True, index=True)
+    destination_lat = Column(Float, nullable=True)
+    destination_lon = Column(Float, nullable=True)
+    destination_geohash = Column(String(12), nullable=True, index=True)
+    # Bumped on every write; ORM updates are compare-and-swap on it (see app/database/concurrency.py).
+    # The server default covers raw writers such as the bulk import's COPY.
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __mapper_args__ = {"version_id_col": version}
+
 
 class Shipment(Base):
     __tablename__ = "shipments"
@@ -44,13 +56,107 @@ class Shipment(Base):
     destination = Column(String)
     source_coords = Column(JSON, nullable=True)  # [longitude, latitude]
     dest_coords = Column(JSON, nullable=True)    # [longitude, latitude]
+    # Typed copies of the coordinates for spatial queries (see app/utils/geohash.py)
+    source_lat = Column(Float, nullable=True)
+    source_lon = Column(Float, nullable=True)
+    source_geohash = Column(String(12), nullable=True, index=True)
+    dest_lat = Column(Float, nullable=True)
+    dest_lon = Column(Float, nullable=True)
+    dest_geohash = Column(String(12), nullable=True, index=True)
     distance_km = Column(Integer)
     status = Column(String)
     blockchain_hash = Column(String, nullable=True)
     estimated_delivery = Column(DateTime, nullable=True)
+    # Set when a client supplies estimated_delivery; ETA recomputation leaves it alone
+    estimated_delivery_pinned = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+    delivered_at = Column(DateTime, nullable=True)   # set when status becomes DELIVERED
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __mapper_args__ = {"version_id_col": version}
+
+
+class ShipmentOrder(Base):
+    """Orders carried by a consolidated shipment (see app/dispatch); its lead order is also Shipment.order_id."""
+    __tablename__ = "shipment_orders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    shipment_id = Column(Integer, nullable=False, index=True)
+    order_id = Column(String, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+def _archive_columns(table, indexed):
+    """Copies of a hot table's columns plus archived_at, indexed only where listed."""
+    columns = [
+        Column(
+            column.name,
+            column.type,
+            primary_key=column.primary_key,
+            autoincrement=False,
+            nullable=column.nullable,
+            index=column.name in indexed
+        )
+        for column in table.columns
+    ]
+    return columns + [Column("archived_at", DateTime, default=datetime.utcnow, index=True)]
+
+
+# Cold tier for finished orders and their shipments (see app/database/archive.py).
+# Built from the hot tables so new columns carry over; rows keep their ids and hashes.
+class ArchivedOrder(Base):
+    __table__ = Table("orders_archive", Base.metadata, *_archive_columns(Order.__table__, ("order_id", "user_id")))
+
+
+class ArchivedShipment(Base):
+    __table__ = Table("shipments_archive", Base.metadata, *_archive_columns(Shipment.__table__, ("order_id",)))
+
+
+# Pending orders for the dispatch scheduler
+Index("ix_orders_status_due_date", Order.status, Order.due_date)
+
+# In-transit shipments per destination city, for ETA recomputation
+Index("ix_shipments_destination_status", func.lower(Shipment.destination), Shipment.status)
+
+
+# Case-insensitive substring/prefix search (app/search). On PostgreSQL these
+# are pg_trgm GIN indexes, skipped when the server lacks the pg_trgm
+# extension (contrib); other databases get plain expression indexes.
+def _pg_trgm_available(ddl, target, bind, **kw):
+    if bind.dialect.name != "postgresql":
+        return True
+    return bind.execute(text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).first() is not None
+
+
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql", callable_=_pg_trgm_available)
+)
+
+
+def _trigram_index(name, column):
+    expression = func.lower(column).label(f"{column.key}_lower")
+    index = Index(name, expression, postgresql_using="gin", postgresql_ops={expression.name: "gin_trgm_ops"})
+    index.ddl_if(callable_=_pg_trgm_available)
+    return index
+
+
+_trigram_index("ix_orders_order_id_trgm", Order.order_id)
+_trigram_index("ix_orders_origin_trgm", Order.origin)
+_trigram_index("ix_orders_destination_trgm", Order.destination)
+_trigram_index("ix_shipments_order_id_trgm", Shipment.order_id)
+_trigram_index("ix_shipments_source_trgm", Shipment.source)
+_trigram_index("ix_shipments_destination_trgm", Shipment.destination)
+_trigram_index("ix_users_email_trgm", User.email)
+_trigram_index("ix_users_company_name_trgm", User.company_name)
+_trigram_index("ix_users_name_trgm", User.name)
+
+# Newest-first keyset pages for broad search terms
+Index("ix_orders_created_at_id", Order.created_at, Order.id)
+Index("ix_shipments_created_at_id", Shipment.created_at, Shipment.id)
+
 
 class OrderAnalytics(Base):
     __tablename__ = "order_analytics"
@@ -66,3 +172,87 @@ class OrderAnalytics(Base):
     average_order_value = Column(Float, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class OrderDailyRollup(Base):
+    __tablename__ = "order_daily_rollups"
+    __table_args__ = (
+        # Leading user_id, day serves per-user time-range reads
+        UniqueConstraint("user_id", "day", "status", "priority", name="uq_order_daily_rollups_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)           # UTC day the order was created
+    status = Column(String, nullable=False)
+    priority = Column(String, nullable=False)
+    order_count = Column(Integer, default=0)
+    total_weight = Column(Float, default=0)
+    total_value = Column(Float, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LaneSketch(Base):
+    __tablename__ = "lane_sketches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, index=True)   # "orders" or "shipments"
+    state = Column(JSON)                              # serialized count-min + heavy-hitter state
+    total = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ShipmentPrediction(Base):
+    __tablename__ = "shipment_predictions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    shipment_id = Column(Integer, unique=True, index=True, nullable=False)
+    prediction = Column(JSON)                         # predict_delay() result
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LaneRoute(Base):
+    __tablename__ = "lane_routes"
+    __table_args__ = (
+        UniqueConstraint("origin", "destination", name="uq_lane_routes_origin_destination"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    origin = Column(String, nullable=False)          # normalized city name
+    destination = Column(String, nullable=False)     # normalized city name
+    distance_km = Column(Float, nullable=False)      # road distance
+    duration_min = Column(Float, nullable=False)     # typical driving time
+    source = Column(String)                          # "openrouteservice" or "haversine"
+    origin_coords = Column(JSON, nullable=True)      # [longitude, latitude] the lane was built from
+    destination_coords = Column(JSON, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LaneSpeedProfile(Base):
+    __tablename__ = "lane_speed_profiles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    lane = Column(String, unique=True, index=True)    # "origin|destination", normalized
+    distance_km = Column(Float)                       # typical road distance
+    base_duration_min = Column(Float)                 # free-flow driving time
+    factors = Column(LargeBinary)                     # 168 float32 traffic factors, Monday 00:00 UTC first
+    sample_count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class JobRun(Base):
+    """When a periodic job last completed, shared by all API processes."""
+    __tablename__ = "job_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job = Column(String, unique=True, index=True, nullable=False)
+    finished_at = Column(DateTime, nullable=False)
+
+
+class CityWeatherFactor(Base):
+    __tablename__ = "city_weather_factors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    city = Column(String, unique=True, index=True)    # normalized city name
+    factor = Column(Float, nullable=False)            # last live weather delay factor
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
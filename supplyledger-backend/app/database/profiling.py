@@ -0,0 +1,164 @@
+"""
+Development/staging query profiler.
+
+Installed on the engine when SQL_PROFILING is enabled. For each request it:
+1. Groups executed statements by normalized SQL (literals and bind
+   parameters collapsed), flagging any group that runs at least
+   SQL_N_PLUS_ONE_THRESHOLD times as a likely N+1 pattern
+2. Flags exact repeats (same SQL and parameters) as redundant lookups
+3. Logs statements slower than SQL_SLOW_QUERY_MS together with their
+   EXPLAIN plan
+
+With SQL_QUERY_COUNT_HEADER enabled, responses carry X-Query-Count,
+X-Query-Time-Ms and X-Commit-Count headers.
+"""
+
+import logging
+import os
+import re
+import time
+from collections import Counter
+
+from sqlalchemy import event
+
+from app.monitoring.context import RequestStats, current_request_stats, get_request_stats
+
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name: str, default: str = "0") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+SQL_PROFILING = _env_flag("SQL_PROFILING")
+SQL_QUERY_COUNT_HEADER = _env_flag("SQL_QUERY_COUNT_HEADER")
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "3"))
+SQL_EXPLAIN_SLOW_QUERIES = _env_flag("SQL_EXPLAIN_SLOW_QUERIES", "1")
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_BIND_PARAMETER = re.compile(r"%\(\w+\)s|%s|:\w+|\?")
+_PARAMETER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Reduce a statement to its shape, e.g.
+    "SELECT * FROM orders WHERE id IN (%(id_1)s, %(id_2)s)" -> "SELECT * FROM orders WHERE id IN (?)"
+    """
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _STRING_LITERAL.sub("?", normalized)
+    normalized = _BIND_PARAMETER.sub("?", normalized)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    return _PARAMETER_LIST.sub("(?)", normalized)
+
+
+def _explain(conn, statement: str, parameters) -> str:
+    """EXPLAIN a statement on the same connection through a raw DBAPI cursor."""
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def install_query_profiler(engine):
+    """Attach the profiler's cursor-execute listeners to an engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["profile_started"].pop()) * 1000
+
+        stats = get_request_stats()
+        if stats is not None:
+            profile = stats.extras.setdefault("sql_profile", {"shapes": Counter(), "exact": Counter()})
+            profile["shapes"][normalize_sql(statement)] += 1
+            if not executemany:
+                profile["exact"][(statement, repr(parameters))] += 1
+
+        if elapsed_ms >= SQL_SLOW_QUERY_MS:
+            plan = None
+            if SQL_EXPLAIN_SLOW_QUERIES and not executemany and statement.lstrip().upper().startswith("SELECT"):
+                try:
+                    plan = _explain(conn, statement, parameters)
+                except Exception as e:
+                    plan = f"(EXPLAIN failed: {e})"
+            logger.warning(
+                "Slow query (%.1f ms): %s\nParameters: %r%s",
+                elapsed_ms, _WHITESPACE.sub(" ", statement).strip(), parameters,
+                f"\nPlan:\n{plan}" if plan else ""
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("profile_started"):
+            connection.info["profile_started"].pop()
+
+
+def report_request(method: str, path: str, stats: RequestStats):
+    """Log likely N+1 groups and exact repeats collected for one request."""
+    profile = stats.extras.get("sql_profile")
+    if not profile:
+        return
+
+    for shape, count in profile["shapes"].most_common():
+        if count < SQL_N_PLUS_ONE_THRESHOLD:
+            break
+        logger.warning("Possible N+1 on %s %s: %d x %s", method, path, count, shape)
+
+    for (statement, parameters), count in profile["exact"].items():
+        if count > 1:
+            logger.warning(
+                "Repeated identical query on %s %s: %d x %s %s",
+                method, path, count, _WHITESPACE.sub(" ", statement).strip(), parameters
+            )
+
+
+class QueryProfilerMiddleware:
+    """
+    Report per-request SQL profiles and, optionally, add query-count headers.
+
+    Works inside MetricsMiddleware (reusing its request stats) or on its own.
+    """
+
+    def __init__(self, app, add_headers: bool = SQL_QUERY_COUNT_HEADER, report: bool = SQL_PROFILING):
+        self.app = app
+        self.add_headers = add_headers
+        self.report = report
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = get_request_stats()
+        token = None
+        if stats is None:
+            stats = RequestStats()
+            token = current_request_stats.set(stats)
+
+        async def send_wrapper(message):
+            if self.add_headers and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(stats.query_count).encode()))
+                headers.append((b"x-query-time-ms", f"{stats.query_time * 1000:.2f}".encode()))
+                headers.append((b"x-commit-count", str(stats.commit_count).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if self.report:
+                report_request(scope["method"], scope["path"], stats)
+            if token is not None:
+                current_request_stats.reset(token)
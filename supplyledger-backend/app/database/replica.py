@@ -0,0 +1,91 @@
+"""
+Read-replica stickiness.
+
+GET endpoints read from the replica (READ_DATABASE_URL). A replica can lag
+the primary, so a client that just wrote must not read from it straight
+away. After a successful write request:
+1. The user_id the request was about (path or query parameter) is
+   remembered in-process for PRIMARY_STICKY_SECONDS
+2. The response sets a short-lived cookie, covering routes that carry no
+   user_id and other API processes
+
+While either is present, that user's or client's reads go to the primary.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+
+PRIMARY_STICKY_SECONDS = float(os.getenv("PRIMARY_STICKY_SECONDS", "5"))
+STICKY_COOKIE = "sl_read_primary"
+
+_READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_recent_writers: Dict[str, float] = {}
+_recent_writers_lock = threading.Lock()
+
+
+def mark_write(user_key: str, now: Optional[float] = None):
+    """Send this user's reads to the primary for PRIMARY_STICKY_SECONDS."""
+    now = time.monotonic() if now is None else now
+    with _recent_writers_lock:
+        _recent_writers[user_key] = now + PRIMARY_STICKY_SECONDS
+        # Drop expired entries so the map stays the size of the active write set
+        if len(_recent_writers) > 1024:
+            for key in [key for key, expires in _recent_writers.items() if expires <= now]:
+                del _recent_writers[key]
+
+
+def recently_wrote(user_key: str) -> bool:
+    with _recent_writers_lock:
+        expires = _recent_writers.get(user_key)
+        if expires is None:
+            return False
+        if expires <= time.monotonic():
+            del _recent_writers[user_key]
+            return False
+        return True
+
+
+def _user_key(path_params: dict, query_string: bytes) -> Optional[str]:
+    user_id = path_params.get("user_id")
+    if user_id is None:
+        values = parse_qs(query_string.decode("latin-1")).get("user_id")
+        user_id = values[0] if values else None
+    return None if user_id is None else str(user_id)
+
+
+def prefers_primary(request) -> bool:
+    """Whether a read request should skip the replica."""
+    if request.cookies.get(STICKY_COOKIE):
+        return True
+    user_key = _user_key(request.path_params, request.scope.get("query_string", b""))
+    return user_key is not None and recently_wrote(user_key)
+
+
+class ReplicaStickinessMiddleware:
+    """Mark successful writes so the writer's next reads use the primary."""
+
+    def __init__(self, app):
+        self.app = app
+        self.cookie = f"{STICKY_COOKIE}=1; Max-Age={max(1, int(PRIMARY_STICKY_SECONDS))}; Path=/; HttpOnly; SameSite=Lax".encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in _READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                # The router has filled in path_params by the time the response starts
+                user_key = _user_key(scope.get("path_params", {}), scope.get("query_string", b""))
+                if user_key is not None:
+                    mark_write(user_key)
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", self.cookie))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,77 @@
+"""
+One transaction per mutating request (unit of work).
+
+Routers created with route_class=UnitOfWorkRoute commit the request's
+write session (from get_db) exactly once: after the handler has returned
+and its response has been rendered, but before anything is sent. Handlers
+therefore never commit. They add and modify rows, and call db.flush() when
+they need database-assigned ids, want version conflicts surfaced early, or
+return rows whose flushed state (version, updated_at) the response shows.
+
+If the handler raises anything, HTTPException included, the whole request
+is rolled back, so a failing later step no longer leaves earlier steps
+committed. A commit that fails is reported instead of the rendered
+response (409 for a version conflict).
+
+This is a route class rather than a commit in get_db because FastAPI runs
+the code after a dependency's yield only once the response has been sent,
+which is too late to report a failed commit.
+"""
+
+import logging
+from typing import Callable, Coroutine, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+logger = logging.getLogger(__name__)
+
+# request.state attribute holding the request's write session
+WRITE_SESSION_ATTR = "write_session"
+
+
+def register_write_session(request: Request, db: Session):
+    """Make a session the one UnitOfWorkRoute commits for this request."""
+    setattr(request.state, WRITE_SESSION_ATTR, db)
+
+
+def _write_session(request: Request) -> Optional[Session]:
+    return getattr(request.state, WRITE_SESSION_ATTR, None)
+
+
+def _commit(db: Session):
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Conflicting concurrent update; re-read and retry")
+    except Exception:
+        db.rollback()
+        raise
+
+
+class UnitOfWorkRoute(APIRoute):
+    """APIRoute that commits the request's write session once, before responding."""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[None, None, Response]]:
+        handler = super().get_route_handler()
+
+        async def unit_of_work_handler(request: Request) -> Response:
+            try:
+                response = await handler(request)
+            except Exception:
+                db = _write_session(request)
+                if db is not None:
+                    # Release row locks now rather than when the session closes after sending
+                    await run_in_threadpool(db.rollback)
+                raise
+
+            db = _write_session(request)
+            if db is not None:
+                await run_in_threadpool(_commit, db)
+            return response
+
+        return unit_of_work_handler
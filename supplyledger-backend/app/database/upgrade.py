@@ -0,0 +1,141 @@
+"""
+In-place schema upgrade for existing databases.
+
+Base.metadata.create_all() creates missing tables but never alters
+existing ones, so columns and indexes added to the models since a
+database was created (version counters, typed coordinates and geohashes,
+shipments.delivered_at, search and dispatch indexes) are missing and
+queries fail with "no such column". This job brings such a database up
+to the current models without dropping data:
+1. Creates missing tables (archive, rollup, lane and link tables)
+2. Adds missing columns with ALTER TABLE ... ADD COLUMN; NOT NULL columns
+   get their scalar default (version starts at 1 for existing rows)
+3. Creates missing indexes
+4. Rebuilds the daily order rollups from existing orders
+
+Every step skips what already exists, so the job can be re-run. Run it
+with the API stopped, before starting the new version; then fill the
+new coordinate columns with `python -m app.spatial.backfill`.
+
+Usage:
+    python -m app.database.upgrade
+    python -m app.database.upgrade --skip-rollups
+"""
+
+import argparse
+import logging
+from typing import List, Set
+
+from sqlalchemy import inspect, literal
+from sqlalchemy.engine import Connection, Engine
+
+from app.analytics.rollups import rebuild_rollups
+from app.database.database import SessionLocal, engine as default_engine
+from app.database.models import Base
+
+logger = logging.getLogger(__name__)
+
+
+def _column_ddl(connection: Connection, column) -> str:
+    """ADD COLUMN clause for a model column, with its scalar default if it has one."""
+    preparer = connection.dialect.identifier_preparer
+    clause = f"{preparer.quote(column.name)} {column.type.compile(dialect=connection.dialect)}"
+
+    default = column.default
+    if default is not None and default.is_scalar:
+        value = literal(default.arg, column.type).compile(
+            dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+        )
+        clause += f" DEFAULT {value}"
+        if not column.nullable:
+            clause += " NOT NULL"
+    elif not column.nullable:
+        logger.warning("%s.%s has no scalar default; adding it as nullable", column.table.name, column.name)
+    return clause
+
+
+def add_missing_columns(connection: Connection) -> List[str]:
+    """ALTER existing tables to add model columns they lack; returns "table.column" names added."""
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    preparer = connection.dialect.identifier_preparer
+
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            connection.exec_driver_sql(
+                f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {_column_ddl(connection, column)}"
+            )
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _index_names(connection: Connection, table_name: str) -> Set[str]:
+    if connection.dialect.name == "sqlite":
+        # SQLite reflection skips expression indexes (the search indexes)
+        rows = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table_name,)
+        )
+        return {row[0] for row in rows}
+    return {index["name"] for index in inspect(connection).get_indexes(table_name)}
+
+
+def create_missing_indexes(connection: Connection) -> List[str]:
+    """Create model indexes missing from existing tables; returns their names."""
+    created = []
+    for table in Base.metadata.sorted_tables:
+        present = _index_names(connection, table.name)
+        missing = [index for index in table.indexes if index.name not in present]
+        if not missing:
+            continue
+        for index in missing:
+            # Trigram indexes are skipped (ddl_if) when pg_trgm is unavailable
+            index.create(bind=connection)
+        present = _index_names(connection, table.name)
+        created.extend(index.name for index in missing if index.name in present)
+    return created
+
+
+def upgrade_schema(bind: Engine = default_engine) -> dict:
+    """
+    Bring an existing database up to the current models (steps 1-3).
+
+    Returns:
+        {"columns": [...], "indexes": [...]} naming what was added
+    """
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as connection:
+        columns = add_missing_columns(connection)
+    with bind.begin() as connection:
+        indexes = create_missing_indexes(connection)
+
+    for name in columns:
+        logger.info("Added column %s", name)
+    for name in indexes:
+        logger.info("Created index %s", name)
+    return {"columns": columns, "indexes": indexes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade an existing database to the current schema")
+    parser.add_argument("--skip-rollups", action="store_true", help="Do not rebuild the daily order rollups")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = upgrade_schema()
+    print(f"✅ Added {len(result['columns'])} columns and {len(result['indexes'])} indexes")
+
+    if not args.skip_rollups:
+        session = SessionLocal()
+        try:
+            written = rebuild_rollups(session)
+        finally:
+            session.close()
+        print(f"✅ Rebuilt {written} daily rollup rows")
+
+    print("Next: python -m app.spatial.backfill  (coordinates and geohashes for existing rows)")
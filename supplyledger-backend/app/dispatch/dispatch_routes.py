@@ -0,0 +1,36 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.database.database import get_db
+from app.database.unit_of_work import UnitOfWorkRoute
+from app.dispatch.scheduler import DISPATCH_CAPACITY_KG, DISPATCH_MAX_ORDERS, dispatch_pending_orders
+
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+
+@router.post("/run")
+def run_dispatch(
+    user_id: Optional[int] = None,
+    max_shipments: Optional[int] = Query(None, ge=1),
+    capacity_kg: float = Query(DISPATCH_CAPACITY_KG, gt=0),
+    max_orders: int = Query(DISPATCH_MAX_ORDERS, ge=1),
+    dry_run: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Turn pending orders into consolidated shipments.
+
+    Orders are taken by priority, then due date. Orders of the same owner on
+    the same lane share a shipment up to capacity_kg and max_orders. With
+    dry_run the plan is returned and nothing is created.
+    """
+    return dispatch_pending_orders(
+        db,
+        user_id=user_id,
+        max_shipments=max_shipments,
+        capacity_kg=capacity_kg,
+        max_orders=max_orders,
+        dry_run=dry_run
+    )
@@ -0,0 +1,429 @@
+"""
+Dispatch scheduler: turn pending orders into consolidated shipments.
+
+Pending orders are read as plain column rows and grouped into lanes:
+orders of the same owner between the same two cities. Each lane is a heap
+keyed on (priority rank, due date, id), and a heap of lanes keyed on
+their most urgent order decides which shipment is planned next:
+
+1. Pop the most urgent lane; its head order leads a new shipment
+2. Fill the shipment from the same lane in urgency order (first fit)
+   while it stays within DISPATCH_CAPACITY_KG and DISPATCH_MAX_ORDERS.
+   Up to DISPATCH_FILL_LOOKAHEAD orders that don't fit are passed over
+   and put back
+3. Push the lane back keyed on its new head
+
+Planning is O(n log n) in memory. Creating the shipments is set-based:
+orders are claimed with one guarded UPDATE per batch (still Pending,
+version bumped), so concurrent runs and edits cannot dispatch an order
+twice. The claimed plans are then inserted with one executemany, hashed,
+and linked to their orders through shipment_orders. The lead order is
+also the shipment's order_id, so ownership checks and per-order lookups
+keep working.
+
+A periodic task runs it every DISPATCH_INTERVAL_SECONDS (0, the default,
+disables it).
+
+Usage:
+    python -m app.dispatch.scheduler --dry-run
+    python -m app.dispatch.scheduler --user-id 7 --max-shipments 100
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.analytics.lanes import SHIPMENT_LANES, record_lane_counts_on_commit
+from app.analytics.rollups import record_status_change
+from app.blockchain.ledger import generate_blockchain_hash
+from app.database.database import SessionLocal
+from app.database.models import LaneRoute, Order, Shipment, ShipmentOrder
+from app.orders.order_service import update_user_analytics
+from app.routing.lane_table import estimate_delivery, estimate_lane
+from app.spatial.spatial_service import shipment_location_fields
+from app.utils.city_coords import lookup_local_coordinates, normalize_city_name
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_CAPACITY_KG = float(os.getenv("DISPATCH_CAPACITY_KG", "1000"))
+DISPATCH_MAX_ORDERS = int(os.getenv("DISPATCH_MAX_ORDERS", "50"))
+DISPATCH_FILL_LOOKAHEAD = int(os.getenv("DISPATCH_FILL_LOOKAHEAD", "32"))
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", "1000"))
+DISPATCH_INTERVAL_SECONDS = float(os.getenv("DISPATCH_INTERVAL_SECONDS", "0"))
+
+PENDING_STATUS = "Pending"
+DISPATCHED_STATUS = "In Transit"
+
+# Most urgent first; unknown priorities go last
+PRIORITY_RANKS = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+
+# Shipments listed in a dispatch result; the rest are only counted
+MAX_REPORTED_SHIPMENTS = 1000
+
+PENDING_COLUMNS = (
+    Order.id,
+    Order.order_id,
+    Order.user_id,
+    Order.origin,
+    Order.destination,
+    Order.weight,
+    Order.priority,
+    Order.due_date,
+    Order.value,
+    Order.status,
+    Order.created_at,
+    Order.origin_lat,
+    Order.origin_lon,
+    Order.destination_lat,
+    Order.destination_lon,
+)
+
+# (user_id, normalized origin, normalized destination)
+LaneKey = Tuple[Any, str, str]
+
+
+def urgency(order) -> Tuple[int, datetime, int]:
+    """Heap key of a pending order: priority rank, then due date, then age (id)."""
+    rank = PRIORITY_RANKS.get((order.priority or "medium").lower(), len(PRIORITY_RANKS))
+    return rank, order.due_date or datetime.max, order.id
+
+
+def lane_of(order) -> LaneKey:
+    """Orders on the same lane can share a shipment."""
+    return order.user_id, normalize_city_name(order.origin or ""), normalize_city_name(order.destination or "")
+
+
+class PlannedShipment:
+    """Orders planned onto one shipment, most urgent (the lead) first."""
+
+    __slots__ = ("orders", "weight")
+
+    def __init__(self, orders: list):
+        self.orders = orders
+        self.weight = sum(order.weight or 0 for order in orders)
+
+    @property
+    def lead(self):
+        return self.orders[0]
+
+    def restricted_to(self, order_ids: Set[int]) -> Optional["PlannedShipment"]:
+        """The plan with only the given orders (by id); None if none remain."""
+        orders = [order for order in self.orders if order.id in order_ids]
+        return PlannedShipment(orders) if orders else None
+
+
+def plan_shipments(
+    orders: list,
+    capacity_kg: float = DISPATCH_CAPACITY_KG,
+    max_orders: int = DISPATCH_MAX_ORDERS,
+    max_shipments: Optional[int] = None,
+    lookahead: int = DISPATCH_FILL_LOOKAHEAD
+) -> List[PlannedShipment]:
+    """
+    Group pending orders into shipments, most urgent shipment first.
+
+    Args:
+        orders: Rows with id, user_id, origin, destination, weight, priority, due_date
+        capacity_kg: Weight limit per shipment; a heavier order ships alone
+        max_orders: Orders per shipment
+        max_shipments: Stop after planning this many shipments
+
+    Returns:
+        Planned shipments in dispatch order
+    """
+    lanes: Dict[LaneKey, list] = defaultdict(list)
+    for order in orders:
+        lanes[lane_of(order)].append((urgency(order), order))
+
+    queue = []
+    for lane, entries in lanes.items():
+        heapq.heapify(entries)
+        queue.append((entries[0][0], lane))
+    heapq.heapify(queue)
+
+    plans: List[PlannedShipment] = []
+    while queue and (max_shipments is None or len(plans) < max_shipments):
+        _, lane = heapq.heappop(queue)
+        entries = lanes[lane]
+        _, lead = heapq.heappop(entries)
+
+        members = [lead]
+        load = lead.weight or 0
+        passed_over = []
+        while entries and len(members) < max_orders and load < capacity_kg and len(passed_over) < lookahead:
+            entry = heapq.heappop(entries)
+            weight = entry[1].weight or 0
+            if load + weight <= capacity_kg:
+                members.append(entry[1])
+                load += weight
+            else:
+                passed_over.append(entry)
+        for entry in passed_over:
+            heapq.heappush(entries, entry)
+
+        plans.append(PlannedShipment(members))
+        if entries:
+            heapq.heappush(queue, (entries[0][0], lane))
+    return plans
+
+
+def _coordinates(lon, lat) -> Optional[List[float]]:
+    return [lon, lat] if lon is not None and lat is not None else None
+
+
+def _lane_estimates(db: Session, plans: List[PlannedShipment]) -> Dict[LaneKey, Optional[dict]]:
+    """
+    Coordinates, distance and driving time per lane (see lane_of) of the plans.
+
+    One lane-table query for all lanes; lanes missing from it are estimated
+    from the orders' city coordinates (resolved at order time or by the
+    spatial backfill, so no geocoding call happens here). None for lanes
+    that cannot be routed at all. Keyed by the normalized lane so a plan
+    whose lead changes spelling (restricted_to) still finds its estimate.
+    """
+    leads = {}
+    for plan in plans:
+        leads.setdefault(lane_of(plan.lead), plan.lead)
+    normalized = {(origin, destination) for _, origin, destination in leads}
+    known = {}
+    origins = {origin for origin, _ in normalized}
+    for row in db.execute(
+        select(LaneRoute.origin, LaneRoute.destination, LaneRoute.distance_km, LaneRoute.duration_min)
+        .where(LaneRoute.origin.in_(origins))
+    ):
+        if (row.origin, row.destination) in normalized:
+            known[(row.origin, row.destination)] = (row.distance_km, row.duration_min)
+
+    estimates = {}
+    for key, order in leads.items():
+        source_coords = _coordinates(order.origin_lon, order.origin_lat) or lookup_local_coordinates(order.origin)
+        dest_coords = _coordinates(order.destination_lon, order.destination_lat) or lookup_local_coordinates(order.destination)
+
+        lane = known.get(key[1:])
+        if lane:
+            distance_km, duration_min = lane
+        elif source_coords and dest_coords:
+            distance_km, duration_min = estimate_lane(source_coords, dest_coords)
+        else:
+            estimates[key] = None
+            continue
+        estimates[key] = {
+            "source_coords": source_coords,
+            "dest_coords": dest_coords,
+            "location_fields": shipment_location_fields(source_coords, dest_coords),
+            "distance_km": round(distance_km),
+            "duration_min": duration_min,
+        }
+    return estimates
+
+
+def _claim_orders(db: Session, ids: List[int], now: datetime) -> Set[int]:
+    """Mark still-pending orders as dispatched; returns the ids actually claimed."""
+    table = Order.__table__
+    claimed: Set[int] = set()
+    for start in range(0, len(ids), DISPATCH_BATCH_SIZE):
+        result = db.execute(
+            update(table)
+            .where(table.c.id.in_(ids[start:start + DISPATCH_BATCH_SIZE]), table.c.status == PENDING_STATUS)
+            .values(status=DISPATCHED_STATUS, version=table.c.version + 1, updated_at=now)
+            .returning(table.c.id)
+        )
+        claimed.update(result.scalars())
+    return claimed
+
+
+def _reserve_shipment_ids(db: Session, count: int) -> List[int]:
+    """
+    Ids for new shipments, reserved so their hashes go into the INSERT itself.
+
+    PostgreSQL draws them from the id sequence. SQLite allows one writer at
+    a time and this transaction already holds the write lock (it claimed the
+    orders), so ids continue after the current maximum.
+    """
+    table = Shipment.__table__
+    if db.get_bind().dialect.name == "postgresql":
+        sequence = func.pg_get_serial_sequence(table.name, table.c.id.name)
+        return list(db.scalars(select(func.nextval(sequence)).select_from(func.generate_series(1, count))))
+    last = db.scalar(select(func.coalesce(func.max(table.c.id), 0)))
+    return list(range(last + 1, last + 1 + count))
+
+
+def _create_shipments(db: Session, plans: List[PlannedShipment], estimates: dict, now: datetime) -> List[int]:
+    """Insert, hash and link one shipment per plan; returns their ids in plan order."""
+    shipment_ids = _reserve_shipment_ids(db, len(plans))
+    rows = []
+    links = []
+    for shipment_id, plan in zip(shipment_ids, plans):
+        lead = plan.lead
+        lane = estimates[lane_of(lead)]
+        rows.append({
+            "id": shipment_id,
+            "order_id": lead.order_id,
+            "source": lead.origin,
+            "destination": lead.destination,
+            "source_coords": lane["source_coords"],
+            "dest_coords": lane["dest_coords"],
+            **lane["location_fields"],
+            "distance_km": lane["distance_km"],
+            "status": "CREATED",
+            "blockchain_hash": generate_blockchain_hash(
+                shipment_id=shipment_id,
+                source=lead.origin,
+                destination=lead.destination,
+                distance_km=lane["distance_km"],
+                status="CREATED"
+            ),
+            "estimated_delivery": estimate_delivery(lane["duration_min"], now),
+            "version": 1,
+            "created_at": now,
+            "updated_at": now,
+        })
+        links.extend({"shipment_id": shipment_id, "order_id": order.order_id, "created_at": now} for order in plan.orders)
+
+    for start in range(0, len(rows), DISPATCH_BATCH_SIZE):
+        db.execute(insert(Shipment.__table__), rows[start:start + DISPATCH_BATCH_SIZE])
+    for start in range(0, len(links), DISPATCH_BATCH_SIZE):
+        db.execute(insert(ShipmentOrder.__table__), links[start:start + DISPATCH_BATCH_SIZE])
+    return shipment_ids
+
+
+def _describe(plan: PlannedShipment, shipment_id: Optional[int] = None) -> dict:
+    return {
+        "shipment_id": shipment_id,
+        "user_id": plan.lead.user_id,
+        "source": plan.lead.origin,
+        "destination": plan.lead.destination,
+        "priority": plan.lead.priority,
+        "due_date": plan.lead.due_date,
+        "total_weight": plan.weight,
+        "order_ids": [order.order_id for order in plan.orders],
+    }
+
+
+def dispatch_pending_orders(
+    db: Session,
+    user_id: Optional[int] = None,
+    max_shipments: Optional[int] = None,
+    capacity_kg: float = DISPATCH_CAPACITY_KG,
+    max_orders: int = DISPATCH_MAX_ORDERS,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """
+    Plan pending orders into consolidated shipments and create them.
+
+    Everything is written in the caller's transaction (the request's unit
+    of work); daily rollups and analytics are updated with it, and shipment
+    lane counts are recorded once it commits.
+
+    Args:
+        db: Database session
+        user_id: Only dispatch this user's orders
+        max_shipments: Create at most this many shipments (most urgent first)
+        capacity_kg: Weight limit per shipment
+        max_orders: Orders per shipment
+        dry_run: Plan only; nothing is written
+
+    Returns:
+        {
+            'pending_orders': int,
+            'shipments_created': int (planned, on a dry run),
+            'orders_dispatched': int,
+            'skipped_unroutable': int (orders on lanes without a distance),
+            'skipped_already_dispatched': int (claimed by a concurrent run or edit),
+            'shipments': [{'shipment_id', 'user_id', 'source', 'destination',
+                           'priority', 'due_date', 'total_weight', 'order_ids'}],
+            'shipments_truncated': bool,
+            'dry_run': bool
+        }
+    """
+    started = time.perf_counter()
+    statement = select(*PENDING_COLUMNS).where(Order.status == PENDING_STATUS)
+    if user_id is not None:
+        statement = statement.where(Order.user_id == user_id)
+    orders = db.execute(statement).all()
+
+    plans = plan_shipments(orders, capacity_kg=capacity_kg, max_orders=max_orders, max_shipments=max_shipments)
+    estimates = _lane_estimates(db, plans)
+    routable = [plan for plan in plans if estimates[lane_of(plan.lead)] is not None]
+    unroutable = sum(len(plan.orders) for plan in plans) - sum(len(plan.orders) for plan in routable)
+    planned_orders = sum(len(plan.orders) for plan in routable)
+
+    shipment_ids: List[Optional[int]] = [None] * len(routable)
+    if not dry_run and routable:
+        now = datetime.utcnow()
+        claimed = _claim_orders(db, [order.id for plan in routable for order in plan.orders], now)
+        routable = [plan for plan in (plan.restricted_to(claimed) for plan in routable) if plan is not None]
+        shipment_ids = _create_shipments(db, routable, estimates, now) if routable else []
+
+        dispatched = [order for plan in routable for order in plan.orders]
+        record_status_change(db.connection(), [order._mapping for order in dispatched], DISPATCHED_STATUS)
+        for owner in sorted({order.user_id for order in dispatched if order.user_id is not None}):
+            update_user_analytics(owner, db)
+
+        lane_counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        for plan in routable:
+            lane_counts[(plan.lead.origin, plan.lead.destination)] += 1
+        record_lane_counts_on_commit(db, SHIPMENT_LANES, dict(lane_counts))
+
+    orders_dispatched = sum(len(plan.orders) for plan in routable)
+    logger.info(
+        "Dispatch%s: %d pending orders -> %d shipments carrying %d orders in %.2fs",
+        " (dry run)" if dry_run else "", len(orders), len(routable), orders_dispatched,
+        time.perf_counter() - started
+    )
+    return {
+        "pending_orders": len(orders),
+        "shipments_created": len(routable),
+        "orders_dispatched": orders_dispatched,
+        "skipped_unroutable": unroutable,
+        "skipped_already_dispatched": planned_orders - orders_dispatched,
+        "shipments": [
+            _describe(plan, shipment_id)
+            for plan, shipment_id in zip(routable[:MAX_REPORTED_SHIPMENTS], shipment_ids)
+        ],
+        "shipments_truncated": len(routable) > MAX_REPORTED_SHIPMENTS,
+        "dry_run": dry_run,
+    }
+
+
+def run_dispatch(session_factory=SessionLocal, **options) -> Dict[str, Any]:
+    """dispatch_pending_orders() in its own transaction (periodic task and command line)."""
+    db = session_factory()
+    try:
+        result = dispatch_pending_orders(db, **options)
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create consolidated shipments for pending orders")
+    parser.add_argument("--user-id", type=int, help="Only dispatch this user's orders")
+    parser.add_argument("--max-shipments", type=int, help="Create at most this many shipments")
+    parser.add_argument("--capacity-kg", type=float, default=DISPATCH_CAPACITY_KG)
+    parser.add_argument("--max-orders", type=int, default=DISPATCH_MAX_ORDERS, help="Orders per shipment")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without creating anything")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = run_dispatch(
+        user_id=args.user_id,
+        max_shipments=args.max_shipments,
+        capacity_kg=args.capacity_kg,
+        max_orders=args.max_orders,
+        dry_run=args.dry_run
+    )
+    print(json.dumps(result, indent=2, default=str))
@@ -1,3 +1,5 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.auth.auth_routes import router as auth_router
@@ -5,17 +7,83 @@ from app.shipments.shipment_routes import router as shipment_router
 from app.users.user_routes import router as user_router
 from app.orders.order_routes import router as order_router
 from app.analytics.analytics_routes import router as analytics_router
-from app.database.database import engine
+from app.spatial.spatial_routes import router as spatial_router
+from app.search.search_routes import router as search_router
+from app.dispatch.dispatch_routes import router as dispatch_router
+from app.routing.routing_routes import router as routing_router
+from app.monitoring.metrics_routes import router as metrics_router
+from app.monitoring.middleware import MetricsMiddleware, install_query_hooks
+from app.admission.middleware import AdmissionMiddleware
+from app.database.database import engine, read_engine
+from app.database.replica import ReplicaStickinessMiddleware
+from app.database.profiling import SQL_PROFILING, SQL_QUERY_COUNT_HEADER, QueryProfilerMiddleware
 from app.database import models
+from app.analytics.lanes import LANE_CHECKPOINT_SECONDS, lane_tracker
+from app.analytics.rollups import backfill_rollups
+from app.ai.precompute import PREDICTION_REFRESH_SECONDS, refresh_predictions
+from app.database.archive import ARCHIVE_INTERVAL_SECONDS, archive_finished_orders
+from app.dispatch.scheduler import DISPATCH_INTERVAL_SECONDS, run_dispatch
+from app.routing import eta  # noqa: F401  (subscribes ETA recomputation to condition changes)
+from app.routing.speed_profiles import SPEED_PROFILE_REFRESH_SECONDS, refresh_speed_profiles, speed_profiles
+from app.utils.scheduler import PeriodicTask
+
+logger = logging.getLogger(__name__)
 
 models.Base.metadata.create_all(bind=engine)
+install_query_hooks(engine)
+if read_engine is not engine:
+    install_query_hooks(read_engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background tasks on startup and flush their state on shutdown"""
+    try:
+        backfill_rollups()
+    except Exception:
+        logger.exception("Could not backfill daily order rollups")
+    try:
+        lane_tracker.load()
+    except Exception:
+        logger.exception("Could not load lane sketch checkpoints")
+    try:
+        speed_profiles.load()
+    except Exception:
+        logger.exception("Could not load lane speed profiles")
+
+    tasks = [
+        PeriodicTask("lane-sketch-checkpoint", LANE_CHECKPOINT_SECONDS, lane_tracker.checkpoint),
+        PeriodicTask("lane-speed-profiles", SPEED_PROFILE_REFRESH_SECONDS, refresh_speed_profiles),
+    ]
+    if PREDICTION_REFRESH_SECONDS > 0:
+        tasks.append(PeriodicTask("delay-prediction-refresh", PREDICTION_REFRESH_SECONDS, refresh_predictions))
+    if ARCHIVE_INTERVAL_SECONDS > 0:
+        tasks.append(PeriodicTask("order-archival", ARCHIVE_INTERVAL_SECONDS, archive_finished_orders))
+    if DISPATCH_INTERVAL_SECONDS > 0:
+        tasks.append(PeriodicTask("order-dispatch", DISPATCH_INTERVAL_SECONDS, run_dispatch))
+    for task in tasks:
+        task.start()
+
+    yield
+
+    for task in tasks:
+        task.stop()
+    try:
+        lane_tracker.checkpoint()
+    except Exception:
+        logger.exception("Could not checkpoint lane sketches on shutdown")
+
 
 app = FastAPI(
     title="SupplyLedger API",
     description="Blockchain and AI enabled Supply Chain System",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
+# Innermost, so rejections still get CORS headers and show up in request metrics
+app.add_middleware(AdmissionMiddleware, routes=app.router.routes)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -25,11 +93,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if read_engine is not engine:
+    app.add_middleware(ReplicaStickinessMiddleware)
+
+if SQL_PROFILING or SQL_QUERY_COUNT_HEADER:
+    app.add_middleware(QueryProfilerMiddleware)
+
+# Outermost, so latency covers the whole middleware stack
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth_router, prefix="/auth", tags=["Auth"])
 app.include_router(user_router, prefix="/users", tags=["Users"])
 app.include_router(order_router, prefix="/orders", tags=["Orders"])
 app.include_router(shipment_router, prefix="/shipments", tags=["Shipments"])
 app.include_router(analytics_router, prefix="/analytics", tags=["Analytics"])
+app.include_router(spatial_router, prefix="/spatial", tags=["Spatial"])
+app.include_router(search_router, prefix="/search", tags=["Search"])
+app.include_router(dispatch_router, prefix="/dispatch", tags=["Dispatch"])
+app.include_router(routing_router, prefix="/routing", tags=["Routing"])
+app.include_router(metrics_router, tags=["Monitoring"])
 
 @app.get("/")
 def root():
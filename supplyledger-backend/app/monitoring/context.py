@@ -0,0 +1,28 @@
+"""
+Per-request statistics shared between the HTTP middleware and the
+SQLAlchemy hooks.
+
+The middleware stores a RequestStats object in a context variable before
+calling the app. Sync handlers and dependencies run in the threadpool with
+a copy of that context, so they mutate the same object.
+"""
+
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class RequestStats:
+    query_count: int = 0
+    query_time: float = 0.0          # seconds spent in cursor.execute
+    commit_count: int = 0
+    extras: dict = field(default_factory=dict)
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+def get_request_stats() -> Optional[RequestStats]:
+    """Stats for the request being handled, or None outside a request."""
+    return current_request_stats.get()
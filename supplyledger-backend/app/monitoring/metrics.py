@@ -0,0 +1,153 @@
+"""
+Prometheus metrics for the API, the database and external providers.
+
+Metric objects are module-level singletons from prometheus_client, so
+recording is a lock-protected float update and cheap enough to leave on.
+"""
+
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Latency buckets tuned for API handlers and provider calls (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "supplyledger_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "supplyledger_db_queries_per_request",
+    "Number of SQL statements executed per HTTP request",
+    ["route"],
+    buckets=QUERY_COUNT_BUCKETS
+)
+
+DB_TIME_PER_REQUEST = Histogram(
+    "supplyledger_db_time_per_request_seconds",
+    "Time spent executing SQL per HTTP request",
+    ["route"],
+    buckets=LATENCY_BUCKETS
+)
+
+DB_COMMITS_PER_REQUEST = Histogram(
+    "supplyledger_db_commits_per_request",
+    "Number of database transactions committed per HTTP request",
+    ["route"],
+    buckets=QUERY_COUNT_BUCKETS
+)
+
+DB_QUERY_DURATION = Histogram(
+    "supplyledger_db_query_duration_seconds",
+    "Latency of individual SQL statements",
+    buckets=LATENCY_BUCKETS
+)
+
+EXTERNAL_CALL_DURATION = Histogram(
+    "supplyledger_external_call_duration_seconds",
+    "Latency of calls to external providers",
+    ["provider", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+
+EXTERNAL_CALL_ERRORS = Counter(
+    "supplyledger_external_call_errors_total",
+    "Failed calls to external providers",
+    ["provider", "error"]
+)
+
+PROVIDER_FALLBACKS = Counter(
+    "supplyledger_provider_fallbacks_total",
+    "Times a local fallback was used instead of a provider result",
+    ["provider", "fallback"]
+)
+
+CIRCUIT_BREAKER_STATE = Gauge(
+    "supplyledger_circuit_breaker_state",
+    "Circuit breaker state per provider (0=closed, 1=half-open, 2=open)",
+    ["provider"]
+)
+
+CIRCUIT_BREAKER_REJECTIONS = Counter(
+    "supplyledger_circuit_breaker_rejections_total",
+    "Provider calls skipped because the circuit breaker was open",
+    ["provider"]
+)
+
+SINGLEFLIGHT_FAN_IN = Histogram(
+    "supplyledger_singleflight_fan_in",
+    "Callers served by one in-flight computation (1 = not coalesced)",
+    ["operation"],
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100)
+)
+
+SINGLEFLIGHT_COALESCED = Counter(
+    "supplyledger_singleflight_coalesced_total",
+    "Calls that waited for an identical in-flight computation instead of running their own",
+    ["operation"]
+)
+
+ADMISSION_LIMIT = Gauge(
+    "supplyledger_admission_limit",
+    "Configured admission-control limits",
+    ["limit"]
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "supplyledger_admission_in_flight",
+    "Requests admitted to database-bound routes and still running",
+    ["request_class"]
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "supplyledger_admission_queue_depth",
+    "Requests waiting for an admission slot",
+    ["request_class"]
+)
+
+ADMISSION_WAIT = Histogram(
+    "supplyledger_admission_wait_seconds",
+    "Time admitted requests waited for a slot",
+    ["request_class"],
+    buckets=LATENCY_BUCKETS
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "supplyledger_admission_rejections_total",
+    "Requests rejected by admission control",
+    ["reason", "request_class"]
+)
+
+# Provider names used as label values
+ROUTING_PROVIDER = "openrouteservice"
+WEATHER_PROVIDER = "openweather"
+GEOCODING_PROVIDER = "nominatim"
+
+
+@contextmanager
+def track_external_call(provider: str):
+    """
+    Time a provider call and count its failures.
+
+    Usage:
+        with track_external_call(ROUTING_PROVIDER):
+            response = requests.post(...)
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        EXTERNAL_CALL_DURATION.labels(provider, "error").observe(time.perf_counter() - started)
+        EXTERNAL_CALL_ERRORS.labels(provider, type(e).__name__).inc()
+        raise
+    EXTERNAL_CALL_DURATION.labels(provider, "ok").observe(time.perf_counter() - started)
+
+
+def record_fallback(provider: str, fallback: str):
+    """Count a fallback taken instead of a provider result."""
+    PROVIDER_FALLBACKS.labels(provider, fallback).inc()
@@ -0,0 +1,99 @@
+"""
+Request instrumentation.
+
+MetricsMiddleware is a plain ASGI middleware (no BaseHTTPMiddleware task
+hop). It times each request until its last body chunk is sent and labels
+it with the matched route template, so /shipments/{shipment_id} is one
+series rather than one per ID.
+
+install_query_hooks() attaches cursor-execute and commit listeners to an
+engine that count statements, their time and commits into the current
+request's stats.
+"""
+
+import time
+
+from sqlalchemy import event
+
+from app.monitoring.context import RequestStats, current_request_stats, get_request_stats
+from app.monitoring.metrics import (
+    DB_COMMITS_PER_REQUEST,
+    DB_QUERIES_PER_REQUEST,
+    DB_QUERY_DURATION,
+    DB_TIME_PER_REQUEST,
+    HTTP_REQUEST_DURATION
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(scope) -> str:
+    """Path template of the route that handled the request."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Record per-route latency and per-request database usage."""
+
+    def __init__(self, app, excluded_paths=("/metrics",)):
+        self.app = app
+        self.excluded_paths = set(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request_stats.reset(token)
+
+            route = route_template(scope)
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status_code)).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(stats.query_count)
+            DB_TIME_PER_REQUEST.labels(route).observe(stats.query_time)
+            DB_COMMITS_PER_REQUEST.labels(route).observe(stats.commit_count)
+
+
+def install_query_hooks(engine):
+    """Count and time every statement executed on an engine, and count commits."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERY_DURATION.observe(elapsed)
+
+        stats = get_request_stats()
+        if stats is not None:
+            stats.query_count += 1
+            stats.query_time += elapsed
+
+    @event.listens_for(engine, "commit")
+    def _commit(conn):
+        stats = get_request_stats()
+        if stats is not None:
+            stats.commit_count += 1
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
@@ -1,17 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Request, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
-from app.database.database import get_db
-from app.database.models import Order, OrderAnalytics
+from typing import Optional
+import io
+from app.database.database import get_db, get_read_db, read_session_factory
+from app.database.models import ArchivedOrder, Order
+from app.database.archive import find_order, find_order_version, is_archived
+from app.database.concurrency import check_version, flush_or_conflict
+from app.database.unit_of_work import UnitOfWorkRoute
+from app.analytics.rollups import fetch_user_totals
 from app.schemas import OrderCreate, OrderResponse, OrderUpdate
-import uuid
+from app.utils.serialization import (
+    JSON_MEDIA_TYPE,
+    binary_rows_response,
+    column_python_types,
+    negotiate_media_type,
+    rows_to_dicts
+)
+from app.orders.order_service import generate_order_id, calculate_order_value, update_user_analytics
+from app.utils.ids import normalize_order_id
+from app.utils.etags import check_not_modified, make_etag
+from app.spatial.spatial_service import order_location_fields
+from app.bulk.importer import SUPPORTED_FORMATS, detect_format, import_orders
+from app.bulk import exporter
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
+# Columns served by the list endpoint, read as plain row tuples
+ORDER_LIST_COLUMNS = [
+    Order.id,
+    Order.order_id,
+    Order.user_id,
+    Order.origin,
+    Order.destination,
+    Order.weight,
+    Order.priority,
+    Order.status,
+    Order.due_date,
+    Order.value,
+    Order.created_at,
+    Order.updated_at,
+]
 
-def generate_order_id():
-    """Generate unique order ID"""
-    return f"ORD-{str(uuid.uuid4())[:8].upper()}"
+
+def _raise_missing_order(db: Session, order_id: str):
+    """404 for unknown orders, 409 for archived (read-only) ones."""
+    if is_archived(db, order_id):
+        raise HTTPException(status_code=409, detail="Order is archived and can no longer be changed")
+    raise HTTPException(status_code=404, detail="Order not found")
 
 
 @router.post("/create", response_model=OrderResponse)
@@ -19,8 +56,7 @@ def create_order(user_id: int, order_data: OrderCreate, db: Session = Depends(ge
     """Create a new order"""
     order_id = generate_order_id()
     
-    # Calculate order value: weight * 100 (base price per kg)
-    order_value = order_data.weight * 100
+    order_value = calculate_order_value(order_data.weight)
     
     new_order = Order(
         order_id=order_id,
@@ -31,12 +67,12 @@ def create_order(user_id: int, order_data: OrderCreate, db: Session = Depends(ge
         priority=order_data.priority,
         due_date=order_data.due_date,
         status="Pending",
-        value=order_value
+        value=order_value,
+        **order_location_fields(order_data.origin, order_data.destination)
     )
     
     db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
+    db.flush()
     
     # Update analytics
     update_user_analytics(user_id, db)
@@ -44,17 +80,125 @@ def create_order(user_id: int, order_data: OrderCreate, db: Session = Depends(ge
     return new_order
 
 
+@router.post("/import")
+def bulk_import_orders(
+    user_id: int,
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk import orders from an uploaded CSV or NDJSON file.
+
+    The upload is read as a stream and loaded in chunks (COPY on PostgreSQL).
+    Analytics are recomputed once at the end. Rows that fail validation are
+    skipped and listed in the response with their row number.
+    """
+    fmt = format or detect_format(file.filename, file.content_type)
+    if fmt not in SUPPORTED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(SUPPORTED_FORMATS)}")
+
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return import_orders(db, user_id, stream, fmt=fmt)
+    finally:
+        stream.detach()
+
+
+@router.get("/export")
+def export_orders(
+    request: Request,
+    format: str = exporter.CSV_FORMAT,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    status: Optional[str] = None,
+    include_archived: bool = False
+):
+    """
+    Stream orders as CSV or Parquet.
+
+    Rows are read through a server-side cursor and written out batch by
+    batch, so large extracts use constant memory. Filters are optional;
+    dates apply to created_at (date_from inclusive, date_to exclusive).
+    Archived orders are included only when include_archived is set.
+    """
+    if format not in exporter.SUPPORTED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(exporter.SUPPORTED_FORMATS)}")
+
+    return StreamingResponse(
+        exporter.export_stream(
+            exporter.ORDERS_EXPORT, format, user_id, date_from, date_to, status,
+            session_factory=read_session_factory(request),
+            include_archived=include_archived
+        ),
+        media_type=exporter.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{exporter.export_filename(exporter.ORDERS_EXPORT, format)}"'}
+    )
+
+
 @router.get("/list/{user_id}")
-def list_orders(user_id: int, db: Session = Depends(get_db)):
-    """Get all orders for a user"""
-    orders = db.query(Order).filter(Order.user_id == user_id).all()
-    return orders
+def list_orders(
+    user_id: int,
+    request: Request,
+    response: Response,
+    include_archived: bool = False,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get all orders for a user.
+
+    Lists active (not yet archived) orders unless include_archived is set.
+    Serves JSON by default, or MessagePack / Arrow IPC when the Accept
+    header asks for it. Rows are read as tuples, skipping ORM objects.
+    """
+    rows = db.query(*ORDER_LIST_COLUMNS).filter(Order.user_id == user_id).all()
+    if include_archived:
+        archived_columns = [getattr(ArchivedOrder, column.key) for column in ORDER_LIST_COLUMNS]
+        rows += db.query(*archived_columns).filter(ArchivedOrder.user_id == user_id).all()
+    columns = [column.key for column in ORDER_LIST_COLUMNS]
+
+    media_type = negotiate_media_type(request.headers.get("accept"))
+    if media_type != JSON_MEDIA_TYPE:
+        return binary_rows_response(
+            media_type,
+            columns,
+            column_python_types(ORDER_LIST_COLUMNS),
+            rows,
+            metadata={"user_id": user_id}
+        )
+
+    response.headers["Vary"] = "Accept"
+    return rows_to_dicts(columns, rows)
 
 
 @router.get("/detail/{order_id}", response_model=OrderResponse)
-def get_order_details(order_id: str, user_id: int, db: Session = Depends(get_db)):
-    """Get order details by order ID (only for owner)"""
-    order = db.query(Order).filter(Order.order_id == order_id).first()
+def get_order_details(
+    order_id: str,
+    user_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get order details by order ID (only for owner), including archived orders.
+    
+    Responses carry an ETag; a matching If-None-Match is answered 304 from
+    a version-only lookup.
+    """
+    order_id = normalize_order_id(order_id)
+    
+    def tag_fields():
+        current = find_order_version(db, order_id)
+        if current is None or current.user_id != user_id:
+            return None
+        return order_id, current.version, current.updated_at
+    
+    unchanged = check_not_modified(request, "order", tag_fields)
+    if unchanged:
+        return unchanged
+    
+    order = find_order(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -62,20 +206,28 @@ def get_order_details(order_id: str, user_id: int, db: Session = Depends(get_db)
     if order.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized - Order belongs to another user")
     
+    response.headers["ETag"] = make_etag("order", order.order_id, order.version, order.updated_at)
     return order
 
 
 @router.put("/update/{order_id}", response_model=OrderResponse)
 def update_order(order_id: str, user_id: int, order_data: OrderUpdate, db: Session = Depends(get_db)):
-    """Update order status (only for owner)"""
-    order = db.query(Order).filter(Order.order_id == order_id).first()
+    """
+    Update order status (only for owner).
+    
+    Pass the version last read to reject the update if the order changed
+    since; a concurrent write also returns 409 with the current order.
+    """
+    order = db.query(Order).filter(Order.order_id == normalize_order_id(order_id)).first()
     if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+        _raise_missing_order(db, normalize_order_id(order_id))
     
     # Verify user ownership
     if order.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized - Order belongs to another user")
     
+    check_version(order, order_data.version, OrderResponse)
+    
     if order_data.status:
         order.status = order_data.status
     if order_data.priority:
@@ -84,8 +236,7 @@ def update_order(order_id: str, user_id: int, order_data: OrderUpdate, db: Sessi
         order.due_date = order_data.due_date
     
     order.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(order)
+    flush_or_conflict(db, order, OrderResponse)
     
     # Update analytics
     update_user_analytics(order.user_id, db)
@@ -94,17 +245,19 @@ def update_order(order_id: str, user_id: int, order_data: OrderUpdate, db: Sessi
 
 
 @router.get("/stats/{user_id}")
-def get_order_stats(user_id: int, db: Session = Depends(get_db)):
-    """Get order statistics for a user"""
-    orders = db.query(Order).filter(Order.user_id == user_id).all()
+def get_order_stats(user_id: int, db: Session = Depends(get_read_db)):
+    """Get order statistics for a user (from the daily rollups, including archived orders)"""
+    totals = fetch_user_totals(db, user_id, "status")
+    total_orders = sum(count for count, _, _ in totals.values())
+    total_value = sum(value for _, _, value in totals.values())
     
     stats = {
-        "total_orders": len(orders),
-        "delivered": len([o for o in orders if o.status == "Delivered"]),
-        "in_transit": len([o for o in orders if o.status == "In Transit"]),
-        "pending": len([o for o in orders if o.status == "Pending"]),
-        "total_value": sum(o.value for o in orders),
-        "average_value": sum(o.value for o in orders) / len(orders) if orders else 0
+        "total_orders": total_orders,
+        "delivered": totals.get("Delivered", (0, 0, 0))[0],
+        "in_transit": totals.get("In Transit", (0, 0, 0))[0],
+        "pending": totals.get("Pending", (0, 0, 0))[0],
+        "total_value": total_value,
+        "average_value": total_value / total_orders if total_orders else 0
     }
     
     return stats
@@ -113,9 +266,9 @@ def get_order_stats(user_id: int, db: Session = Depends(get_db)):
 @router.put("/cancel/{order_id}", response_model=OrderResponse)
 def cancel_order(order_id: str, user_id: int, db: Session = Depends(get_db)):
     """Cancel an order (only for owner)"""
-    order = db.query(Order).filter(Order.order_id == order_id).first()
+    order = db.query(Order).filter(Order.order_id == normalize_order_id(order_id)).first()
     if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+        _raise_missing_order(db, normalize_order_id(order_id))
     
     # Verify user ownership
     if order.user_id != user_id:
@@ -129,8 +282,7 @@ def cancel_order(order_id: str, user_id: int, db: Session = Depends(get_db)):
     
     order.status = "Cancelled"
     order.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(order)
+    flush_or_conflict(db, order, OrderResponse)
     
     # Update analytics
     update_user_analytics(order.user_id, db)
@@ -141,9 +293,9 @@ def cancel_order(order_id: str, user_id: int, db: Session = Depends(get_db)):
 @router.delete("/delete/{order_id}")
 def delete_order(order_id: str, user_id: int, db: Session = Depends(get_db)):
     """Delete an order (only for owner)"""
-    order = db.query(Order).filter(Order.order_id == order_id).first()
+    order = db.query(Order).filter(Order.order_id == normalize_order_id(order_id)).first()
     if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+        _raise_missing_order(db, normalize_order_id(order_id))
     
     # Verify user ownership
     if order.user_id != user_id:
@@ -151,42 +303,9 @@ def delete_order(order_id: str, user_id: int, db: Session = Depends(get_db)):
     
     user_id_temp = order.user_id
     db.delete(order)
-    db.commit()
+    flush_or_conflict(db, order, OrderResponse)
     
     # Update analytics
     update_user_analytics(user_id_temp, db)
     
     return {"message": "Order deleted successfully"}
-
-
-def update_user_analytics(user_id: int, db: Session):
-    """Update user order analytics"""
-    orders = db.query(Order).filter(Order.user_id == user_id).all()
-    
-    analytics = db.query(OrderAnalytics).filter(OrderAnalytics.user_id == user_id).first()
-    
-    total_value = sum(o.value for o in orders)
-    
-    if analytics:
-        analytics.total_orders = len(orders)
-        analytics.completed_orders = len([o for o in orders if o.status == "Delivered"])
-        analytics.in_transit_orders = len([o for o in orders if o.status == "In Transit"])
-        analytics.pending_orders = len([o for o in orders if o.status == "Pending"])
-        analytics.cancelled_orders = len([o for o in orders if o.status == "Cancelled"])
-        analytics.total_shipment_value = total_value
-        analytics.average_order_value = total_value / len(orders) if orders else 0
-        analytics.updated_at = datetime.utcnow()
-    else:
-        analytics = OrderAnalytics(
-            user_id=user_id,
-            total_orders=len(orders),
-            completed_orders=len([o for o in orders if o.status == "Delivered"]),
-            in_transit_orders=len([o for o in orders if o.status == "In Transit"]),
-            pending_orders=len([o for o in orders if o.status == "Pending"]),
-            cancelled_orders=len([o for o in orders if o.status == "Cancelled"]),
-            total_shipment_value=total_value,
-            average_order_value=total_value / len(orders) if orders else 0
-        )
-        db.add(analytics)
-    
-    db.commit()
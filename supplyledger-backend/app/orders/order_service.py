@@ -1 +1,61 @@
 # Orders service module
+from sqlalchemy.orm import Session
+from datetime import datetime
+from app.database.models import OrderAnalytics
+from app.analytics.rollups import fetch_user_totals
+from app.utils.ids import new_order_id
+from typing import Optional
+
+# Base price per kg used to value an order
+PRICE_PER_KG = 100
+
+
+def generate_order_id(created_at: Optional[datetime] = None):
+    """Generate unique, time-ordered order ID (ORD-<ULID>)"""
+    return new_order_id(created_at)
+
+
+def calculate_order_value(weight: float) -> float:
+    """Calculate order value: weight * base price per kg"""
+    return weight * PRICE_PER_KG
+
+
+def update_user_analytics(user_id: int, db: Session):
+    """
+    Update user order analytics (from the daily rollups, so archived orders still count).
+    
+    Pending order changes are flushed first so the rollups include them;
+    the caller's transaction commits the result.
+    """
+    db.flush()
+    totals = fetch_user_totals(db, user_id, "status")
+    
+    analytics = db.query(OrderAnalytics).filter(OrderAnalytics.user_id == user_id).first()
+    
+    total_orders = sum(count for count, _, _ in totals.values())
+    total_value = sum(value for _, _, value in totals.values())
+    
+    def status_count(status):
+        return totals.get(status, (0, 0, 0))[0]
+    
+    if analytics:
+        analytics.total_orders = total_orders
+        analytics.completed_orders = status_count("Delivered")
+        analytics.in_transit_orders = status_count("In Transit")
+        analytics.pending_orders = status_count("Pending")
+        analytics.cancelled_orders = status_count("Cancelled")
+        analytics.total_shipment_value = total_value
+        analytics.average_order_value = total_value / total_orders if total_orders else 0
+        analytics.updated_at = datetime.utcnow()
+    else:
+        analytics = OrderAnalytics(
+            user_id=user_id,
+            total_orders=total_orders,
+            completed_orders=status_count("Delivered"),
+            in_transit_orders=status_count("In Transit"),
+            pending_orders=status_count("Pending"),
+            cancelled_orders=status_count("Cancelled"),
+            total_shipment_value=total_value,
+            average_order_value=total_value / total_orders if total_orders else 0
+        )
+        db.add(analytics)
@@ -0,0 +1,214 @@
+"""
+Event-driven ETA recomputation for in-transit shipments.
+
+Subscribes to:
+1. WEATHER_FACTOR_CHANGED — a destination city's weather factor moved
+2. SPEED_PROFILES_UPDATED — lane traffic profiles were rebuilt
+
+Affected shipments (status in ETA_IN_TRANSIT_STATUSES, destination in
+the changed set) are read in id-ordered batches through
+ix_shipments_destination_status. Shipments not yet picked up (CREATED)
+keep their creation-time ETA, and ETAs a client set with PUT
+(estimated_delivery_pinned) are never overwritten.
+Each batch is recomputed with numpy in one pass:
+
+    driving time = base time x (1 + traffic factor + weather factor)
+    ETA          = created_at + delivery_hours(driving time)
+
+Base time and traffic come from the lane's speed profile, else the lane
+table, else distance at LANE_AVERAGE_SPEED_KMH. Only rows whose ETA moved
+by more than ETA_CHANGE_THRESHOLD_MINUTES are written, in one executemany
+compare-and-swap UPDATE per batch; shipments updated concurrently are
+re-read and recomputed (bounded, see app/database/concurrency.py).
+"""
+
+import logging
+import os
+from typing import Iterable, List, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.analytics.lanes import lane_key, split_lane_key
+from app.database.concurrency import bulk_compare_and_swap
+from app.database.database import SessionLocal
+from app.database.models import LaneRoute, Shipment
+from app.routing.lane_table import LANE_AVERAGE_SPEED_KMH, delivery_hours
+from app.routing.speed_profiles import hour_of_week, speed_profiles
+from app.utils.city_coords import normalize_city_name
+from app.utils.events import SPEED_PROFILES_UPDATED, WEATHER_FACTOR_CHANGED, subscribe
+from app.utils.weather import latest_weather_factors
+
+logger = logging.getLogger(__name__)
+
+ETA_CHANGE_THRESHOLD_MINUTES = float(os.getenv("ETA_CHANGE_THRESHOLD_MINUTES", "60"))
+ETA_RECOMPUTE_BATCH_SIZE = int(os.getenv("ETA_RECOMPUTE_BATCH_SIZE", "1000"))
+ETA_IN_TRANSIT_STATUSES = tuple(
+    status.strip()
+    for status in os.getenv("ETA_IN_TRANSIT_STATUSES", "IN_TRANSIT,DELAYED").split(",")
+    if status.strip()
+)
+
+# Keeps IN lists on the destination index reasonably sized
+_DESTINATION_CHUNK_SIZE = 500
+
+
+_ETA_COLUMNS = (
+    Shipment.id,
+    Shipment.version,
+    Shipment.source,
+    Shipment.destination,
+    Shipment.distance_km,
+    Shipment.created_at,
+    Shipment.estimated_delivery,
+)
+
+
+def _recomputable():
+    """In-transit shipments whose ETA was not set by a client."""
+    return (
+        Shipment.status.in_(ETA_IN_TRANSIT_STATUSES),
+        Shipment.estimated_delivery_pinned.is_(False),
+    )
+
+
+def _in_transit_batch(destinations: List[str], last_id: int, limit: int):
+    return (
+        select(*_ETA_COLUMNS)
+        .where(
+            func.lower(Shipment.destination).in_(destinations),
+            *_recomputable(),
+            Shipment.id > last_id,
+        )
+        .order_by(Shipment.id)
+        .limit(limit)
+    )
+
+
+def _eta_changes(db, rows, weather_factors: dict) -> List[dict]:
+    """Compare-and-swap changes for the rows whose ETA moved."""
+    etas, moved = compute_etas(db, rows, weather_factors)
+    return [
+        {"id": row.id, "version": row.version, "estimated_delivery": eta}
+        for row, eta, changed in zip(rows, etas.tolist(), moved)
+        if changed
+    ]
+
+
+def _lane_durations(db, lanes: List[str]) -> dict:
+    """Lane-table driving times for the lanes in a batch."""
+    origins, destinations = zip(*(split_lane_key(lane) for lane in lanes))
+    rows = db.execute(
+        select(LaneRoute.origin, LaneRoute.destination, LaneRoute.duration_min)
+        .where(LaneRoute.origin.in_(set(origins)), LaneRoute.destination.in_(set(destinations)))
+    )
+    return {lane_key(origin, destination): duration for origin, destination, duration in rows}
+
+
+def compute_etas(db, rows, weather_factors: dict) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Recompute ETAs for a batch of shipment rows.
+
+    Args:
+        rows: (id, version, source, destination, distance_km, created_at, estimated_delivery)
+        weather_factors: {normalized city: factor}
+
+    Returns:
+        (new ETAs as datetime64[us], mask of rows whose ETA moved past the threshold)
+    """
+    lanes = [lane_key(row.source, row.destination) for row in rows]
+    hours = np.array([hour_of_week(row.created_at) for row in rows], dtype=np.int64)
+    _, profile_base, profile_traffic = speed_profiles.lookup_many(lanes, hours)
+
+    lane_durations = _lane_durations(db, lanes)
+    table_base = np.array([lane_durations.get(lane, np.nan) for lane in lanes], dtype=np.float64)
+    distances = np.array([row.distance_km or 0 for row in rows], dtype=np.float64)
+
+    base = np.where(
+        ~np.isnan(profile_base), profile_base,
+        np.where(~np.isnan(table_base), table_base, distances / LANE_AVERAGE_SPEED_KMH * 60)
+    )
+    traffic = np.nan_to_num(profile_traffic, nan=0.0)
+    weather = np.array(
+        [weather_factors.get(normalize_city_name(row.destination), 0.0) for row in rows],
+        dtype=np.float64
+    )
+
+    total_hours = delivery_hours(base * (1 + traffic + weather))
+    created = np.array([row.created_at for row in rows], dtype="datetime64[us]")
+    etas = created + (total_hours * 3_600_000_000).astype("timedelta64[us]")
+
+    current = np.array([row.estimated_delivery for row in rows], dtype="datetime64[us]")
+    threshold = np.timedelta64(int(ETA_CHANGE_THRESHOLD_MINUTES * 60_000_000), "us")
+    moved = np.isnat(current) | (np.abs(etas - current) > threshold)
+    return etas, moved
+
+
+def recompute_etas(
+    destinations: Iterable[str],
+    session_factory=SessionLocal,
+    batch_size: int = ETA_RECOMPUTE_BATCH_SIZE
+) -> Tuple[int, int]:
+    """
+    Recompute ETAs of in-transit shipments headed to the given cities.
+
+    Args:
+        destinations: City names (normalized before matching)
+        session_factory: Session factory (one session per batch)
+        batch_size: Shipments per read/compute/update round
+
+    Returns:
+        (shipments examined, shipments updated)
+    """
+    cities = sorted({normalize_city_name(city) for city in destinations if city})
+    weather_factors = latest_weather_factors()
+    examined = updated = 0
+
+    for start in range(0, len(cities), _DESTINATION_CHUNK_SIZE):
+        chunk = cities[start:start + _DESTINATION_CHUNK_SIZE]
+        last_id = 0
+        while True:
+            db = session_factory()
+            try:
+                rows = db.execute(_in_transit_batch(chunk, last_id, batch_size)).all()
+                if not rows:
+                    break
+
+                def recompute(ids: List[int]) -> List[dict]:
+                    fresh = db.execute(
+                        select(*_ETA_COLUMNS).where(Shipment.id.in_(ids), *_recomputable())
+                    ).all()
+                    return _eta_changes(db, fresh, weather_factors) if fresh else []
+
+                written = bulk_compare_and_swap(
+                    db, Shipment, _eta_changes(db, rows, weather_factors), recompute
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            examined += len(rows)
+            updated += written
+            last_id = rows[-1].id
+
+    return examined, updated
+
+
+def _on_weather_changed(city: str, factor: float, previous: float):
+    examined, updated = recompute_etas([city])
+    logger.info(
+        "Weather factor for %s changed %.2f -> %.2f: updated %d of %d in-transit ETAs",
+        city, previous, factor, updated, examined
+    )
+
+
+def _on_speed_profiles_updated(lanes: List[str]):
+    examined, updated = recompute_etas(split_lane_key(lane)[1] for lane in lanes)
+    logger.info("Speed profiles updated: updated %d of %d in-transit ETAs", updated, examined)
+
+
+subscribe(WEATHER_FACTOR_CHANGED, _on_weather_changed)
+subscribe(SPEED_PROFILES_UPDATED, _on_speed_profiles_updated)
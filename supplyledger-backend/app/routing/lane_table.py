@@ -0,0 +1,292 @@
+"""
+Precomputed lane table: road distance and typical driving time per city pair.
+
+Built offline, in batches:
+1. Routing provider — OpenRouteService matrix requests, one block of
+   origins x destinations per call
+2. Offline estimate — haversine distance x LANE_ROAD_FACTOR at
+   LANE_AVERAGE_SPEED_KMH, used with --offline, for pairs the provider
+   cannot route, and when a matrix call fails
+
+Shipment creation reads one row by its (origin, destination) unique key,
+so no external call happens in the request path. Rows keep the city
+coordinates they were built from, so shipments on a known lane need no
+geocoding either.
+
+Usage:
+    python -m app.routing.lane_table              # provider, with fallback
+    python -m app.routing.lane_table --offline    # estimates only
+"""
+
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.database.database import SessionLocal
+from app.database.models import LaneRoute, Order, Shipment
+from app.monitoring.metrics import ROUTING_PROVIDER, track_external_call
+from app.utils import maps
+from app.utils.city_coords import CITY_COORDINATES, normalize_city_name
+
+logger = logging.getLogger(__name__)
+
+LANE_ROAD_FACTOR = float(os.getenv("LANE_ROAD_FACTOR", "1.3"))
+LANE_AVERAGE_SPEED_KMH = float(os.getenv("LANE_AVERAGE_SPEED_KMH", "60"))
+LANE_MATRIX_BLOCK_SIZE = int(os.getenv("LANE_MATRIX_BLOCK_SIZE", "50"))
+
+# ETA = handling time + driving time + overnight rest for each full driving day
+ETA_HANDLING_HOURS = float(os.getenv("ETA_HANDLING_HOURS", "12"))
+ETA_DRIVING_HOURS_PER_DAY = float(os.getenv("ETA_DRIVING_HOURS_PER_DAY", "10"))
+
+LANE_SOURCE_PROVIDER = "openrouteservice"
+LANE_SOURCE_ESTIMATE = "haversine"
+
+Pair = Tuple[str, str]
+
+
+def estimate_lane(source_coords, dest_coords) -> Tuple[float, float]:
+    """Offline road estimate: (distance_km, duration_min) from straight-line distance."""
+    straight_km, _ = maps.estimate_distance(source_coords, dest_coords)
+    distance_km = straight_km * LANE_ROAD_FACTOR
+    return distance_km, distance_km / LANE_AVERAGE_SPEED_KMH * 60
+
+
+def delivery_hours(duration_min):
+    """
+    Hours from dispatch to delivery for a driving time.
+
+    Works element-wise on numpy arrays as well as on plain floats.
+    """
+    driving_hours = duration_min / 60
+    rest_hours = (driving_hours // ETA_DRIVING_HOURS_PER_DAY) * (24 - ETA_DRIVING_HOURS_PER_DAY)
+    return ETA_HANDLING_HOURS + driving_hours + rest_hours
+
+
+def estimate_delivery(duration_min: float, start: Optional[datetime] = None) -> datetime:
+    """
+    Delivery time for a lane's driving time.
+
+    Args:
+        duration_min: Typical driving time in minutes
+        start: Dispatch time (defaults to now, UTC)
+    """
+    start = start or datetime.utcnow()
+    return start + timedelta(hours=delivery_hours(duration_min))
+
+
+def lookup_lane(db: Session, origin: str, destination: str) -> Optional[LaneRoute]:
+    """Fetch a lane by city names (normalized) through its unique index."""
+    return (
+        db.query(LaneRoute)
+        .filter(
+            LaneRoute.origin == normalize_city_name(origin),
+            LaneRoute.destination == normalize_city_name(destination),
+        )
+        .first()
+    )
+
+
+def collect_lanes(db: Session) -> Tuple[Dict[str, list], Set[Pair]]:
+    """
+    Cities and city pairs the table should cover.
+
+    Every pair of locally known cities, plus each lane seen on shipments
+    and orders whose two ends have coordinates (locally or stored on a
+    shipment).
+
+    Returns:
+        ({city: [lon, lat]}, {(origin, destination)})
+    """
+    coordinates = dict(CITY_COORDINATES)
+    # One representative shipment per lane (JSON columns can't be DISTINCTed on PostgreSQL)
+    first_per_lane = select(func.min(Shipment.id)).group_by(Shipment.source, Shipment.destination)
+    shipment_rows = db.execute(
+        select(Shipment.source, Shipment.destination, Shipment.source_coords, Shipment.dest_coords)
+        .where(Shipment.id.in_(first_per_lane))
+    ).all()
+    for source, destination, source_coords, dest_coords in shipment_rows:
+        if source and source_coords:
+            coordinates.setdefault(normalize_city_name(source), source_coords)
+        if destination and dest_coords:
+            coordinates.setdefault(normalize_city_name(destination), dest_coords)
+
+    pairs = {(a, b) for a in CITY_COORDINATES for b in CITY_COORDINATES if a != b}
+    order_rows = db.execute(select(Order.origin, Order.destination).distinct()).all()
+    for origin, destination in list(order_rows) + [row[:2] for row in shipment_rows]:
+        pair = (normalize_city_name(origin), normalize_city_name(destination))
+        if pair[0] != pair[1] and pair[0] in coordinates and pair[1] in coordinates:
+            pairs.add(pair)
+
+    return coordinates, pairs
+
+
+def fetch_matrix(origins: List[list], destinations: List[list]):
+    """
+    One OpenRouteService matrix request.
+
+    Returns:
+        (distances_km, durations_min) as origin-major nested lists; cells the
+        provider could not route are None
+    """
+    url = f"{maps.BASE_URL}/v2/matrix/driving-car"
+    body = {
+        "locations": origins + destinations,
+        "sources": list(range(len(origins))),
+        "destinations": list(range(len(origins), len(origins) + len(destinations))),
+        "metrics": ["distance", "duration"],
+        "units": "km",
+    }
+    with maps.routing_breaker.track_call(), track_external_call(ROUTING_PROVIDER):
+        response = requests.post(url, json=body, headers={"Authorization": maps.API_KEY}, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+
+    durations = [
+        [None if seconds is None else seconds / 60 for seconds in row]
+        for row in data["durations"]
+    ]
+    return data["distances"], durations
+
+
+def _blocks(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def compute_lanes(
+    coordinates: Dict[str, list],
+    pairs: Set[Pair],
+    offline: bool = False,
+    block_size: int = LANE_MATRIX_BLOCK_SIZE
+) -> List[dict]:
+    """
+    Distance and duration for each pair, one matrix call per block of
+    origins x destinations that contains a requested pair.
+    """
+    rows = []
+    now = datetime.utcnow()
+
+    def add(origin, destination, distance_km, duration_min, source):
+        rows.append({
+            "origin": origin,
+            "destination": destination,
+            "distance_km": round(distance_km, 2),
+            "duration_min": round(duration_min, 2),
+            "source": source,
+            "origin_coords": coordinates[origin],
+            "destination_coords": coordinates[destination],
+            "updated_at": now,
+        })
+
+    origins = sorted({origin for origin, _ in pairs})
+    destinations = sorted({destination for _, destination in pairs})
+
+    for origin_block in _blocks(origins, block_size):
+        for destination_block in _blocks(destinations, block_size):
+            wanted = [(o, d) for o in origin_block for d in destination_block if (o, d) in pairs]
+            if not wanted:
+                continue
+
+            distances = durations = None
+            if not offline and maps.routing_breaker.allow_request():
+                try:
+                    distances, durations = fetch_matrix(
+                        [coordinates[o] for o in origin_block],
+                        [coordinates[d] for d in destination_block]
+                    )
+                except Exception as e:
+                    logger.warning("Matrix request failed, estimating %d lanes: %s", len(wanted), e)
+
+            for origin, destination in wanted:
+                distance_km = duration_min = None
+                if distances is not None:
+                    i, j = origin_block.index(origin), destination_block.index(destination)
+                    distance_km, duration_min = distances[i][j], durations[i][j]
+                if distance_km is None or duration_min is None:
+                    distance_km, duration_min = estimate_lane(coordinates[origin], coordinates[destination])
+                    add(origin, destination, distance_km, duration_min, LANE_SOURCE_ESTIMATE)
+                else:
+                    add(origin, destination, distance_km, duration_min, LANE_SOURCE_PROVIDER)
+
+    return rows
+
+
+def upsert_lanes(connection, rows: List[dict], batch_size: int = 500):
+    """Insert or replace lane rows by (origin, destination)."""
+    table = LaneRoute.__table__
+    dialect = connection.dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        insert = pg_insert if dialect == "postgresql" else sqlite_insert
+        for start in range(0, len(rows), batch_size):
+            statement = insert(table).values(rows[start:start + batch_size])
+            statement = statement.on_conflict_do_update(
+                index_elements=["origin", "destination"],
+                set_={
+                    "distance_km": statement.excluded.distance_km,
+                    "duration_min": statement.excluded.duration_min,
+                    "source": statement.excluded.source,
+                    "origin_coords": statement.excluded.origin_coords,
+                    "destination_coords": statement.excluded.destination_coords,
+                    "updated_at": statement.excluded.updated_at,
+                }
+            )
+            connection.execute(statement)
+        return
+
+    for row in rows:
+        result = connection.execute(
+            table.update()
+            .where((table.c.origin == row["origin"]) & (table.c.destination == row["destination"]))
+            .values(**row)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+def build_lane_table(db: Session, offline: bool = False, block_size: int = LANE_MATRIX_BLOCK_SIZE) -> Dict[str, int]:
+    """
+    Compute and store all lanes.
+
+    Args:
+        db: Database session (committed on success)
+        offline: Skip the routing provider and use estimates only
+        block_size: Origins (and destinations) per matrix request
+
+    Returns:
+        Lane counts by source
+    """
+    coordinates, pairs = collect_lanes(db)
+    db.rollback()   # don't hold a transaction open during provider calls
+
+    rows = compute_lanes(coordinates, pairs, offline=offline, block_size=block_size)
+    upsert_lanes(db.connection(), rows)
+    db.commit()
+
+    counts: Dict[str, int] = {}
+    for row in rows:
+        counts[row["source"]] = counts.get(row["source"], 0) + 1
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the lane distance/duration table")
+    parser.add_argument("--offline", action="store_true", help="Use haversine estimates only")
+    parser.add_argument("--block-size", type=int, default=LANE_MATRIX_BLOCK_SIZE,
+                        help="Origins and destinations per matrix request")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        counts = build_lane_table(session, offline=args.offline, block_size=args.block_size)
+    finally:
+        session.close()
+    print(f"✅ Built {sum(counts.values())} lanes: {counts}")
@@ -0,0 +1,229 @@
+"""
+Multi-stop route optimization for one truck leaving a fixed origin.
+
+Stops are cities from the local coordinate table (CITY_COORDINATES) or
+explicit coordinates. Leg distances are haversine km x LANE_ROAD_FACTOR,
+the lane table's offline road estimate, from one vectorized matrix.
+
+1. Construction: nearest neighbour from the origin
+2. Improvement, repeated until a full pass finds nothing or the time
+   budget (ROUTE_OPTIMIZER_TIME_BUDGET_MS) runs out:
+   - 2-opt: reverse the stretch between two stops
+   - or-opt: move a run of 1 to ROUTE_OR_OPT_MAX_SEGMENT stops to another
+     place in the route, either way round
+
+The route is a path with both ends fixed: the origin and a terminal that
+is the origin again (return_to_origin) or a virtual end at distance 0
+from every stop (open route). Each move is evaluated against all
+positions at once as numpy vectors, so a pass over n stops is O(n) array
+operations rather than O(n^2) Python steps, and hundreds of stops
+converge within a second or so.
+
+ETAs follow the lane table's model (app/routing/lane_table.py): one
+handling time at the origin, driving at LANE_AVERAGE_SPEED_KMH, overnight
+rest per full driving day, plus ROUTE_STOP_SERVICE_MINUTES at each stop.
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.routing.lane_table import LANE_AVERAGE_SPEED_KMH, LANE_ROAD_FACTOR, delivery_hours
+from app.utils.city_coords import lookup_local_coordinates
+from app.utils.geohash import haversine_matrix
+
+ROUTE_OPTIMIZER_TIME_BUDGET_MS = float(os.getenv("ROUTE_OPTIMIZER_TIME_BUDGET_MS", "1000"))
+ROUTE_OPTIMIZER_MAX_STOPS = int(os.getenv("ROUTE_OPTIMIZER_MAX_STOPS", "1000"))
+ROUTE_OR_OPT_MAX_SEGMENT = int(os.getenv("ROUTE_OR_OPT_MAX_SEGMENT", "3"))
+ROUTE_STOP_SERVICE_MINUTES = float(os.getenv("ROUTE_STOP_SERVICE_MINUTES", "30"))
+
+# Improvements smaller than this (km) are treated as rounding noise
+_MIN_GAIN_KM = 1e-7
+
+
+def resolve_coordinates(city: Optional[str], lat: Optional[float], lon: Optional[float]) -> Optional[List[float]]:
+    """[longitude, latitude] from explicit coordinates, else the local city table (never geocodes)."""
+    if lat is not None and lon is not None:
+        return [lon, lat]
+    return lookup_local_coordinates(city) if city else None
+
+
+def distance_matrix(points: Sequence[Sequence[float]]) -> np.ndarray:
+    """Road-estimate km between every pair of [longitude, latitude] points."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return haversine_matrix(points[:, 1], points[:, 0]) * LANE_ROAD_FACTOR
+
+
+def nearest_neighbour(distances: np.ndarray, terminal: int) -> np.ndarray:
+    """
+    Path from node 0 that always drives to the closest unvisited stop, ending at the terminal.
+
+    Args:
+        distances: Matrix over the origin (0), the stops and the terminal
+        terminal: Index of the terminal node (0 for a round trip)
+    """
+    unvisited = np.ones(distances.shape[0], dtype=bool)
+    unvisited[[0, terminal]] = False
+    path = [0]
+    current = 0
+    while unvisited.any():
+        current = int(np.argmin(np.where(unvisited, distances[current], np.inf)))
+        unvisited[current] = False
+        path.append(current)
+    path.append(terminal)
+    return np.asarray(path)
+
+
+def path_length(distances: np.ndarray, path: np.ndarray) -> float:
+    return float(distances[path[:-1], path[1:]].sum())
+
+
+def _two_opt_pass(distances: np.ndarray, path: np.ndarray, deadline: float) -> bool:
+    """Best reversal for each start position in turn; True if any improved the path."""
+    improved = False
+    last = len(path) - 1
+    for i in range(1, last - 1):
+        if time.perf_counter() > deadline:
+            break
+        a, b = path[i - 1], path[i]
+        # Reverse path[i..j]: edges (a, b) and (path[j], path[j + 1]) become (a, path[j]) and (b, path[j + 1])
+        ends = path[i + 1:last]
+        after = path[i + 2:last + 1]
+        gains = distances[a, b] + distances[ends, after] - distances[a, ends] - distances[b, after]
+        best = int(np.argmax(gains))
+        if gains[best] > _MIN_GAIN_KM:
+            j = i + 1 + best
+            path[i:j + 1] = path[i:j + 1][::-1].copy()
+            improved = True
+    return improved
+
+
+def _or_opt_pass(distances: np.ndarray, path: np.ndarray, deadline: float, max_segment: int) -> bool:
+    """Best relocation for each run of stops in turn; True if any improved the path."""
+    improved = False
+    i = 1
+    while i < len(path) - 1:
+        if time.perf_counter() > deadline:
+            break
+        moved = False
+        for length in range(1, max_segment + 1):
+            end = i + length - 1
+            if end >= len(path) - 1:
+                break
+            prev, first, last, nxt = path[i - 1], path[i], path[end], path[end + 1]
+            removal_gain = distances[prev, first] + distances[last, nxt] - distances[prev, nxt]
+
+            # Candidate edges (u, v) of the path without the segment
+            rest = np.concatenate((path[:i], path[end + 1:]))
+            u, v = rest[:-1], rest[1:]
+            forward = distances[u, first] + distances[last, v]
+            backward = distances[u, last] + distances[first, v]
+            insert_cost = np.minimum(forward, backward) - distances[u, v]
+            insert_cost[i - 1] = np.inf   # the edge the segment was removed from
+            k = int(np.argmin(insert_cost))
+            if removal_gain - insert_cost[k] > _MIN_GAIN_KM:
+                segment = path[i:end + 1]
+                if backward[k] < forward[k]:
+                    segment = segment[::-1]
+                path[:] = np.concatenate((rest[:k + 1], segment, rest[k + 1:]))
+                improved = moved = True
+                break
+        if not moved:
+            i += 1
+    return improved
+
+
+def improve(distances: np.ndarray, path: np.ndarray, time_budget_ms: float,
+            max_segment: int = ROUTE_OR_OPT_MAX_SEGMENT) -> Tuple[np.ndarray, int, bool]:
+    """
+    Alternate 2-opt and or-opt passes until neither helps or time runs out.
+
+    Returns:
+        (improved path, passes run, whether it converged within the budget)
+    """
+    deadline = time.perf_counter() + time_budget_ms / 1000
+    path = path.copy()
+    passes = 0
+    while time.perf_counter() < deadline:
+        passes += 1
+        improved = _two_opt_pass(distances, path, deadline)
+        improved = _or_opt_pass(distances, path, deadline, max_segment) or improved
+        if not improved:
+            return path, passes, True
+    return path, passes, False
+
+
+def optimize_route(
+    origin: Sequence[float],
+    stops: Sequence[Sequence[float]],
+    return_to_origin: bool = False,
+    time_budget_ms: float = ROUTE_OPTIMIZER_TIME_BUDGET_MS,
+    departure: Optional[datetime] = None,
+    service_minutes: float = ROUTE_STOP_SERVICE_MINUTES
+) -> dict:
+    """
+    Order stops to minimise driving distance.
+
+    Args:
+        origin: [longitude, latitude] the truck leaves from
+        stops: [longitude, latitude] of each stop
+        return_to_origin: Whether the truck drives back at the end
+        time_budget_ms: Wall-clock limit for the improvement phase
+        departure: Departure time (defaults to now, UTC)
+        service_minutes: Time spent at each stop
+
+    Returns:
+        {
+            'order': [stop index in visiting order],
+            'legs': [{'stop': int or None (return leg), 'distance_km', 'cumulative_km', 'eta'}],
+            'total_distance_km': float,
+            'initial_distance_km': float (nearest neighbour only),
+            'passes': int,
+            'converged': bool,
+            'elapsed_ms': float
+        }
+    """
+    started = time.perf_counter()
+    count = len(stops)
+    points = [origin, *stops]
+    distances = distance_matrix(points)
+    if return_to_origin:
+        terminal = 0
+    else:
+        # Virtual end node, 0 km from everywhere
+        distances = np.pad(distances, ((0, 1), (0, 1)))
+        terminal = count + 1
+
+    path = nearest_neighbour(distances, terminal)
+    initial = path_length(distances, path)
+    path, passes, converged = improve(distances, path, time_budget_ms)
+
+    visited = path[1:-1] if not return_to_origin else path[1:]
+    previous = path[:len(visited)]
+    leg_km = distances[previous, visited]
+    cumulative_km = np.cumsum(leg_km)
+    cumulative_min = cumulative_km / LANE_AVERAGE_SPEED_KMH * 60
+    # Service time at every stop already reached before each arrival
+    hours = delivery_hours(cumulative_min) + np.arange(len(visited)) * service_minutes / 60
+    departure = departure or datetime.utcnow()
+
+    return {
+        "order": [int(node) - 1 for node in path[1:-1]],
+        "legs": [
+            {
+                "stop": int(node) - 1 if node != 0 else None,
+                "distance_km": round(float(km), 2),
+                "cumulative_km": round(float(total), 2),
+                "eta": departure + timedelta(hours=float(hour)),
+            }
+            for node, km, total, hour in zip(visited, leg_km, cumulative_km, hours)
+        ],
+        "total_distance_km": round(float(cumulative_km[-1]) if count else 0.0, 2),
+        "initial_distance_km": round(initial, 2),
+        "passes": passes,
+        "converged": converged,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,79 @@
+import os
+from typing import List
+
+from fastapi import APIRouter, HTTPException
+
+from app.routing.optimizer import (
+    ROUTE_OPTIMIZER_MAX_STOPS,
+    ROUTE_OPTIMIZER_TIME_BUDGET_MS,
+    optimize_route,
+    resolve_coordinates
+)
+from app.schemas import RouteLeg, RouteOptimizeRequest, RouteOptimizeResponse, RouteStop
+
+router = APIRouter()
+
+ROUTE_OPTIMIZER_MAX_TIME_BUDGET_MS = float(os.getenv("ROUTE_OPTIMIZER_MAX_TIME_BUDGET_MS", "10000"))
+
+
+def _coordinates(stop: RouteStop, label: str) -> List[float]:
+    if stop.lat is not None and stop.lon is not None:
+        if not (-90 <= stop.lat <= 90 and -180 <= stop.lon <= 180):
+            raise HTTPException(status_code=400, detail=f"{label}: lat must be within -90..90 and lon within -180..180")
+    coords = resolve_coordinates(stop.city, stop.lat, stop.lon)
+    if coords is None:
+        detail = f"{label}: unknown city '{stop.city}'; pass lat and lon" if stop.city else f"{label}: provide city, or lat and lon"
+        raise HTTPException(status_code=400, detail=detail)
+    return coords
+
+
+@router.post("/optimize", response_model=RouteOptimizeResponse)
+def optimize(request: RouteOptimizeRequest):
+    """
+    Order a truck's stops to minimise driving distance.
+
+    Stops are city names from the local city table or explicit lat/lon.
+    The route starts at origin and ends at the last stop, or back at origin
+    with return_to_origin. Improvement stops at time_budget_ms; converged
+    tells whether it finished earlier.
+    """
+    if not 1 <= len(request.stops) <= ROUTE_OPTIMIZER_MAX_STOPS:
+        raise HTTPException(status_code=400, detail=f"stops must have 1..{ROUTE_OPTIMIZER_MAX_STOPS} entries")
+    budget = ROUTE_OPTIMIZER_TIME_BUDGET_MS if request.time_budget_ms is None else request.time_budget_ms
+    if not 0 < budget <= ROUTE_OPTIMIZER_MAX_TIME_BUDGET_MS:
+        raise HTTPException(status_code=400, detail=f"time_budget_ms must be within 0..{ROUTE_OPTIMIZER_MAX_TIME_BUDGET_MS:g}")
+
+    origin = _coordinates(request.origin, "origin")
+    stops = [_coordinates(stop, f"stops[{index}]") for index, stop in enumerate(request.stops)]
+
+    result = optimize_route(
+        origin,
+        stops,
+        return_to_origin=request.return_to_origin,
+        time_budget_ms=budget,
+        departure=request.departure
+    )
+
+    legs = []
+    for sequence, leg in enumerate(result["legs"], start=1):
+        index = leg["stop"]
+        stop, coords = (request.origin, origin) if index is None else (request.stops[index], stops[index])
+        legs.append(RouteLeg(
+            sequence=sequence,
+            stop_index=index,
+            name=stop.name or stop.city,
+            lat=coords[1],
+            lon=coords[0],
+            distance_km=leg["distance_km"],
+            cumulative_km=leg["cumulative_km"],
+            eta=leg["eta"]
+        ))
+
+    return RouteOptimizeResponse(
+        legs=legs,
+        total_distance_km=result["total_distance_km"],
+        initial_distance_km=result["initial_distance_km"],
+        passes=result["passes"],
+        converged=result["converged"],
+        elapsed_ms=result["elapsed_ms"]
+    )
@@ -0,0 +1,296 @@
+"""
+Per-lane, hour-of-week speed profiles learned from delivered shipments.
+
+For every delivered shipment (archived ones included) the effective
+speed is distance_km over the time from created_at to delivered_at,
+bucketed by the hour of week it was created (Monday 00:00 UTC = 0).
+Lanes with at least
+SPEED_PROFILE_MIN_SAMPLES deliveries get a profile of 168 traffic
+factors:
+
+    factor[h] = free_flow_speed / median_speed[h] - 1      (clipped to 0..SPEED_PROFILE_MAX_FACTOR)
+
+free_flow_speed is the lane's 90th percentile speed. Hours with too few
+samples borrow the same hour on other days, then the lane median.
+
+Profiles are stored compactly (float32 bytes per lane) and held in memory
+as one (lanes x 168) array, so predictions read a traffic factor with a
+dict lookup and an array index instead of a live routing call. A
+periodic task rebuilds them every SPEED_PROFILE_REFRESH_SECONDS (daily by
+default) and announces the update so in-transit ETAs are recomputed.
+Every API process runs the task, but only the one holding the advisory
+lock rebuilds and announces, and only if no other process rebuilt within
+the last half interval (recorded in job_runs, so a rebuild that produced
+no profiles still counts); the rest reload the stored profiles.
+
+Usage:
+    python -m app.routing.speed_profiles
+"""
+
+import argparse
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.analytics.lanes import lane_key
+from app.database.database import SessionLocal
+from app.database.locks import SPEED_PROFILE_LOCK_KEY, advisory_lock
+from app.database.models import ArchivedShipment, JobRun, LaneRoute, LaneSpeedProfile, Shipment
+from app.routing.lane_table import LANE_AVERAGE_SPEED_KMH
+from app.utils.events import SPEED_PROFILES_UPDATED, publish
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_WEEK = 168
+
+SPEED_PROFILE_MIN_SAMPLES = int(os.getenv("SPEED_PROFILE_MIN_SAMPLES", "20"))
+SPEED_PROFILE_MIN_BUCKET_SAMPLES = int(os.getenv("SPEED_PROFILE_MIN_BUCKET_SAMPLES", "3"))
+SPEED_PROFILE_MAX_FACTOR = float(os.getenv("SPEED_PROFILE_MAX_FACTOR", "1.0"))
+SPEED_PROFILE_REFRESH_SECONDS = float(os.getenv("SPEED_PROFILE_REFRESH_SECONDS", "86400"))
+
+_READ_BATCH_SIZE = 5000
+
+# job_runs entry recording the last rebuild
+SPEED_PROFILE_JOB = "speed_profiles"
+
+
+def hour_of_week(moment: datetime) -> int:
+    """0..167, Monday 00:00 UTC first."""
+    return moment.weekday() * 24 + moment.hour
+
+
+def build_profile(hours: np.ndarray, speeds: np.ndarray) -> np.ndarray:
+    """
+    Traffic factors for one lane.
+
+    Args:
+        hours: Hour-of-week bucket of each delivery
+        speeds: Effective speed (km/h) of each delivery
+
+    Returns:
+        float32 array of HOURS_PER_WEEK factors
+    """
+    lane_median = float(np.median(speeds))
+    free_flow = float(np.percentile(speeds, 90))
+
+    hour_of_day = hours % 24
+    daily = np.full(24, lane_median)
+    for hour in range(24):
+        bucket = speeds[hour_of_day == hour]
+        if len(bucket) >= SPEED_PROFILE_MIN_BUCKET_SAMPLES:
+            daily[hour] = np.median(bucket)
+
+    weekly = daily[np.arange(HOURS_PER_WEEK) % 24].copy()
+    for hour in np.unique(hours):
+        bucket = speeds[hours == hour]
+        if len(bucket) >= SPEED_PROFILE_MIN_BUCKET_SAMPLES:
+            weekly[hour] = np.median(bucket)
+
+    factors = free_flow / np.maximum(weekly, 1e-6) - 1
+    return np.clip(factors, 0.0, SPEED_PROFILE_MAX_FACTOR).astype(np.float32)
+
+
+def rebuild_speed_profiles(db: Session) -> int:
+    """
+    Recompute all lane profiles from delivered shipments.
+
+    Args:
+        db: Database session (committed on success)
+
+    Returns:
+        Number of lanes with a profile
+    """
+    samples = defaultdict(lambda: ([], [], []))   # lane -> (hours, speeds, distances)
+    # Archived shipments are most of the delivery history
+    for model in (Shipment, ArchivedShipment):
+        statement = (
+            select(model.source, model.destination, model.distance_km, model.created_at, model.delivered_at)
+            .where(
+                model.delivered_at.is_not(None),
+                model.created_at.is_not(None),
+                model.distance_km > 0,
+            )
+            .execution_options(stream_results=True, yield_per=_READ_BATCH_SIZE)
+        )
+        for source, destination, distance_km, created_at, delivered_at in db.execute(statement):
+            transit_hours = (delivered_at - created_at).total_seconds() / 3600
+            if transit_hours <= 0:
+                continue
+            hours, speeds, distances = samples[lane_key(source, destination)]
+            hours.append(hour_of_week(created_at))
+            speeds.append(distance_km / transit_hours)
+            distances.append(distance_km)
+
+    base_durations = {
+        lane_key(origin, destination): duration_min
+        for origin, destination, duration_min in db.execute(
+            select(LaneRoute.origin, LaneRoute.destination, LaneRoute.duration_min)
+        )
+    }
+
+    now = datetime.utcnow()
+    rows = []
+    for lane, (hours, speeds, distances) in samples.items():
+        if len(speeds) < SPEED_PROFILE_MIN_SAMPLES:
+            continue
+        distance_km = float(np.median(distances))
+        rows.append({
+            "lane": lane,
+            "distance_km": distance_km,
+            "base_duration_min": base_durations.get(lane, distance_km / LANE_AVERAGE_SPEED_KMH * 60),
+            "factors": build_profile(np.array(hours), np.array(speeds, dtype=np.float64)).tobytes(),
+            "sample_count": len(speeds),
+            "updated_at": now,
+        })
+
+    db.execute(delete(LaneSpeedProfile))
+    if rows:
+        db.execute(insert(LaneSpeedProfile), rows)
+    _mark_rebuilt(db, now)
+    db.commit()
+    return len(rows)
+
+
+class SpeedProfileIndex:
+    """In-memory lookup: lane -> row of a (lanes x 168) factor array."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._factors = np.zeros((0, HOURS_PER_WEEK), dtype=np.float32)
+        self._distances = np.zeros(0)
+        self._base_durations = np.zeros(0)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def lanes(self):
+        """Lane keys that currently have a profile."""
+        with self._lock:
+            return list(self._rows)
+
+    def load(self, session_factory=SessionLocal):
+        """Replace the in-memory profiles with the stored ones."""
+        db = session_factory()
+        try:
+            stored = db.execute(select(
+                LaneSpeedProfile.lane,
+                LaneSpeedProfile.distance_km,
+                LaneSpeedProfile.base_duration_min,
+                LaneSpeedProfile.factors,
+            )).all()
+        finally:
+            db.close()
+
+        factors = np.zeros((len(stored), HOURS_PER_WEEK), dtype=np.float32)
+        for index, row in enumerate(stored):
+            factors[index] = np.frombuffer(row.factors, dtype=np.float32)
+
+        with self._lock:
+            self._rows = {row.lane: index for index, row in enumerate(stored)}
+            self._factors = factors
+            self._distances = np.array([row.distance_km for row in stored], dtype=np.float64)
+            self._base_durations = np.array([row.base_duration_min for row in stored], dtype=np.float64)
+
+    def lookup(self, origin: str, destination: str, when: Optional[datetime] = None) -> Optional[Tuple[float, float, float]]:
+        """
+        Profile values for a lane at a time.
+
+        Returns:
+            (distance_km, base_duration_min, traffic_factor), or None when
+            the lane has no profile
+        """
+        with self._lock:
+            index = self._rows.get(lane_key(origin, destination))
+            if index is None:
+                return None
+            hour = hour_of_week(when or datetime.utcnow())
+            return (
+                float(self._distances[index]),
+                float(self._base_durations[index]),
+                float(self._factors[index, hour]),
+            )
+
+    def lookup_many(self, lanes: Sequence[str], hours: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vectorized lookup for many (lane key, hour of week) pairs.
+
+        Returns:
+            (distance_km, base_duration_min, traffic_factor) arrays with NaN
+            where the lane has no profile
+        """
+        with self._lock:
+            rows = np.array([self._rows.get(lane, -1) for lane in lanes], dtype=np.int64)
+            known = rows >= 0
+            distances = np.full(len(rows), np.nan)
+            base_durations = np.full(len(rows), np.nan)
+            factors = np.full(len(rows), np.nan)
+            distances[known] = self._distances[rows[known]]
+            base_durations[known] = self._base_durations[rows[known]]
+            factors[known] = self._factors[rows[known], np.asarray(hours)[known]]
+        return distances, base_durations, factors
+
+
+speed_profiles = SpeedProfileIndex()
+
+
+def _mark_rebuilt(db: Session, now: datetime):
+    marked = db.execute(
+        update(JobRun).where(JobRun.job == SPEED_PROFILE_JOB).values(finished_at=now)
+    ).rowcount
+    if not marked:
+        db.add(JobRun(job=SPEED_PROFILE_JOB, finished_at=now))
+
+
+def _rebuilt_within(db: Session, seconds: float) -> bool:
+    latest = db.execute(select(JobRun.finished_at).where(JobRun.job == SPEED_PROFILE_JOB)).scalar()
+    return latest is not None and datetime.utcnow() - latest < timedelta(seconds=seconds)
+
+
+def refresh_speed_profiles(session_factory=SessionLocal, interval_seconds: float = SPEED_PROFILE_REFRESH_SECONDS) -> bool:
+    """
+    Rebuild stored profiles if due, and reload them (periodic task entry point).
+
+    Args:
+        session_factory: Session factory
+        interval_seconds: Refresh interval; a rebuild by any process within
+            half of it counts as current
+
+    Returns:
+        Whether this process rebuilt (and announced) the profiles
+    """
+    db = session_factory()
+    try:
+        with advisory_lock(db.get_bind(), SPEED_PROFILE_LOCK_KEY) as acquired:
+            rebuilt = acquired and not _rebuilt_within(db, interval_seconds / 2)
+            if rebuilt:
+                lanes = rebuild_speed_profiles(db)
+    finally:
+        db.close()
+
+    speed_profiles.load(session_factory)
+    if not rebuilt:
+        logger.info("Speed profiles rebuilt elsewhere; reloaded %d lanes", len(speed_profiles))
+        return False
+    logger.info("Rebuilt speed profiles for %d lanes", lanes)
+    publish(SPEED_PROFILES_UPDATED, lanes=speed_profiles.lanes())
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild lane speed profiles from delivered shipments")
+    parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        lanes = rebuild_speed_profiles(session)
+    finally:
+        session.close()
+    print(f"✅ Rebuilt speed profiles for {lanes} lanes")
@@ -49,6 +49,7 @@ class OrderUpdate(BaseModel):
     status: Optional[str] = None
     priority: Optional[str] = None
     due_date: Optional[datetime] = None
+    version: Optional[int] = None   # as last read; 409 if the order changed since
 
 
 class OrderResponse(OrderBase):
@@ -57,6 +58,7 @@ class OrderResponse(OrderBase):
     user_id: int
     status: str
     value: float
+    version: int
     created_at: datetime
     updated_at: datetime
 
@@ -72,6 +74,7 @@ class ShipmentBase(BaseModel):
 
 
 class ShipmentCreate(ShipmentBase):
+    distance_km: Optional[int] = None            # filled from the lane table when omitted
     source_coords: Optional[List[float]] = None  # [longitude, latitude]
     dest_coords: Optional[List[float]] = None    # [longitude, latitude]
 
@@ -79,6 +82,7 @@ class ShipmentCreate(ShipmentBase):
 class ShipmentUpdate(BaseModel):
     status: Optional[str] = None
     estimated_delivery: Optional[datetime] = None
+    version: Optional[int] = None   # as last read; 409 if the shipment changed since
 
 
 class ShipmentResponse(ShipmentBase):
@@ -86,6 +90,7 @@ class ShipmentResponse(ShipmentBase):
     status: str
     blockchain_hash: Optional[str]
     estimated_delivery: Optional[datetime]
+    version: int
     created_at: datetime
     updated_at: datetime
 
@@ -93,6 +98,16 @@ class ShipmentResponse(ShipmentBase):
         from_attributes = True
 
 
+class NearbyShipmentResponse(ShipmentResponse):
+    source_coords: Optional[List[float]] = None
+    dest_coords: Optional[List[float]] = None
+    distance_from_center_km: Optional[float] = None   # radius queries only
+
+
+class NearbyOrderResponse(OrderResponse):
+    distance_from_center_km: Optional[float] = None   # radius queries only
+
+
 class OrderAnalyticsResponse(BaseModel):
     id: int
     user_id: int
@@ -125,3 +140,38 @@ class LoginResponse(BaseModel):
     token: str
     user: UserResponse
     role: str
+
+
+class RouteStop(BaseModel):
+    city: Optional[str] = None     # looked up in the local city table
+    lat: Optional[float] = None    # explicit coordinates take precedence over city
+    lon: Optional[float] = None
+    name: Optional[str] = None     # label echoed back (defaults to city)
+
+
+class RouteOptimizeRequest(BaseModel):
+    origin: RouteStop
+    stops: List[RouteStop]
+    return_to_origin: bool = False
+    time_budget_ms: Optional[float] = None
+    departure: Optional[datetime] = None   # defaults to now (UTC)
+
+
+class RouteLeg(BaseModel):
+    sequence: int
+    stop_index: Optional[int] = None       # position in the request's stops; None for the return leg
+    name: Optional[str] = None
+    lat: float
+    lon: float
+    distance_km: float
+    cumulative_km: float
+    eta: datetime
+
+
+class RouteOptimizeResponse(BaseModel):
+    legs: List[RouteLeg]
+    total_distance_km: float
+    initial_distance_km: float             # nearest-neighbour route before improvement
+    passes: int
+    converged: bool
+    elapsed_ms: float
@@ -0,0 +1,104 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
+from app.database.database import get_read_db
+from app.schemas import OrderResponse, ShipmentResponse, UserResponse
+from app.search.search_service import (
+    MATCH_MODES,
+    MIN_QUERY_LENGTH,
+    search_orders,
+    search_shipments,
+    search_users
+)
+
+router = APIRouter()
+
+MAX_PAGE_SIZE = 100
+
+
+def _validate(q: str, match: str, limit: int) -> str:
+    q = q.strip()
+    if len(q) < MIN_QUERY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"q must be at least {MIN_QUERY_LENGTH} characters")
+    if match not in MATCH_MODES:
+        raise HTTPException(status_code=400, detail=f"match must be one of: {', '.join(MATCH_MODES)}")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be within 1..{MAX_PAGE_SIZE}")
+    return q
+
+
+def _run(search, schema, **kwargs):
+    try:
+        rows, next_cursor = search(**kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "results": [schema.model_validate(row) for row in rows],
+        "next_cursor": next_cursor
+    }
+
+
+@router.get("/orders")
+def search_order_list(
+    q: str,
+    match: str = "contains",
+    status: Optional[str] = None,
+    user_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Search orders by order ID, origin, destination, or owner email/company.
+
+    Case-insensitive; combines with status, user and created_at filters.
+    Newest first; pass next_cursor back as cursor for the next page.
+    """
+    q = _validate(q, match, limit)
+    return _run(
+        search_orders, OrderResponse,
+        db=db, query=q, mode=match, status=status, user_id=user_id,
+        created_from=created_from, created_to=created_to, cursor=cursor, limit=limit
+    )
+
+
+@router.get("/shipments")
+def search_shipment_list(
+    q: str,
+    match: str = "contains",
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    db: Session = Depends(get_read_db)
+):
+    """Search shipments by order ID, source, destination, or owner email/company"""
+    q = _validate(q, match, limit)
+    return _run(
+        search_shipments, ShipmentResponse,
+        db=db, query=q, mode=match, status=status,
+        created_from=created_from, created_to=created_to, cursor=cursor, limit=limit
+    )
+
+
+@router.get("/users")
+def search_user_list(
+    q: str,
+    match: str = "contains",
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    db: Session = Depends(get_read_db)
+):
+    """Search users by email, company name or name"""
+    q = _validate(q, match, limit)
+    return _run(
+        search_users, UserResponse,
+        db=db, query=q, mode=match,
+        created_from=created_from, created_to=created_to, cursor=cursor, limit=limit
+    )
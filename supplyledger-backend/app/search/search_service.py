@@ -0,0 +1,197 @@
+"""
+Case-insensitive search over orders, shipments and users.
+
+Every searchable column has an index on lower(column): a pg_trgm GIN
+index on PostgreSQL, which serves both prefix (LIKE 'q%') and substring
+(LIKE '%q%') patterns as well as fuzzy similarity (lower(column) % 'q').
+Match modes:
+1. prefix   — column starts with the query
+2. contains — column contains the query anywhere (default)
+3. fuzzy    — contains, or trigram-similar (typos); needs PostgreSQL
+              with pg_trgm, otherwise falls back to contains
+
+Results are newest first and paged with a keyset cursor over
+(created_at, id), so deep pages cost the same as the first.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.database.models import Order, Shipment, User
+
+MATCH_MODES = ("prefix", "contains", "fuzzy")
+MIN_QUERY_LENGTH = 3
+
+ORDER_SEARCH_COLUMNS = (Order.order_id, Order.origin, Order.destination)
+SHIPMENT_SEARCH_COLUMNS = (Shipment.order_id, Shipment.source, Shipment.destination)
+USER_SEARCH_COLUMNS = (User.email, User.company_name, User.name)
+
+Cursor = Tuple[datetime, int]
+
+# Database URL -> whether pg_trgm's similarity operator is installed
+_similarity_support: Dict[str, bool] = {}
+
+
+def encode_cursor(created_at: datetime, id_: int) -> str:
+    """Opaque cursor for the row after which the next page starts."""
+    raw = json.dumps([created_at.isoformat(), id_]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Inverse of encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id_ = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(id_)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def supports_similarity(db: Session) -> bool:
+    """Whether the database has pg_trgm's % (similarity) operator."""
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+    key = str(bind.url)
+    if key not in _similarity_support:
+        installed = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first()
+        _similarity_support[key] = installed is not None
+    return _similarity_support[key]
+
+
+def text_match(columns: Sequence, query: str, mode: str, similarity: bool = False):
+    """OR of per-column conditions matching the query case-insensitively."""
+    term = _escape_like(query.lower())
+    pattern = f"{term}%" if mode == "prefix" else f"%{term}%"
+    conditions = [func.lower(column).like(pattern, escape="\\") for column in columns]
+    if mode == "fuzzy" and similarity:
+        conditions += [func.lower(column).op("%")(query.lower()) for column in columns]
+    return or_(*conditions)
+
+
+def _page(db: Session, model, conditions: list, cursor: Optional[str], limit: int) -> Tuple[list, Optional[str]]:
+    """One newest-first page of rows plus the cursor for the next one."""
+    statement = select(model).where(*conditions)
+    if cursor:
+        created_at, id_ = decode_cursor(cursor)
+        statement = statement.where(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < id_),
+        ))
+    statement = statement.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+    rows = db.scalars(statement).all()
+    if len(rows) <= limit:
+        return list(rows), None
+    last = rows[limit - 1]
+    return list(rows[:limit]), encode_cursor(last.created_at, last.id)
+
+
+def _created_between(model, created_from: Optional[datetime], created_to: Optional[datetime]) -> list:
+    conditions = []
+    if created_from:
+        conditions.append(model.created_at >= created_from)
+    if created_to:
+        conditions.append(model.created_at < created_to)
+    return conditions
+
+
+def _matching_user_ids(query: str, mode: str, similarity: bool):
+    """Ids of users whose email or company name matches (owner search)."""
+    return select(User.id).where(text_match((User.email, User.company_name), query, mode, similarity))
+
+
+def search_orders(
+    db: Session,
+    query: str,
+    mode: str = "contains",
+    status: Optional[str] = None,
+    user_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20
+) -> Tuple[List[Order], Optional[str]]:
+    """
+    Orders whose ID, origin or destination matches, or whose owner's email
+    or company name does.
+
+    Returns:
+        (orders, next_cursor) — next_cursor is None on the last page
+    """
+    similarity = supports_similarity(db)
+    conditions = [or_(
+        text_match(ORDER_SEARCH_COLUMNS, query, mode, similarity),
+        Order.user_id.in_(_matching_user_ids(query, mode, similarity)),
+    )]
+    if status:
+        conditions.append(Order.status == status)
+    if user_id is not None:
+        conditions.append(Order.user_id == user_id)
+    conditions += _created_between(Order, created_from, created_to)
+    return _page(db, Order, conditions, cursor, limit)
+
+
+def search_shipments(
+    db: Session,
+    query: str,
+    mode: str = "contains",
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20
+) -> Tuple[List[Shipment], Optional[str]]:
+    """
+    Shipments whose order ID, source or destination matches, or whose
+    order's owner matches by email or company name.
+
+    Returns:
+        (shipments, next_cursor) — next_cursor is None on the last page
+    """
+    similarity = supports_similarity(db)
+    owned_orders = select(Order.order_id).where(Order.user_id.in_(_matching_user_ids(query, mode, similarity)))
+    conditions = [or_(
+        text_match(SHIPMENT_SEARCH_COLUMNS, query, mode, similarity),
+        Shipment.order_id.in_(owned_orders),
+    )]
+    if status:
+        conditions.append(Shipment.status == status)
+    conditions += _created_between(Shipment, created_from, created_to)
+    return _page(db, Shipment, conditions, cursor, limit)
+
+
+def search_users(
+    db: Session,
+    query: str,
+    mode: str = "contains",
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20
+) -> Tuple[List[User], Optional[str]]:
+    """
+    Users whose email, company name or name matches.
+
+    Returns:
+        (users, next_cursor) — next_cursor is None on the last page
+    """
+    similarity = supports_similarity(db)
+    conditions = [text_match(USER_SEARCH_COLUMNS, query, mode, similarity)]
+    conditions += _created_between(User, created_from, created_to)
+    return _page(db, User, conditions, cursor, limit)
@@ -1,19 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from app.database.database import get_db
-from app.database.models import Shipment, Order
-from app.schemas import ShipmentCreate, ShipmentResponse, ShipmentUpdate
+from datetime import datetime
+from typing import Optional
+from app.database.database import SessionLocal, get_db, get_read_db, read_session_factory
+from app.database.models import ArchivedShipment, Shipment, Order, ShipmentOrder, ShipmentPrediction
+from app.database.archive import find_order, find_shipment, find_shipment_version
+from app.database.concurrency import check_version, conflict, flush_or_conflict, retry_on_conflict
+from app.database.unit_of_work import UnitOfWorkRoute
+from app.schemas import OrderResponse, ShipmentCreate, ShipmentResponse, ShipmentUpdate
 from app.blockchain.ledger import generate_blockchain_hash
 from app.blockchain.verify import verify_shipment_integrity
 from app.ai.delay_prediction import predict_delay
-from app.utils.city_coords import get_city_coordinates
+from app.ai.precompute import is_fresh, store_predictions
+from app.utils.city_coords import lookup_local_coordinates
+from app.utils.ids import normalize_order_id
+from app.utils.etags import check_not_modified, make_etag
+from app.spatial.spatial_service import shipment_location_fields
+from app.bulk import exporter
+from app.routing.lane_table import LANE_AVERAGE_SPEED_KMH, estimate_delivery, estimate_lane, lookup_lane
+from app.utils.serialization import (
+    JSON_MEDIA_TYPE,
+    binary_rows_response,
+    column_python_types,
+    negotiate_media_type,
+    rows_to_dicts
+)
+
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+
+def _ledger_columns(model):
+    return [
+        model.id.label("shipment_id"),
+        model.status,
+        model.blockchain_hash,
+        model.source,
+        model.destination,
+        model.distance_km,
+        model.created_at,
+        model.updated_at,
+    ]
+
+
+# Columns served by the order ledger endpoint, read as plain row tuples
+LEDGER_COLUMNS = _ledger_columns(Shipment)
+ARCHIVED_LEDGER_COLUMNS = _ledger_columns(ArchivedShipment)
+
+
+def _shipment_etag(kind: str, shipment) -> str:
+    return make_etag(kind, shipment.id, shipment.version, shipment.updated_at, shipment.blockchain_hash)
+
+
+def _shipment_tag_fields(db: Session, shipment_id: int, user_id: Optional[int] = None):
+    """ETag fields from a version-only lookup; None if missing or owned by someone else."""
+    current = find_shipment_version(db, shipment_id)
+    if current is None or (user_id is not None and current.user_id not in (None, user_id)):
+        return None
+    return shipment_id, current.version, current.updated_at, current.blockchain_hash
 
-router = APIRouter()
 
 class StatusUpdate(BaseModel):
     status: str
+    version: Optional[int] = None   # as last read; 409 if the shipment changed since
+
+
+def _carried_order_ids(db: Session, shipment: Shipment) -> set:
+    """
+    Orders a shipment carries.
+
+    A consolidated shipment (app/dispatch) carries every order linked in
+    shipment_orders; other shipments carry just their order_id.
+    """
+    order_ids = {shipment.order_id}
+    order_ids.update(db.scalars(select(ShipmentOrder.order_id).where(ShipmentOrder.shipment_id == shipment.id)))
+    return order_ids
+
+
+def _set_order_status(db: Session, order_ids: set, status: str):
+    """
+    Carry a shipment milestone over to its orders, retrying if one is being edited concurrently.
+
+    Raises:
+        HTTPException: 409 if the orders kept changing; the unit of work
+            then rolls back the shipment change too
+    """
+    def apply():
+        for order in db.query(Order).filter(Order.order_id.in_(order_ids)):
+            order.status = status
+
+    if not retry_on_conflict(db, apply):
+        raise conflict(None, OrderResponse, "The shipment's orders kept changing concurrently; retry")
 
 
 @router.post("/create", response_model=ShipmentResponse)
@@ -23,25 +102,53 @@ def create_shipment(shipment: ShipmentCreate, db: Session = Depends(get_db)):
     
     The blockchain hash is generated immediately and serves as the immutable 
     fingerprint for this shipment state. Any future tampering will be detected.
+
+    Distance (when omitted) and the estimated delivery come from the
+    precomputed lane table. Lanes not in the table fall back to a local
+    estimate from the coordinates. Coordinates (when omitted) come from
+    the lane row, else the local city table; nothing is geocoded here.
     """
-    # Auto-detect coordinates from city names if not provided
-    source_coords = shipment.source_coords or get_city_coordinates(shipment.source)
-    dest_coords = shipment.dest_coords or get_city_coordinates(shipment.destination)
+    lane = lookup_lane(db, shipment.source, shipment.destination)
+    source_coords = (
+        shipment.source_coords
+        or (lane and lane.origin_coords)
+        or lookup_local_coordinates(shipment.source)
+    )
+    dest_coords = (
+        shipment.dest_coords
+        or (lane and lane.destination_coords)
+        or lookup_local_coordinates(shipment.destination)
+    )
+
+    distance_km = shipment.distance_km
+    if lane:
+        distance_km = distance_km if distance_km is not None else round(lane.distance_km)
+        duration_min = lane.duration_min
+    elif source_coords and dest_coords:
+        estimated_km, duration_min = estimate_lane(source_coords, dest_coords)
+        distance_km = distance_km if distance_km is not None else round(estimated_km)
+    elif distance_km is not None:
+        duration_min = distance_km / LANE_AVERAGE_SPEED_KMH * 60
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail="distance_km is required for lanes without known coordinates"
+        )
 
     new_shipment = Shipment(
-        order_id=shipment.order_id,
+        order_id=normalize_order_id(shipment.order_id),
         source=shipment.source,
         destination=shipment.destination,
         source_coords=source_coords,
         dest_coords=dest_coords,
-        distance_km=shipment.distance_km,
+        **shipment_location_fields(source_coords, dest_coords),
+        distance_km=distance_km,
         status="CREATED",
-        estimated_delivery=datetime.utcnow() + timedelta(days=5)  # Default 5 days
+        estimated_delivery=estimate_delivery(duration_min)
     )
 
     db.add(new_shipment)
-    db.commit()
-    db.refresh(new_shipment)
+    db.flush()
     
     # Generate blockchain hash AFTER getting the shipment ID from database
     blockchain_hash = generate_blockchain_hash(
@@ -54,37 +161,95 @@ def create_shipment(shipment: ShipmentCreate, db: Session = Depends(get_db)):
     
     # Store the immutable hash
     new_shipment.blockchain_hash = blockchain_hash
-    db.commit()
-    db.refresh(new_shipment)
+    db.flush()
     
     # Update order status to "In Transit"
-    order = db.query(Order).filter(Order.order_id == shipment.order_id).first()
-    if order:
-        order.status = "In Transit"
-        db.commit()
+    _set_order_status(db, {new_shipment.order_id}, "In Transit")
     
     return new_shipment
 
 
+@router.get("/export")
+def export_shipments(
+    request: Request,
+    format: str = exporter.CSV_FORMAT,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    status: Optional[str] = None,
+    include_archived: bool = False
+):
+    """
+    Stream shipments and their blockchain hashes as CSV or Parquet.
+
+    Rows are read through a server-side cursor and written out batch by
+    batch, so large extracts use constant memory. The user filter matches
+    the owner of each shipment's order. Archived shipments are included
+    only when include_archived is set.
+    """
+    if format not in exporter.SUPPORTED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format. Use one of: {', '.join(exporter.SUPPORTED_FORMATS)}")
+
+    return StreamingResponse(
+        exporter.export_stream(
+            exporter.SHIPMENTS_EXPORT, format, user_id, date_from, date_to, status,
+            session_factory=read_session_factory(request),
+            include_archived=include_archived
+        ),
+        media_type=exporter.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{exporter.export_filename(exporter.SHIPMENTS_EXPORT, format)}"'}
+    )
+
+
+def _raise_missing_shipment(db: Session, shipment_id: int):
+    """404 for unknown shipments, 409 for archived (read-only) ones."""
+    if db.query(ArchivedShipment.id).filter(ArchivedShipment.id == shipment_id).first():
+        raise HTTPException(status_code=409, detail="Shipment is archived and can no longer be changed")
+    raise HTTPException(status_code=404, detail="Shipment not found")
+
+
 @router.get("/{shipment_id}", response_model=ShipmentResponse)
-def get_shipment(shipment_id: int, user_id: int, db: Session = Depends(get_db)):
-    """Get shipment by ID (only for order owner)"""
-    shipment = db.query(Shipment).filter(Shipment.id == shipment_id).first()
+def get_shipment(
+    shipment_id: int,
+    user_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get shipment by ID (only for order owner), including archived shipments.
+    
+    Responses carry an ETag; a matching If-None-Match is answered 304 from
+    a version-only lookup.
+    """
+    unchanged = check_not_modified(request, "shipment", lambda: _shipment_tag_fields(db, shipment_id, user_id))
+    if unchanged:
+        return unchanged
+    
+    shipment = find_shipment(db, shipment_id)
     if not shipment:
         raise HTTPException(status_code=404, detail="Shipment not found")
     
     # Verify user ownership through order
-    order = db.query(Order).filter(Order.order_id == shipment.order_id).first()
+    order = find_order(db, shipment.order_id)
     if order and order.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized - Shipment belongs to another user")
     
+    response.headers["ETag"] = _shipment_etag("shipment", shipment)
     return shipment
 
 
 @router.get("/order/{order_id}")
-def get_shipment_by_order(order_id: str, db: Session = Depends(get_db)):
-    """Get shipment for an order"""
-    shipment = db.query(Shipment).filter(Shipment.order_id == order_id).first()
+def get_shipment_by_order(order_id: str, db: Session = Depends(get_read_db)):
+    """Get shipment for an order, including archived orders and orders consolidated into another order's shipment"""
+    order_id = normalize_order_id(order_id)
+    consolidated = select(ShipmentOrder.shipment_id).where(ShipmentOrder.order_id == order_id)
+    shipment = (
+        db.query(Shipment).filter(Shipment.order_id == order_id).first()
+        or db.query(ArchivedShipment).filter(ArchivedShipment.order_id == order_id).first()
+        or db.query(Shipment).filter(Shipment.id.in_(consolidated)).first()
+        or db.query(ArchivedShipment).filter(ArchivedShipment.id.in_(consolidated)).first()
+    )
     if not shipment:
         raise HTTPException(status_code=404, detail="Shipment not found for order")
     return shipment
@@ -97,18 +262,25 @@ def update_shipment(shipment_id: int, user_id: int, shipment_data: ShipmentUpdat
     
     When status changes, a new blockchain hash is generated to maintain 
     an immutable audit trail of the shipment lifecycle.
+    
+    Pass the version last read to reject the update if the shipment changed
+    since; a concurrent write also returns 409 with the current shipment.
     """
     shipment = db.query(Shipment).filter(Shipment.id == shipment_id).first()
     if not shipment:
-        raise HTTPException(status_code=404, detail="Shipment not found")
+        _raise_missing_shipment(db, shipment_id)
     
     # Verify user ownership through order
     order = db.query(Order).filter(Order.order_id == shipment.order_id).first()
     if order and order.user_id != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized - Shipment belongs to another user")
     
+    check_version(shipment, shipment_data.version, ShipmentResponse)
+    
     if shipment_data.status:
         shipment.status = shipment_data.status
+        if shipment.status == "DELIVERED" and shipment.delivered_at is None:
+            shipment.delivered_at = datetime.utcnow()
         # ✅ BLOCKCHAIN: Generate new hash on status change
         shipment.blockchain_hash = generate_blockchain_hash(
             shipment_id=shipment.id,
@@ -120,18 +292,15 @@ def update_shipment(shipment_id: int, user_id: int, shipment_data: ShipmentUpdat
     
     if shipment_data.estimated_delivery:
         shipment.estimated_delivery = shipment_data.estimated_delivery
+        shipment.estimated_delivery_pinned = True
     
     shipment.updated_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(shipment)
+    flush_or_conflict(db, shipment, ShipmentResponse)
     
     # Update order status if shipment is delivered
     if shipment_data.status == "DELIVERED":
-        order = db.query(Order).filter(Order.order_id == shipment.order_id).first()
-        if order:
-            order.status = "Delivered"
-            db.commit()
+        _set_order_status(db, _carried_order_ids(db, shipment), "Delivered")
     
     return shipment
 
@@ -142,13 +311,17 @@ def update_status(shipment_id: int, update: StatusUpdate, db: Session = Depends(
     Update shipment status (patch endpoint).
     
     Generates a new blockchain hash when status changes to maintain 
-    immutable audit trail.
+    immutable audit trail. Conflicting writes return 409 as for PUT.
     """
     shipment = db.query(Shipment).filter(Shipment.id == shipment_id).first()
     if not shipment:
-        raise HTTPException(status_code=404, detail="Shipment not found")
+        _raise_missing_shipment(db, shipment_id)
+    
+    check_version(shipment, update.version, ShipmentResponse)
     
     shipment.status = update.status
+    if shipment.status == "DELIVERED" and shipment.delivered_at is None:
+        shipment.delivered_at = datetime.utcnow()
     
     # ✅ BLOCKCHAIN: Generate new hash on status change
     shipment.blockchain_hash = generate_blockchain_hash(
@@ -160,16 +333,21 @@ def update_status(shipment_id: int, update: StatusUpdate, db: Session = Depends(
     )
     
     shipment.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(shipment)
+    flush_or_conflict(db, shipment, ShipmentResponse)
     
     return shipment
 
 
 @router.get("/{shipment_id}/predict-delay")
-def delay_prediction(shipment_id: int, db: Session = Depends(get_db)):
+def delay_prediction(shipment_id: int, refresh: bool = False, db: Session = Depends(get_read_db)):
     """
     Predict delay for a shipment using live maps, traffic, and weather data.
+
+    Predictions for active shipments are precomputed in the background;
+    the stored one is served while it is younger than
+    PREDICTION_MAX_AGE_SECONDS. Without one, a live prediction is returned
+    but not stored (the precompute worker owns the table). Pass
+    refresh=true to force a live prediction and store it on the primary.
     
     Returns:
         Comprehensive delay prediction including:
@@ -179,24 +357,46 @@ def delay_prediction(shipment_id: int, db: Session = Depends(get_db)):
         - weather_delay_min: Additional delay from weather
         - total_delay_min: Total predicted delay
         - risk_level: HIGH, MEDIUM, or LOW
+        plus computed_at and cached (True when served from storage)
     """
-    shipment = db.query(Shipment).filter(Shipment.id == shipment_id).first()
-    if not shipment:
+    row = (
+        db.query(Shipment, ShipmentPrediction)
+        .outerjoin(ShipmentPrediction, ShipmentPrediction.shipment_id == Shipment.id)
+        .filter(Shipment.id == shipment_id)
+        .first()
+    )
+    if not row:
         raise HTTPException(status_code=404, detail="Shipment not found")
-    
-    # Check if coordinates are available
-    if not shipment.source_coords or not shipment.dest_coords:
-        raise HTTPException(
-            status_code=400, 
-            detail="Shipment coordinates not available for delay prediction"
+    shipment, stored = row
+
+    if stored and not refresh and is_fresh(stored.computed_at):
+        prediction = stored.prediction
+        computed_at = stored.computed_at
+        cached = True
+    else:
+        # Check if coordinates are available
+        if not shipment.source_coords or not shipment.dest_coords:
+            raise HTTPException(
+                status_code=400, 
+                detail="Shipment coordinates not available for delay prediction"
+            )
+        
+        # Use real-time delay prediction with live APIs
+        prediction = predict_delay(
+            source_coords=shipment.source_coords,
+            dest_coords=shipment.dest_coords,
+            destination_city=shipment.destination,
+            source_city=shipment.source
         )
-    
-    # Use real-time delay prediction with live APIs
-    prediction = predict_delay(
-        source_coords=shipment.source_coords,
-        dest_coords=shipment.dest_coords,
-        destination_city=shipment.destination
-    )
+        computed_at = datetime.utcnow()
+        cached = False
+
+        if refresh and "error" not in prediction:
+            with SessionLocal.begin() as primary:
+                store_predictions(
+                    primary.connection(),
+                    [{"shipment_id": shipment_id, "prediction": prediction, "computed_at": computed_at}]
+                )
     
     # Add shipment context to response
     return {
@@ -205,7 +405,9 @@ def delay_prediction(shipment_id: int, db: Session = Depends(get_db)):
         "source": shipment.source,
         "destination": shipment.destination,
         "prediction": prediction,
-        "estimated_delivery": shipment.estimated_delivery
+        "estimated_delivery": shipment.estimated_delivery,
+        "computed_at": computed_at,
+        "cached": cached
     }
 
 
@@ -214,7 +416,7 @@ def delay_prediction(shipment_id: int, db: Session = Depends(get_db)):
 # ============================================================================
 
 @router.get("/ledger/verify/{shipment_id}")
-def verify_shipment(shipment_id: int, db: Session = Depends(get_db)):
+def verify_shipment(shipment_id: int, db: Session = Depends(get_read_db)):
     """
     Verify shipment integrity using blockchain hash.
     
@@ -261,7 +463,7 @@ def verify_shipment(shipment_id: int, db: Session = Depends(get_db)):
             "status": "IN_TRANSIT"
         }
     """
-    shipment = db.query(Shipment).filter(Shipment.id == shipment_id).first()
+    shipment = find_shipment(db, shipment_id)
     if not shipment:
         raise HTTPException(status_code=404, detail="Shipment not found")
     
@@ -285,12 +487,14 @@ def verify_shipment(shipment_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/ledger/hash/{shipment_id}")
-def get_shipment_hash(shipment_id: int, db: Session = Depends(get_db)):
+def get_shipment_hash(shipment_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """
     Get the blockchain hash for a shipment.
     
     This hash is the immutable fingerprint of the shipment. It changes whenever
     the shipment data (source, destination, distance, or status) changes.
+    Responses carry an ETag; a matching If-None-Match is answered 304 from
+    a version-only lookup.
     
     Args:
         shipment_id: Unique shipment identifier
@@ -308,10 +512,15 @@ def get_shipment_hash(shipment_id: int, db: Session = Depends(get_db)):
             'updated_at': datetime
         }
     """
-    shipment = db.query(Shipment).filter(Shipment.id == shipment_id).first()
+    unchanged = check_not_modified(request, "shipment-hash", lambda: _shipment_tag_fields(db, shipment_id))
+    if unchanged:
+        return unchanged
+    
+    shipment = find_shipment(db, shipment_id)
     if not shipment:
         raise HTTPException(status_code=404, detail="Shipment not found")
     
+    response.headers["ETag"] = _shipment_etag("shipment-hash", shipment)
     return {
         "shipment_id": shipment.id,
         "order_id": shipment.order_id,
@@ -326,12 +535,15 @@ def get_shipment_hash(shipment_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/ledger/all-hashes/{order_id}")
-def get_order_ledger(order_id: str, db: Session = Depends(get_db)):
+def get_order_ledger(order_id: str, request: Request, response: Response, db: Session = Depends(get_read_db)):
     """
     Get blockchain hash ledger for all shipments in an order.
     
     This shows the complete immutable audit trail of the order's logistics journey.
     Each shipment with a different status will have a unique hash.
+
+    Serves JSON by default, or MessagePack / Arrow IPC when the Accept
+    header asks for it (order_id and total_shipments travel as metadata).
     
     Args:
         order_id: Order identifier
@@ -352,26 +564,28 @@ def get_order_ledger(order_id: str, db: Session = Depends(get_db)):
             'total_shipments': int
         }
     """
-    shipments = db.query(Shipment).filter(Shipment.order_id == order_id).all()
-    if not shipments:
+    rows = db.query(*LEDGER_COLUMNS).filter(Shipment.order_id == normalize_order_id(order_id)).all()
+    if not rows:
+        # Archival moves an order's shipments together, so they are all in one tier
+        rows = db.query(*ARCHIVED_LEDGER_COLUMNS).filter(ArchivedShipment.order_id == normalize_order_id(order_id)).all()
+    if not rows:
         raise HTTPException(status_code=404, detail="No shipments found for order")
-    
-    shipment_hashes = [
-        {
-            'shipment_id': s.id,
-            'status': s.status,
-            'blockchain_hash': s.blockchain_hash,
-            'source': s.source,
-            'destination': s.destination,
-            'distance_km': s.distance_km,
-            'created_at': s.created_at,
-            'updated_at': s.updated_at
-        }
-        for s in shipments
-    ]
-    
+
+    columns = [column.key for column in LEDGER_COLUMNS]
+
+    media_type = negotiate_media_type(request.headers.get("accept"))
+    if media_type != JSON_MEDIA_TYPE:
+        return binary_rows_response(
+            media_type,
+            columns,
+            column_python_types(LEDGER_COLUMNS),
+            rows,
+            metadata={"order_id": order_id, "total_shipments": len(rows)}
+        )
+
+    response.headers["Vary"] = "Accept"
     return {
         'order_id': order_id,
-        'shipments': shipment_hashes,
-        'total_shipments': len(shipment_hashes)
+        'shipments': rows_to_dicts(columns, rows),
+        'total_shipments': len(rows)
     }
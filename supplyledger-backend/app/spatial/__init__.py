@@ -0,0 +1 @@
+# Spatial package
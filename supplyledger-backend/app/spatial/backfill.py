@@ -0,0 +1,119 @@
+"""
+Backfill typed coordinates and geohashes for existing rows.
+
+Shipments copy their source_coords/dest_coords JSON; orders resolve their
+origin/destination city names once per distinct city (local table, then
+Nominatim unless --local-only). Rows are read in id order in batches and
+updated with one compare-and-swap executemany per batch, so the job can
+run against a live database (rows edited meanwhile are re-read and
+retried) and be re-run safely: only rows still missing a geohash are
+touched.
+
+Usage:
+    python -m app.spatial.backfill
+    python -m app.spatial.backfill --local-only
+"""
+
+import argparse
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, select
+
+from app.database.concurrency import bulk_compare_and_swap
+from app.database.database import SessionLocal
+from app.database.models import Order, Shipment
+from app.utils.city_coords import get_city_coordinates, lookup_local_coordinates, normalize_city_name
+from app.utils.geohash import point_fields
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _backfill(session_factory, model, columns, missing, fields: Callable, batch_size: int) -> int:
+    """Keyset over rows missing spatial columns; returns rows examined."""
+    def changes(rows) -> List[dict]:
+        return [{"id": row[0], "version": row[1], **fields(*row[2:])} for row in rows]
+
+    updated = 0
+    last_id = 0
+    while True:
+        db = session_factory()
+        try:
+            rows = db.execute(
+                select(model.id, model.version, *columns)
+                .where(model.id > last_id, or_(*missing))
+                .order_by(model.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return updated
+            bulk_compare_and_swap(
+                db, model, changes(rows),
+                lambda ids: changes(db.execute(
+                    select(model.id, model.version, *columns).where(model.id.in_(ids), or_(*missing))
+                ).all())
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        updated += len(rows)
+        last_id = rows[-1][0]
+
+
+def backfill_shipments(session_factory=SessionLocal, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Fill shipment lat/lon/geohash columns from the coordinate JSON."""
+    return _backfill(
+        session_factory,
+        Shipment,
+        (Shipment.source_coords, Shipment.dest_coords),
+        (Shipment.source_geohash.is_(None), Shipment.dest_geohash.is_(None)),
+        lambda source_coords, dest_coords: {
+            **point_fields("source", source_coords),
+            **point_fields("dest", dest_coords),
+        },
+        batch_size
+    )
+
+
+def backfill_orders(
+    session_factory=SessionLocal,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+    local_only: bool = False
+) -> int:
+    """Fill order lat/lon/geohash columns from the origin/destination cities."""
+    geocode = lookup_local_coordinates if local_only else get_city_coordinates
+    resolved: Dict[str, Optional[List[float]]] = {}
+
+    def coords(city: str):
+        key = normalize_city_name(city or "")
+        if key not in resolved:
+            resolved[key] = geocode(city)
+        return resolved[key]
+
+    return _backfill(
+        session_factory,
+        Order,
+        (Order.origin, Order.destination),
+        (Order.origin_geohash.is_(None), Order.destination_geohash.is_(None)),
+        lambda origin, destination: {
+            **point_fields("origin", coords(origin)),
+            **point_fields("destination", coords(destination)),
+        },
+        batch_size
+    )
+
+
+def backfill_locations(local_only: bool = False) -> Tuple[int, int]:
+    """Backfill both tables; returns (shipments, orders) examined."""
+    return backfill_shipments(), backfill_orders(local_only=local_only)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill coordinates and geohashes for spatial queries")
+    parser.add_argument("--local-only", action="store_true", help="Resolve order cities from the local table only")
+    args = parser.parse_args()
+
+    shipments, orders = backfill_locations(args.local_only)
+    print(f"✅ Backfilled locations for {shipments} shipments and {orders} orders")
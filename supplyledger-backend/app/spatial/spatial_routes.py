@@ -0,0 +1,168 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+import os
+from app.database.database import get_read_db
+from app.database.models import Order, Shipment
+from app.schemas import NearbyOrderResponse, NearbyShipmentResponse
+from app.spatial.spatial_service import (
+    ORDER_ENDS,
+    SHIPMENT_ENDS,
+    find_nearby,
+    find_within,
+    order_filters,
+    shipment_filters
+)
+from app.utils.city_coords import get_city_coordinates
+
+router = APIRouter()
+
+SPATIAL_MAX_RADIUS_KM = float(os.getenv("SPATIAL_MAX_RADIUS_KM", "1000"))
+SPATIAL_MAX_RESULTS = 1000
+
+
+def _center(lat: Optional[float], lon: Optional[float], city: Optional[str]) -> Tuple[float, float]:
+    """Search center from explicit coordinates or a city name."""
+    if lat is not None and lon is not None:
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise HTTPException(status_code=400, detail="lat must be within -90..90 and lon within -180..180")
+        return lat, lon
+    if city:
+        coords = get_city_coordinates(city)
+        if not coords:
+            raise HTTPException(status_code=404, detail=f"Unknown city: {city}")
+        return coords[1], coords[0]
+    raise HTTPException(status_code=400, detail="Provide lat and lon, or city")
+
+
+def _check_radius(radius_km: float, limit: int):
+    if not 0 < radius_km <= SPATIAL_MAX_RADIUS_KM:
+        raise HTTPException(status_code=400, detail=f"radius_km must be within 0..{SPATIAL_MAX_RADIUS_KM:g}")
+    _check_limit(limit)
+
+
+def _check_limit(limit: int):
+    if not 1 <= limit <= SPATIAL_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail=f"limit must be within 1..{SPATIAL_MAX_RESULTS}")
+
+
+def _bbox(min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+        raise HTTPException(
+            status_code=400,
+            detail="Bounding box needs -90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180"
+        )
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def _prefix(ends: dict, end: str) -> str:
+    if end not in ends:
+        raise HTTPException(status_code=400, detail=f"end must be one of: {', '.join(ends)}")
+    return ends[end]
+
+
+@router.get("/shipments/nearby", response_model=List[NearbyShipmentResponse])
+def get_nearby_shipments(
+    radius_km: float = 50,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    city: Optional[str] = None,
+    end: str = "destination",
+    status: Optional[str] = None,
+    include_delivered: bool = False,
+    limit: int = 100,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Shipments whose destination (or source) is within radius_km of a point.
+
+    The point is lat/lon or a city name. Active shipments only unless a
+    status is given or include_delivered is set. Nearest first, each with
+    distance_from_center_km.
+    """
+    _check_radius(radius_km, limit)
+    center_lat, center_lon = _center(lat, lon, city)
+    matches = find_nearby(
+        db, Shipment, _prefix(SHIPMENT_ENDS, end), center_lat, center_lon, radius_km,
+        shipment_filters(status, include_delivered), limit
+    )
+    return [
+        NearbyShipmentResponse.model_validate(shipment).model_copy(
+            update={"distance_from_center_km": round(distance, 2)}
+        )
+        for shipment, distance in matches
+    ]
+
+
+@router.get("/shipments/within", response_model=List[NearbyShipmentResponse])
+def get_shipments_within(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    end: str = "destination",
+    status: Optional[str] = None,
+    include_delivered: bool = False,
+    limit: int = 100,
+    db: Session = Depends(get_read_db)
+):
+    """Shipments whose destination (or source) lies in a bounding box, by id"""
+    _check_limit(limit)
+    bbox = _bbox(min_lat, min_lon, max_lat, max_lon)
+    return find_within(
+        db, Shipment, _prefix(SHIPMENT_ENDS, end), bbox,
+        shipment_filters(status, include_delivered), limit
+    )
+
+
+@router.get("/orders/nearby", response_model=List[NearbyOrderResponse])
+def get_nearby_orders(
+    radius_km: float = 50,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    city: Optional[str] = None,
+    end: str = "destination",
+    user_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: int = 100,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Orders whose destination (or origin) city is within radius_km of a point.
+
+    Optionally limited to one user's orders and/or a status. Nearest first,
+    each with distance_from_center_km.
+    """
+    _check_radius(radius_km, limit)
+    center_lat, center_lon = _center(lat, lon, city)
+    matches = find_nearby(
+        db, Order, _prefix(ORDER_ENDS, end), center_lat, center_lon, radius_km,
+        order_filters(user_id, status), limit
+    )
+    return [
+        NearbyOrderResponse.model_validate(order).model_copy(
+            update={"distance_from_center_km": round(distance, 2)}
+        )
+        for order, distance in matches
+    ]
+
+
+@router.get("/orders/within", response_model=List[NearbyOrderResponse])
+def get_orders_within(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    end: str = "destination",
+    user_id: Optional[int] = None,
+    status: Optional[str] = None,
+    limit: int = 100,
+    db: Session = Depends(get_read_db)
+):
+    """Orders whose destination (or origin) city lies in a bounding box, by id"""
+    _check_limit(limit)
+    bbox = _bbox(min_lat, min_lon, max_lat, max_lon)
+    return find_within(
+        db, Order, _prefix(ORDER_ENDS, end), bbox,
+        order_filters(user_id, status), limit
+    )
@@ -0,0 +1,174 @@
+"""
+Radius and bounding-box queries over shipments and orders.
+
+Each record stores typed lat/lon columns and a geohash per endpoint
+(shipments: source/dest, orders: origin/destination). A query runs in
+two steps:
+1. Prune — geohash range scans over the cells covering the search box
+   (plus the box itself on lat/lon), reading only id, lat and lon
+2. Filter — exact haversine distance on those candidates (radius
+   queries), nearest first
+
+Radius queries let the database rank the box by a planar distance
+(degrees, longitude scaled by cos(latitude)) and return at most
+SPATIAL_CANDIDATE_FACTOR x limit candidates, so a wide radius over a
+dense region never ships the whole box to Python. The planar ranking is
+within a few percent of haversine at the supported radii; the factor
+covers the rows it puts out of order.
+
+Only the matching rows are then loaded in full.
+"""
+
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.database.models import Order, Shipment
+from app.utils.city_coords import lookup_local_coordinates
+from app.utils.geohash import BBox, cover_bbox, haversine_km, point_fields, radius_bbox
+
+SPATIAL_CANDIDATE_FACTOR = int(os.getenv("SPATIAL_CANDIDATE_FACTOR", "4"))
+
+# Query parameter value -> column prefix
+SHIPMENT_ENDS = {"destination": "dest", "source": "source"}
+ORDER_ENDS = {"destination": "destination", "origin": "origin"}
+
+
+def shipment_location_fields(source_coords, dest_coords) -> dict:
+    """Typed spatial columns for a shipment's [longitude, latitude] pairs."""
+    return {**point_fields("source", source_coords), **point_fields("dest", dest_coords)}
+
+
+def order_location_fields(origin: str, destination: str) -> dict:
+    """
+    Typed spatial columns for an order's cities.
+
+    Uses the local city table only, so order writes never wait on a
+    geocoding call; unknown cities stay empty until the backfill resolves
+    them.
+    """
+    return {
+        **point_fields("origin", lookup_local_coordinates(origin)),
+        **point_fields("destination", lookup_local_coordinates(destination)),
+    }
+
+
+def _columns(model, prefix: str):
+    return (
+        getattr(model, f"{prefix}_lat"),
+        getattr(model, f"{prefix}_lon"),
+        getattr(model, f"{prefix}_geohash"),
+    )
+
+
+def _in_box(model, prefix: str, bbox: BBox) -> list:
+    """Conditions for a point in the box: geohash cell ranges, then exact bounds."""
+    lat, lon, geohash = _columns(model, prefix)
+    min_lat, min_lon, max_lat, max_lon = bbox
+    return [
+        or_(*(geohash.between(low, high) for low, high in cover_bbox(bbox))),
+        lat.between(min_lat, max_lat),
+        lon.between(min_lon, max_lon),
+    ]
+
+
+def _load(db: Session, model, ids: List[int]) -> list:
+    """Full rows for ids, in the given order."""
+    if not ids:
+        return []
+    rows: Dict[int, object] = {row.id: row for row in db.query(model).filter(model.id.in_(ids))}
+    return [rows[id_] for id_ in ids if id_ in rows]
+
+
+def find_nearby(
+    db: Session,
+    model,
+    prefix: str,
+    lat: float,
+    lon: float,
+    radius_km: float,
+    filters: Sequence = (),
+    limit: int = 100
+) -> List[Tuple[object, float]]:
+    """
+    Rows whose point is within radius_km of (lat, lon).
+
+    Args:
+        model: Shipment or Order
+        prefix: Column prefix of the endpoint to match (see *_ENDS)
+        filters: Extra SQL conditions (status, owner)
+        limit: Maximum rows returned
+
+    Returns:
+        [(row, distance_km)], nearest first
+    """
+    lat_column, lon_column, _ = _columns(model, prefix)
+    lon_scale = math.cos(math.radians(lat))
+    planar_distance = (
+        (lat_column - lat) * (lat_column - lat)
+        + (lon_column - lon) * (lon_column - lon) * (lon_scale * lon_scale)
+    )
+    candidates = db.execute(
+        select(model.id, lat_column, lon_column)
+        .where(*_in_box(model, prefix, radius_bbox(lat, lon, radius_km)), *filters)
+        .order_by(planar_distance, model.id)
+        .limit(limit * SPATIAL_CANDIDATE_FACTOR)
+    ).all()
+    if not candidates:
+        return []
+
+    ids, lats, lons = zip(*candidates)
+    distances = haversine_km(lat, lon, lats, lons)
+    inside = [(distances[i], ids[i]) for i in range(len(ids)) if distances[i] <= radius_km]
+    inside.sort()
+    inside = inside[:limit]
+
+    distance_by_id = {id_: float(distance) for distance, id_ in inside}
+    rows = _load(db, model, [id_ for _, id_ in inside])
+    return [(row, distance_by_id[row.id]) for row in rows]
+
+
+def find_within(
+    db: Session,
+    model,
+    prefix: str,
+    bbox: BBox,
+    filters: Sequence = (),
+    limit: int = 100
+) -> list:
+    """
+    Rows whose point lies in a bounding box, by id.
+
+    Args:
+        bbox: (min_lat, min_lon, max_lat, max_lon)
+
+    Returns:
+        Up to limit rows
+    """
+    ids = db.scalars(
+        select(model.id)
+        .where(*_in_box(model, prefix, bbox), *filters)
+        .order_by(model.id)
+        .limit(limit)
+    ).all()
+    return _load(db, model, list(ids))
+
+
+def shipment_filters(status: Optional[str], include_delivered: bool) -> list:
+    """Status conditions for shipment queries (active shipments by default)."""
+    if status:
+        return [Shipment.status == status]
+    return [] if include_delivered else [Shipment.status != "DELIVERED"]
+
+
+def order_filters(user_id: Optional[int], status: Optional[str]) -> list:
+    """Owner and status conditions for order queries."""
+    conditions = []
+    if user_id is not None:
+        conditions.append(Order.user_id == user_id)
+    if status:
+        conditions.append(Order.status == status)
+    return conditions
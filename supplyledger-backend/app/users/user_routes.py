@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.database.database import get_db
+from app.database.database import get_db, get_read_db
+from app.database.unit_of_work import UnitOfWorkRoute
 from app.database.models import User
 from app.schemas import UserCreate, UserResponse, UserUpdate
 from app.auth.auth_service import hash_password
 import uuid
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
 @router.post("/register", response_model=UserResponse)
@@ -29,14 +30,13 @@ def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    db.flush()
     
     return new_user
 
 
 @router.get("/profile/{user_id}", response_model=UserResponse)
-def get_user_profile(user_id: int, db: Session = Depends(get_db)):
+def get_user_profile(user_id: int, db: Session = Depends(get_read_db)):
     """Get user profile by ID"""
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
@@ -61,13 +61,12 @@ def update_user_profile(user_id: int, user_data: UserUpdate, db: Session = Depen
     if user_data.address:
         user.address = user_data.address
     
-    db.commit()
-    db.refresh(user)
+    db.flush()
     return user
 
 
 @router.get("/search")
-def search_users(email: str = None, db: Session = Depends(get_db)):
+def search_users(email: str = None, db: Session = Depends(get_read_db)):
     """Search users by email"""
     if not email:
         raise HTTPException(status_code=400, detail="Email parameter required")
@@ -0,0 +1,191 @@
+"""
+Circuit breakers for external providers.
+
+Each provider gets its own breaker with a count-based rolling window of
+recent calls. A call counts against the provider when it fails or takes
+longer than the slow-call threshold.
+
+States:
+1. CLOSED    — calls go through; the window is evaluated after each call
+2. OPEN      — calls are rejected immediately so callers use their local
+               fallback; after open_seconds the breaker goes half-open
+3. HALF_OPEN — a limited number of probe calls go through; a good probe
+               closes the breaker, a bad one re-opens it
+
+Thresholds come from BREAKER_* environment variables, overridable per
+provider as BREAKER_<PROVIDER>_*, e.g. BREAKER_OPENWEATHER_OPEN_SECONDS.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+from app.monitoring.metrics import CIRCUIT_BREAKER_REJECTIONS, CIRCUIT_BREAKER_STATE
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def _setting(provider: str, name: str, default: str) -> float:
+    specific = f"BREAKER_{provider.upper()}_{name}"
+    return float(os.getenv(specific, os.getenv(f"BREAKER_{name}", default)))
+
+
+class CircuitBreaker:
+    """Error-rate and latency circuit breaker with half-open probing."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 3.0,
+        window_size: int = 20,
+        minimum_calls: int = 5,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.window_size = window_size
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window_size)   # True = bad call (failed or slow)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        CIRCUIT_BREAKER_STATE.labels(name).set(_STATE_VALUES[CLOSED])
+
+    @classmethod
+    def from_env(cls, name: str) -> "CircuitBreaker":
+        return cls(
+            name,
+            failure_rate_threshold=_setting(name, "FAILURE_RATE", "0.5"),
+            slow_call_seconds=_setting(name, "SLOW_CALL_SECONDS", "3"),
+            window_size=int(_setting(name, "WINDOW_SIZE", "20")),
+            minimum_calls=int(_setting(name, "MINIMUM_CALLS", "5")),
+            open_seconds=_setting(name, "OPEN_SECONDS", "30"),
+            half_open_probes=int(_setting(name, "HALF_OPEN_PROBES", "1")),
+        )
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _set_state(self, state: str):
+        self._state = state
+        CIRCUIT_BREAKER_STATE.labels(self.name).set(_STATE_VALUES[state])
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._set_state(HALF_OPEN)
+            self._probes_in_flight = 0
+
+    def _trip(self):
+        self._set_state(OPEN)
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def allow_request(self) -> bool:
+        """
+        Whether a call may go to the provider now.
+
+        Every allowed call must be followed by record_success() or
+        record_failure(), otherwise half-open probes are never released.
+        """
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                return True
+
+        CIRCUIT_BREAKER_REJECTIONS.labels(self.name).inc()
+        return False
+
+    def record_success(self, duration_seconds: float):
+        """Record a completed call; slow calls count as bad."""
+        self._record(bad=duration_seconds >= self.slow_call_seconds)
+
+    def record_failure(self, duration_seconds: float = 0.0):
+        """Record a failed call."""
+        self._record(bad=True)
+
+    def _record(self, bad: bool):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if bad:
+                    self._trip()
+                else:
+                    self._set_state(CLOSED)
+                    self._outcomes.clear()
+                return
+
+            if self._state == OPEN:
+                # A call allowed before the breaker tripped; the window restarts on close
+                return
+
+            self._outcomes.append(bad)
+            if len(self._outcomes) >= self.minimum_calls:
+                bad_rate = sum(self._outcomes) / len(self._outcomes)
+                if bad_rate >= self.failure_rate_threshold:
+                    self._trip()
+
+    @contextmanager
+    def track_call(self):
+        """
+        Record the outcome and latency of an allowed call.
+
+        Usage:
+            if breaker.allow_request():
+                with breaker.track_call():
+                    response = requests.get(...)
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record_failure(time.perf_counter() - started)
+            raise
+        self.record_success(time.perf_counter() - started)
+
+    def reset(self):
+        """Force the breaker closed and forget recent calls."""
+        with self._lock:
+            self._outcomes.clear()
+            self._probes_in_flight = 0
+            self._set_state(CLOSED)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for a provider, created on first use."""
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker.from_env(name)
+            _breakers[name] = breaker
+        return breaker
+
+
+def breaker_states() -> Dict[str, str]:
+    """Current state of every breaker created so far."""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.state for breaker in breakers}
@@ -6,9 +6,16 @@ City coordinates lookup with two strategies:
 The system tries local lookup first, then falls back to Nominatim for unknown cities.
 """
 
+import logging
+import os
 import requests
 import time
 from typing import Optional, List
+from app.monitoring.metrics import GEOCODING_PROVIDER, record_fallback, track_external_call
+from app.utils.circuit_breaker import get_breaker
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 # Local city coordinates database for fast lookups
 CITY_COORDINATES = {
@@ -49,15 +56,23 @@ CITY_COORDINATES = {
 }
 
 # Nominatim API configuration
-NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
 HEADERS = {
     "User-Agent": "supplyledger-app (blockchain-enabled-supply-chain)"
 }
 
 # Rate limiting: 1 second between API calls to respect Nominatim ToS
-RATE_LIMIT_SECONDS = 1
+RATE_LIMIT_SECONDS = float(os.getenv("NOMINATIM_RATE_LIMIT_SECONDS", "1"))
 _last_api_call = 0
 
+geocoding_breaker = get_breaker(GEOCODING_PROVIDER)
+_geocoding_in_flight = SingleFlight("geocode")
+
+
+def normalize_city_name(city_name: str) -> str:
+    """Lowercase, whitespace-trimmed city name used as a lookup key."""
+    return (city_name or "").strip().lower()
+
 
 def _get_from_nominatim(city_name: str) -> Optional[List[float]]:
     """
@@ -75,8 +90,13 @@ def _get_from_nominatim(city_name: str) -> Optional[List[float]]:
         - Free service, no API key required
         - Rate limited to 1 request/second (respecting ToS)
         - Timeout of 5 seconds
+        - Skipped (returns None) while the geocoding breaker is open
     """
     global _last_api_call
+
+    if not geocoding_breaker.allow_request():
+        record_fallback(GEOCODING_PROVIDER, "circuit_open")
+        return None
     
     # Respect rate limiting
     time_since_last_call = time.time() - _last_api_call
@@ -92,14 +112,15 @@ def _get_from_nominatim(city_name: str) -> Optional[List[float]]:
     }
     
     try:
-        response = requests.get(
-            NOMINATIM_URL,
-            params=params,
-            headers=HEADERS,
-            timeout=5
-        )
-        response.raise_for_status()
-        data = response.json()
+        with geocoding_breaker.track_call(), track_external_call(GEOCODING_PROVIDER):
+            response = requests.get(
+                NOMINATIM_URL,
+                params=params,
+                headers=HEADERS,
+                timeout=5
+            )
+            response.raise_for_status()
+            data = response.json()
         
         if not data:
             return None
@@ -111,19 +132,46 @@ def _get_from_nominatim(city_name: str) -> Optional[List[float]]:
         return [lon, lat]
     
     except requests.exceptions.Timeout:
-        print(f"⏱️ Nominatim timeout for '{city_name}' (5 seconds)")
+        logger.warning("Nominatim timeout for '%s' (5 seconds)", city_name)
         return None
     except requests.exceptions.ConnectionError:
-        print(f"🌐 Connection error querying Nominatim for '{city_name}'")
+        logger.warning("Connection error querying Nominatim for '%s'", city_name)
         return None
     except (ValueError, KeyError, IndexError) as e:
-        print(f"❌ Error parsing Nominatim response for '{city_name}': {e}")
+        logger.warning("Error parsing Nominatim response for '%s': %s", city_name, e)
         return None
     except Exception as e:
-        print(f"⚠️ Unexpected error geocoding '{city_name}': {e}")
+        logger.warning("Unexpected error geocoding '%s': %s", city_name, e)
         return None
 
 
+def lookup_local_coordinates(city_name: str) -> Optional[List[float]]:
+    """
+    Coordinates from the local table only (exact, then partial match).
+
+    Never calls the network, so it is safe on hot write paths.
+
+    Returns:
+        [longitude, latitude] or None if the city is not known locally
+    """
+    if not city_name:
+        return None
+    
+    # Convert to lowercase and strip whitespace
+    city_key = normalize_city_name(city_name)
+    
+    # Strategy 1: Check local database for exact match
+    if city_key in CITY_COORDINATES:
+        return CITY_COORDINATES[city_key]
+    
+    # Strategy 2: Check for partial match in local database
+    for key, coords in CITY_COORDINATES.items():
+        if key in city_key or city_key in key:
+            return coords
+    
+    return None
+
+
 def get_city_coordinates(city_name: str) -> Optional[List[float]]:
     """
     Get coordinates for a city name using two strategies:
@@ -151,28 +199,24 @@ def get_city_coordinates(city_name: str) -> Optional[List[float]]:
     if not city_name:
         return None
     
-    # Convert to lowercase and strip whitespace
-    city_key = city_name.strip().lower()
-    
-    # Strategy 1: Check local database for exact match
-    if city_key in CITY_COORDINATES:
-        return CITY_COORDINATES[city_key]
+    local_coords = lookup_local_coordinates(city_name)
+    if local_coords:
+        return local_coords
     
-    # Strategy 2: Check for partial match in local database
-    for key, coords in CITY_COORDINATES.items():
-        if key in city_key or city_key in key:
-            return coords
+    city_key = normalize_city_name(city_name)
     
     # Strategy 3: Fall back to Nominatim API for unknown cities
     # This adds ~1-2 seconds but works for any city in the world
-    print(f"📍 '{city_name}' not in local database, querying Nominatim...")
-    nominatim_coords = _get_from_nominatim(city_name)
+    logger.info("'%s' not in local database, querying Nominatim", city_name)
+    # Concurrent lookups of the same unknown city share one request
+    nominatim_coords = _geocoding_in_flight.do(city_key, _get_from_nominatim, city_name)
     
     if nominatim_coords:
-        print(f"✅ Found '{city_name}' via Nominatim: {nominatim_coords}")
+        logger.info("Found '%s' via Nominatim: %s", city_name, nominatim_coords)
         # Optional: Cache this for future use
         # CITY_COORDINATES[city_key] = nominatim_coords
         return nominatim_coords
     
-    print(f"❌ City '{city_name}' not found in local DB or Nominatim")
+    logger.warning("City '%s' not found in local DB or Nominatim", city_name)
+    record_fallback(GEOCODING_PROVIDER, "not_found")
     return None
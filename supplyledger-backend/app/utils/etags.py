@@ -0,0 +1,62 @@
+"""
+Strong ETags and If-None-Match handling for single-row resources.
+
+A tag is a digest of the resource kind and the row fields that change
+whenever its representation does: version (bumped on every write),
+updated_at and, for shipments, blockchain_hash. Endpoints first read just
+those fields; when the client's If-None-Match still matches they answer
+304 without loading or serializing the full row.
+"""
+
+import hashlib
+from typing import Any, Callable, Optional, Sequence
+
+from fastapi import Request, Response
+
+
+def make_etag(kind: str, *fields: Any) -> str:
+    """Quoted strong ETag for a resource kind and its change-tracking fields."""
+    raw = "|".join([kind, *(value.isoformat() if hasattr(value, "isoformat") else str(value) for value in fields)])
+    return '"' + hashlib.blake2b(raw.encode(), digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches a tag.
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match, so
+    W/"..." from intermediaries that weakened the tag still matches.
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in header.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+
+def not_modified(etag: str) -> Response:
+    """304 response carrying the current tag."""
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def check_not_modified(request: Request, kind: str, fields: Callable[[], Optional[Sequence[Any]]]) -> Optional[Response]:
+    """
+    Answer a conditional GET from the change-tracking fields alone.
+
+    Args:
+        kind: Resource kind, as passed to make_etag for the full response
+        fields: Lightweight lookup of the tag fields; returns None when the
+            full path must run (row missing, caller not allowed to see it)
+
+    Returns:
+        A 304 response, or None to serve the resource normally
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    current = fields()
+    if current is None:
+        return None
+    etag = make_etag(kind, *current)
+    return not_modified(etag) if etag_matches(header, etag) else None
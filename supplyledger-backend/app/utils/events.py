@@ -0,0 +1,69 @@
+"""
+Minimal in-process event bus.
+
+publish() only enqueues; a single daemon thread delivers events to the
+subscribed handlers in order, so a request that notices a change (e.g. a
+new weather reading) never waits for the work it triggers. Handler
+exceptions are logged and don't stop delivery to other handlers.
+"""
+
+import logging
+import queue
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Topics
+WEATHER_READING = "weather.reading"                  # city (reading queued in app.utils.weather)
+WEATHER_FACTOR_CHANGED = "weather.factor_changed"     # city, factor, previous
+SPEED_PROFILES_UPDATED = "routing.speed_profiles_updated"  # lanes
+
+
+class EventBus:
+    """Topic-based publish/subscribe with asynchronous delivery."""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable]] = defaultdict(list)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, topic: str, handler: Callable):
+        """Call handler(**payload) for every event published on topic."""
+        with self._lock:
+            self._handlers[topic].append(handler)
+
+    def publish(self, topic: str, **payload):
+        """Queue an event; returns immediately."""
+        with self._lock:
+            if not self._handlers.get(topic):
+                return
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="event-bus", daemon=True)
+                self._thread.start()
+        self._queue.put((topic, payload))
+
+    def flush(self):
+        """Block until every queued event has been handled."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            topic, payload = self._queue.get()
+            try:
+                with self._lock:
+                    handlers = list(self._handlers.get(topic, ()))
+                for handler in handlers:
+                    try:
+                        handler(**payload)
+                    except Exception:
+                        logger.exception("Handler %s failed for %s", getattr(handler, "__name__", handler), topic)
+            finally:
+                self._queue.task_done()
+
+
+event_bus = EventBus()
+subscribe = event_bus.subscribe
+publish = event_bus.publish
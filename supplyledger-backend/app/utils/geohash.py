@@ -0,0 +1,164 @@
+"""
+Geohash cells and distance helpers for spatial queries.
+
+A geohash of length p names a lat/lon cell; all points in a cell share the
+prefix, and cells with a common prefix nest. Stored at GEOHASH_PRECISION
+(6 characters, about 1.2 x 0.6 km), a geohash column answers "which rows
+are in these cells" with B-tree range scans:
+
+    cell "tdr1" at precision 6  ->  geohash BETWEEN 'tdr100' AND 'tdr1zz'
+
+cover_bbox() picks the finest precision that covers a bounding box in at
+most GEOHASH_MAX_COVER_CELLS cells and merges cells that are adjacent in
+sort order into one range, so a query is a handful of index ranges. Rows
+from those ranges are candidates only; callers filter them exactly with
+haversine_km().
+"""
+
+import math
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+GEOHASH_PRECISION = 6
+GEOHASH_MAX_COVER_CELLS = int(os.getenv("GEOHASH_MAX_COVER_CELLS", "32"))
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+BBox = Tuple[float, float, float, float]   # (min_lat, min_lon, max_lat, max_lon)
+
+
+def _bits(precision: int) -> Tuple[int, int]:
+    """(latitude bits, longitude bits) of a geohash with this many characters."""
+    total = 5 * precision
+    return total // 2, total - total // 2
+
+
+def _cell_index(lat: float, lon: float, precision: int) -> Tuple[int, int]:
+    lat_bits, lon_bits = _bits(precision)
+    lat_index = int((lat + 90.0) / 180.0 * (1 << lat_bits))
+    lon_index = int((lon + 180.0) / 360.0 * (1 << lon_bits))
+    return min(lat_index, (1 << lat_bits) - 1), min(lon_index, (1 << lon_bits) - 1)
+
+
+def _interleave(lat_index: int, lon_index: int, precision: int) -> int:
+    """Cell number: longitude and latitude bits interleaved, longitude first."""
+    lat_bits, lon_bits = _bits(precision)
+    value = 0
+    for bit in range(5 * precision):
+        if bit % 2 == 0:
+            lon_bits -= 1
+            value = (value << 1) | ((lon_index >> lon_bits) & 1)
+        else:
+            lat_bits -= 1
+            value = (value << 1) | ((lat_index >> lat_bits) & 1)
+    return value
+
+
+def _to_string(value: int, precision: int) -> str:
+    chars = []
+    for _ in range(precision):
+        chars.append(_BASE32[value & 0x1F])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Geohash of a point."""
+    return _to_string(_interleave(*_cell_index(lat, lon, precision), precision), precision)
+
+
+def cell_size_degrees(precision: int) -> Tuple[float, float]:
+    """(height, width) of a cell in degrees."""
+    lat_bits, lon_bits = _bits(precision)
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> BBox:
+    """Bounding box enclosing a circle; spans all longitudes near the poles."""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(lat))
+    dlon = 180.0 if cos_lat < 1e-6 else radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    if dlon >= 180.0:
+        return max(lat - dlat, -90.0), -180.0, min(lat + dlat, 90.0), 180.0
+    return max(lat - dlat, -90.0), max(lon - dlon, -180.0), min(lat + dlat, 90.0), min(lon + dlon, 180.0)
+
+
+def cover_bbox(bbox: BBox, max_cells: int = GEOHASH_MAX_COVER_CELLS) -> List[Tuple[str, str]]:
+    """
+    Geohash ranges covering a bounding box.
+
+    Args:
+        bbox: (min_lat, min_lon, max_lat, max_lon), min_lon <= max_lon
+        max_cells: Upper bound on cells before merging
+
+    Returns:
+        Inclusive (low, high) GEOHASH_PRECISION-character ranges
+    """
+    min_lat, min_lon, max_lat, max_lon = bbox
+    precision = 1
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        low_lat, low_lon = _cell_index(min_lat, min_lon, candidate)
+        high_lat, high_lon = _cell_index(max_lat, max_lon, candidate)
+        if (high_lat - low_lat + 1) * (high_lon - low_lon + 1) <= max_cells:
+            precision = candidate
+            break
+
+    low_lat, low_lon = _cell_index(min_lat, min_lon, precision)
+    high_lat, high_lon = _cell_index(max_lat, max_lon, precision)
+    cells = sorted(
+        _interleave(lat_index, lon_index, precision)
+        for lat_index in range(low_lat, high_lat + 1)
+        for lon_index in range(low_lon, high_lon + 1)
+    )
+
+    # Consecutive cell numbers are contiguous in sort order: one range each run
+    runs = []
+    for cell in cells:
+        if runs and cell == runs[-1][1] + 1:
+            runs[-1][1] = cell
+        else:
+            runs.append([cell, cell])
+
+    padding = GEOHASH_PRECISION - precision
+    return [
+        (_to_string(start, precision) + "0" * padding, _to_string(end, precision) + "z" * padding)
+        for start, end in runs
+    ]
+
+
+def haversine_km(lat: float, lon: float, lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+    """Great-circle distances (km) from one point to many."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lons, dtype=np.float64))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_matrix(lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+    """Great-circle distances (km) between every pair of points, as an n x n array."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    a = (
+        np.sin((lat[:, None] - lat[None, :]) / 2) ** 2
+        + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin((lon[:, None] - lon[None, :]) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def point_fields(prefix: str, coords: Optional[Sequence[float]]) -> dict:
+    """
+    Typed spatial columns for a [longitude, latitude] pair.
+
+    Returns:
+        {prefix_lat, prefix_lon, prefix_geohash}, all None without coords
+    """
+    if not coords:
+        return {f"{prefix}_lat": None, f"{prefix}_lon": None, f"{prefix}_geohash": None}
+    lon, lat = float(coords[0]), float(coords[1])
+    return {f"{prefix}_lat": lat, f"{prefix}_lon": lon, f"{prefix}_geohash": encode(lat, lon)}
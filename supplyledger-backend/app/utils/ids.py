@@ -0,0 +1,128 @@
+"""
+Time-ordered identifiers (ULID).
+
+A ULID is 128 bits rendered as 26 Crockford base32 characters:
+1. 48 bits of millisecond Unix time, so IDs sort by creation time and new
+   rows append to the right edge of a B-tree index
+2. 80 random bits, so workers never need to coordinate to stay unique
+
+Within one process, IDs minted in the same millisecond increment the
+random part instead of drawing a new one, keeping them strictly
+increasing.
+
+Order IDs are displayed as "ORD-" + ULID (e.g. ORD-01J9Z3K4T8W2Q6M1N5P7R0S3V4).
+Older order IDs ("ORD-" + 8 hex characters) remain valid: they never
+collide with the 26-character form and are accepted wherever an order ID
+is looked up.
+"""
+
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+ORDER_ID_PREFIX = "ORD-"
+
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {char: value for value, char in enumerate(_ALPHABET)}
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+
+_ULID_PATTERN = re.compile(r"^[0-7][0-9A-HJKMNP-TV-Z]{25}$")
+_LEGACY_ORDER_ID_PATTERN = re.compile(r"^ORD-[0-9A-F]{8}$")
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def _encode(value: int) -> str:
+    chars = []
+    for _ in range(26):
+        chars.append(_ALPHABET[value & 0x1F])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def new_ulid(at: Optional[datetime] = None) -> str:
+    """
+    Generate a ULID.
+
+    Args:
+        at: Timestamp to embed (default now); naive datetimes are taken as UTC
+
+    Returns:
+        26-character ULID string
+    """
+    global _last_ms, _last_random
+
+    if at is not None:
+        if at.tzinfo is None:
+            at = at.replace(tzinfo=timezone.utc)
+        # Historical timestamps (backfills, seeding) don't advance the monotonic clock
+        timestamp_ms = int(at.timestamp() * 1000)
+        randomness = int.from_bytes(os.urandom(10), "big")
+        return _encode((timestamp_ms << _RANDOM_BITS) | randomness)
+
+    with _lock:
+        timestamp_ms = time.time_ns() // 1_000_000
+        if timestamp_ms <= _last_ms and _last_random < _RANDOM_MAX:
+            # Same millisecond (or the clock stepped back): keep increasing
+            timestamp_ms = _last_ms
+            randomness = _last_random + 1
+        else:
+            randomness = int.from_bytes(os.urandom(10), "big")
+        _last_ms, _last_random = timestamp_ms, randomness
+
+    return _encode((timestamp_ms << _RANDOM_BITS) | randomness)
+
+
+def ulid_timestamp(ulid: str) -> datetime:
+    """Creation time (naive UTC) embedded in a ULID."""
+    timestamp_ms = 0
+    for char in ulid[:10]:
+        timestamp_ms = (timestamp_ms << 5) | _DECODE[char]
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+def new_order_id(at: Optional[datetime] = None) -> str:
+    """Order ID in display form: ORD-<ULID>."""
+    return ORDER_ID_PREFIX + new_ulid(at)
+
+
+def normalize_order_id(order_id: str) -> str:
+    """
+    Canonical form of a user-supplied order ID.
+
+    ULIDs are case-insensitive, and Crockford base32 reads I/L as 1 and O
+    as 0. Legacy hex IDs are only upper-cased.
+    """
+    order_id = order_id.strip().upper()
+    if not order_id.startswith(ORDER_ID_PREFIX):
+        return order_id
+    body = order_id[len(ORDER_ID_PREFIX):]
+    if len(body) == 26:
+        body = body.translate(str.maketrans("ILO", "110"))
+    return ORDER_ID_PREFIX + body
+
+
+def is_legacy_order_id(order_id: str) -> bool:
+    """Whether the ID predates time-ordered IDs (ORD-XXXXXXXX, random hex)."""
+    return bool(_LEGACY_ORDER_ID_PATTERN.match(order_id))
+
+
+def order_id_created_at(order_id: str) -> Optional[datetime]:
+    """
+    Creation time encoded in an order ID.
+
+    Returns:
+        Naive UTC datetime, or None for legacy IDs (which carry no time)
+    """
+    if not order_id.startswith(ORDER_ID_PREFIX):
+        return None
+    body = order_id[len(ORDER_ID_PREFIX):]
+    if not _ULID_PATTERN.match(body):
+        return None
+    return ulid_timestamp(body)
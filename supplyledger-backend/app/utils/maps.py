@@ -1,46 +1,94 @@
+import logging
 import requests
 import os
+from app.monitoring.metrics import ROUTING_PROVIDER, record_fallback, track_external_call
+from app.utils.circuit_breaker import get_breaker
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 API_KEY = os.getenv("OPENROUTESERVICE_KEY", "YOUR_OPENROUTESERVICE_KEY")
+BASE_URL = os.getenv("OPENROUTESERVICE_URL", "https://api.openrouteservice.org")
 
-def get_route_data(source_coords, dest_coords):
+# Where a route came from (reported by predictions)
+ROUTE_SOURCE_LIVE = "openrouteservice"
+ROUTE_FALLBACK_NO_ROUTE = "haversine_no_route"
+ROUTE_FALLBACK_ERROR = "haversine_error"
+ROUTE_FALLBACK_CIRCUIT_OPEN = "haversine_circuit_open"
+
+routing_breaker = get_breaker(ROUTING_PROVIDER)
+_routes_in_flight = SingleFlight("route")
+
+
+def fetch_route(source_coords, dest_coords):
     """
-    Fetch real route distance and duration using OpenRouteService API.
-    
+    Fetch route distance and duration, reporting where the numbers came from.
+
+    When the routing breaker is open the API is skipped and the haversine
+    estimate is returned straight away. Concurrent calls for the same
+    coordinates share one request.
+
     Args:
         source_coords: [longitude, latitude] of source
         dest_coords: [longitude, latitude] of destination
-    
+
     Returns:
-        tuple: (distance_km, duration_min)
+        tuple: (distance_km, duration_min, source) where source is
+        ROUTE_SOURCE_LIVE or one of the ROUTE_FALLBACK_* values
     """
+    key = (tuple(source_coords), tuple(dest_coords))
+    return _routes_in_flight.do(key, _fetch_route, source_coords, dest_coords)
+
+
+def _fetch_route(source_coords, dest_coords):
+    if not routing_breaker.allow_request():
+        record_fallback(ROUTING_PROVIDER, ROUTE_FALLBACK_CIRCUIT_OPEN)
+        return (*estimate_distance(source_coords, dest_coords), ROUTE_FALLBACK_CIRCUIT_OPEN)
+
     try:
-        url = "https://api.openrouteservice.org/v2/directions/driving-car"
+        url = f"{BASE_URL}/v2/directions/driving-car"
         headers = {"Authorization": API_KEY}
         body = {
             "coordinates": [source_coords, dest_coords]
         }
 
-        response = requests.post(url, json=body, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
+        with routing_breaker.track_call(), track_external_call(ROUTING_PROVIDER):
+            response = requests.post(url, json=body, headers=headers, timeout=10)
+            response.raise_for_status()
+            data = response.json()
         
         if "features" not in data or len(data["features"]) == 0:
             # Fallback: estimate based on straight-line distance
-            return estimate_distance(source_coords, dest_coords)
+            record_fallback(ROUTING_PROVIDER, ROUTE_FALLBACK_NO_ROUTE)
+            return (*estimate_distance(source_coords, dest_coords), ROUTE_FALLBACK_NO_ROUTE)
         
         summary = data["features"][0]["properties"]["summary"]
 
         distance_km = summary["distance"] / 1000
         duration_min = summary["duration"] / 60
 
-        return distance_km, duration_min
+        return distance_km, duration_min, ROUTE_SOURCE_LIVE
     
     except Exception as e:
-        print(f"Error fetching route data: {e}")
+        logger.warning("Error fetching route data: %s", e)
         # Fallback to estimation
-        return estimate_distance(source_coords, dest_coords)
+        record_fallback(ROUTING_PROVIDER, ROUTE_FALLBACK_ERROR)
+        return (*estimate_distance(source_coords, dest_coords), ROUTE_FALLBACK_ERROR)
+
+
+def get_route_data(source_coords, dest_coords):
+    """
+    Fetch real route distance and duration using OpenRouteService API.
+    
+    Args:
+        source_coords: [longitude, latitude] of source
+        dest_coords: [longitude, latitude] of destination
+    
+    Returns:
+        tuple: (distance_km, duration_min)
+    """
+    distance_km, duration_min, _ = fetch_route(source_coords, dest_coords)
+    return distance_km, duration_min
 
 
 def estimate_distance(source_coords, dest_coords):
@@ -0,0 +1,50 @@
+"""
+Minimal in-process periodic task runner.
+
+Each task runs on its own daemon thread and sleeps on an Event between
+runs, so stop() interrupts the wait immediately. Exceptions are logged
+and the task keeps its schedule.
+"""
+
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Run a callable every interval_seconds on a background thread."""
+
+    def __init__(self, name: str, interval_seconds: float, func: Callable[[], None], run_immediately: bool = False):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.func = func
+        self.run_immediately = run_immediately
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        if self.run_immediately:
+            self._run_once()
+        while not self._stop.wait(self.interval_seconds):
+            self._run_once()
+
+    def _run_once(self):
+        try:
+            self.func()
+        except Exception:
+            logger.exception("Periodic task %s failed", self.name)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
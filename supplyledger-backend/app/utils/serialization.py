@@ -0,0 +1,191 @@
+"""
+Content negotiation for high-volume list endpoints.
+
+JSON stays the default. Clients that send an Accept header asking for
+MessagePack or Arrow IPC get a compact binary body built straight from
+row tuples, so no ORM objects or Pydantic models are created per row.
+
+Supported media types:
+1. application/json                     — default, list of objects
+2. application/x-msgpack                — {"columns": [...], "rows": [[...]], ...meta}
+3. application/vnd.apache.arrow.stream  — one Arrow record batch, meta in schema metadata
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from fastapi import Response
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Accept header aliases clients commonly send for the binary formats
+_MEDIA_TYPE_ALIASES = {
+    "application/json": JSON_MEDIA_TYPE,
+    "application/x-msgpack": MSGPACK_MEDIA_TYPE,
+    "application/msgpack": MSGPACK_MEDIA_TYPE,
+    "application/vnd.msgpack": MSGPACK_MEDIA_TYPE,
+    "application/vnd.apache.arrow.stream": ARROW_MEDIA_TYPE,
+    "application/vnd.apache.arrow.file": ARROW_MEDIA_TYPE,
+}
+
+
+def _binary_format_available(media_type: str) -> bool:
+    """Binary formats depend on optional libraries; only offer installed ones."""
+    try:
+        if media_type == MSGPACK_MEDIA_TYPE:
+            import msgpack  # noqa: F401
+        elif media_type == ARROW_MEDIA_TYPE:
+            import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """
+    Pick the response media type from an Accept header.
+
+    Media ranges are ranked by their q-value (ties keep header order).
+    Wildcards and unknown or unavailable types resolve to JSON.
+
+    Args:
+        accept: Raw Accept header value (may be None)
+
+    Returns:
+        One of JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, ARROW_MEDIA_TYPE
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+
+    candidates = []
+    for position, part in enumerate(accept.split(",")):
+        pieces = part.strip().split(";")
+        media_range = pieces[0].strip().lower()
+        quality = 1.0
+        for param in pieces[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            candidates.append((-quality, position, media_range))
+
+    for _, _, media_range in sorted(candidates):
+        media_type = _MEDIA_TYPE_ALIASES.get(media_range)
+        if media_type == JSON_MEDIA_TYPE:
+            return JSON_MEDIA_TYPE
+        if media_type and _binary_format_available(media_type):
+            return media_type
+        if media_range in ("*/*", "application/*"):
+            return JSON_MEDIA_TYPE
+
+    return JSON_MEDIA_TYPE
+
+
+def rows_to_dicts(columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Zip column names onto row tuples for the default JSON response."""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def arrow_type_for(python_type: type):
+    """Map a column's Python type to the matching Arrow type."""
+    import pyarrow as pa
+
+    if python_type is bool:
+        return pa.bool_()
+    if python_type is int:
+        return pa.int64()
+    if python_type is float:
+        return pa.float64()
+    if python_type is datetime:
+        return pa.timestamp("us")
+    if python_type is date:
+        return pa.date32()
+    return pa.string()
+
+
+def arrow_schema(columns: Sequence[str], python_types: Sequence[type], metadata: Optional[Dict[str, Any]] = None):
+    """Build an Arrow schema from column names and their Python types."""
+    import pyarrow as pa
+
+    fields = [pa.field(name, arrow_type_for(python_type)) for name, python_type in zip(columns, python_types)]
+    encoded_metadata = {key: str(value) for key, value in (metadata or {}).items()}
+    return pa.schema(fields, metadata=encoded_metadata or None)
+
+
+def _msgpack_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__} to MessagePack")
+
+
+def encode_msgpack(columns: Sequence[str], rows: Sequence[Sequence[Any]], metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """Encode rows column-named but row-major, so keys are not repeated per row."""
+    import msgpack
+
+    payload = dict(metadata or {})
+    payload["columns"] = list(columns)
+    payload["rows"] = [list(row) for row in rows]
+    return msgpack.packb(payload, default=_msgpack_default, use_bin_type=True)
+
+
+def encode_arrow(
+    columns: Sequence[str],
+    python_types: Sequence[type],
+    rows: Sequence[Sequence[Any]],
+    metadata: Optional[Dict[str, Any]] = None
+) -> bytes:
+    """Transpose row tuples into columns and write a single Arrow IPC stream."""
+    import pyarrow as pa
+
+    schema = arrow_schema(columns, python_types, metadata)
+    column_values = list(zip(*rows)) if rows else [() for _ in columns]
+    arrays = [
+        pa.array(values, type=field.type)
+        for values, field in zip(column_values, schema)
+    ]
+    batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def binary_rows_response(
+    media_type: str,
+    columns: Sequence[str],
+    python_types: Sequence[type],
+    rows: Sequence[Sequence[Any]],
+    metadata: Optional[Dict[str, Any]] = None
+) -> Response:
+    """
+    Render rows as MessagePack or Arrow IPC.
+
+    Args:
+        media_type: Result of negotiate_media_type (must not be JSON)
+        columns: Column names, in row tuple order
+        python_types: Python type of each column (for the Arrow schema)
+        rows: Row tuples straight from the database
+        metadata: Envelope fields (e.g. order_id) carried alongside the rows
+
+    Returns:
+        Response with the encoded body and a Vary: Accept header
+    """
+    if media_type == MSGPACK_MEDIA_TYPE:
+        body = encode_msgpack(columns, rows, metadata)
+    elif media_type == ARROW_MEDIA_TYPE:
+        body = encode_arrow(columns, python_types, rows, metadata)
+    else:
+        raise ValueError(f"Unsupported binary media type: {media_type}")
+
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
+
+
+def column_python_types(column_attributes) -> List[type]:
+    """Python types of SQLAlchemy column attributes (labelled or not)."""
+    return [attribute.type.python_type for attribute in column_attributes]
@@ -0,0 +1,71 @@
+"""
+Single-flight request coalescing.
+
+Concurrent calls with the same key share one execution: the first caller
+runs the function, later callers block until it finishes and receive the
+same result (or exception). Nothing is cached once the call completes, so
+the next caller after that starts a fresh computation.
+
+Results are shared objects; callers must not mutate them.
+
+Usage:
+    _routes = SingleFlight("route")
+
+    def fetch_route(source, dest):
+        return _routes.do((tuple(source), tuple(dest)), _fetch_route, source, dest)
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from app.monitoring.metrics import SINGLEFLIGHT_COALESCED, SINGLEFLIGHT_FAN_IN
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "callers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.callers = 1
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls for one operation."""
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs), or wait for the in-flight call with the same key."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.callers += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            SINGLEFLIGHT_COALESCED.labels(self.operation).inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                callers = call.callers
+            SINGLEFLIGHT_FAN_IN.labels(self.operation).observe(callers)
+            call.done.set()
+        return call.result
@@ -1,38 +1,179 @@
+import logging
 import requests
 import os
+import threading
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from app.database.database import SessionLocal
+from app.database.models import CityWeatherFactor
+from app.monitoring.metrics import WEATHER_PROVIDER, record_fallback, track_external_call
+from app.utils.circuit_breaker import get_breaker
+from app.utils.city_coords import normalize_city_name
+from app.utils.events import WEATHER_FACTOR_CHANGED, WEATHER_READING, publish, subscribe
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 API_KEY = os.getenv("OPENWEATHER_API_KEY", "YOUR_OPENWEATHER_API_KEY")
+BASE_URL = os.getenv("OPENWEATHER_URL", "https://api.openweathermap.org")
 
-def get_weather_factor(city):
+# Where a weather factor came from (reported by predictions)
+WEATHER_SOURCE_LIVE = "openweather"
+WEATHER_FALLBACK_ERROR = "no_weather_delay"
+WEATHER_FALLBACK_CIRCUIT_OPEN = "no_weather_delay_circuit_open"
+
+weather_breaker = get_breaker(WEATHER_PROVIDER)
+_weather_in_flight = SingleFlight("weather")
+
+# Attempts to record a reading when other workers race on the same city
+_OBSERVE_ATTEMPTS = 3
+
+# Latest live reading per normalized city not yet recorded by the event bus thread
+_pending_readings = {}
+_pending_lock = threading.Lock()
+
+
+def _store_factor(key, factor):
     """
-    Fetch weather condition and convert to delay multiplier.
-    
+    Make factor the shared last live reading for a city.
+
+    Compare-and-swap against city_weather_factors, so when several workers
+    see the same change exactly one of them wins it.
+
+    Returns:
+        The previous factor if this call changed it, else None. Cities
+        never observed count as 0.0, the factor ETAs are created with.
+    """
+    for _ in range(_OBSERVE_ATTEMPTS):
+        with SessionLocal() as db:
+            previous = db.execute(
+                select(CityWeatherFactor.factor).where(CityWeatherFactor.city == key)
+            ).scalar()
+            if previous == factor:
+                return None
+            try:
+                if previous is None:
+                    db.add(CityWeatherFactor(city=key, factor=factor))
+                    db.commit()
+                    return 0.0 if factor != 0.0 else None
+                swapped = db.execute(
+                    update(CityWeatherFactor)
+                    .where(CityWeatherFactor.city == key, CityWeatherFactor.factor == previous)
+                    .values(factor=factor)
+                ).rowcount
+                db.commit()
+            except IntegrityError:
+                # Another worker recorded the city first; compare against its reading
+                db.rollback()
+                continue
+            if swapped:
+                return previous
+    return None
+
+
+def _queue_reading(city, factor):
+    """
+    Hand a live reading to the event bus thread; never touches the database.
+
+    Readings for a city already queued replace the queued value, so the
+    bus records at most one compare-and-swap per city however many
+    requests fetch it meanwhile.
+    """
+    key = normalize_city_name(city)
+    with _pending_lock:
+        queued = key in _pending_readings
+        _pending_readings[key] = factor
+    if not queued:
+        publish(WEATHER_READING, city=key)
+
+
+def _observe_reading(city):
+    """Record a city's latest reading and announce it when the shared factor changed."""
+    with _pending_lock:
+        factor = _pending_readings.pop(city, None)
+    if factor is None:
+        return
+    try:
+        previous = _store_factor(city, factor)
+    except Exception as e:
+        logger.warning("Could not record weather factor for %s: %s", city, e)
+        return
+    if previous is not None:
+        publish(WEATHER_FACTOR_CHANGED, city=city, factor=factor, previous=previous)
+
+
+def latest_weather_factors():
+    """Last live weather factor per normalized city name, shared by all workers."""
+    with SessionLocal() as db:
+        return dict(db.execute(select(CityWeatherFactor.city, CityWeatherFactor.factor)).all())
+
+
+def fetch_weather_factor(city):
+    """
+    Fetch the weather delay factor, reporting where it came from.
+
+    When the weather breaker is open the API is skipped and no weather
+    delay is assumed. Concurrent calls for the same city share one request.
+    Live readings are recorded in city_weather_factors by the event bus
+    thread, off the request path.
+
     Args:
         city: City name (string)
-    
+
     Returns:
-        float: Weather delay factor (0.0 to 0.30)
+        tuple: (factor, source) where source is WEATHER_SOURCE_LIVE or one
+        of the WEATHER_FALLBACK_* values
     """
+    return _weather_in_flight.do(normalize_city_name(city), _fetch_weather_factor, city)
+
+
+def _fetch_weather_factor(city):
+    if not weather_breaker.allow_request():
+        record_fallback(WEATHER_PROVIDER, WEATHER_FALLBACK_CIRCUIT_OPEN)
+        return 0.0, WEATHER_FALLBACK_CIRCUIT_OPEN
+
     try:
-        url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={API_KEY}"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
+        url = f"{BASE_URL}/data/2.5/weather?q={city}&appid={API_KEY}"
+        with weather_breaker.track_call(), track_external_call(WEATHER_PROVIDER):
+            response = requests.get(url, timeout=10)
+            response.raise_for_status()
+            data = response.json()
+
         condition = data["weather"][0]["main"]
 
         # Map weather conditions to delay multipliers
         if condition in ["Thunderstorm"]:
-            return 0.30
+            factor = 0.30
         elif condition in ["Rain"]:
-            return 0.15
+            factor = 0.15
         elif condition in ["Clouds"]:
-            return 0.05
+            factor = 0.05
         else:
             # Clear, Snow, Mist, etc.
-            return 0.0
+            factor = 0.0
+
+        _queue_reading(city, factor)
+        return factor, WEATHER_SOURCE_LIVE
     
     except Exception as e:
-        print(f"Error fetching weather data for {city}: {e}")
+        logger.warning("Error fetching weather data for %s: %s", city, e)
         # Default to no weather delay on error
-        return 0.0
+        record_fallback(WEATHER_PROVIDER, WEATHER_FALLBACK_ERROR)
+        return 0.0, WEATHER_FALLBACK_ERROR
+
+
+def get_weather_factor(city):
+    """
+    Fetch weather condition and convert to delay multiplier.
+    
+    Args:
+        city: City name (string)
+    
+    Returns:
+        float: Weather delay factor (0.0 to 0.30)
+    """
+    factor, _ = fetch_weather_factor(city)
+    return factor
+
+
+subscribe(WEATHER_READING, _observe_reading)
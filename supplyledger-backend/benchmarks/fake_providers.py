@@ -0,0 +1,183 @@
+"""
+Local stand-ins for OpenRouteService, OpenWeather and Nominatim.
+
+Each provider is a small threaded HTTP server on 127.0.0.1 that answers
+with deterministic data and sleeps for a configurable latency (plus
+jitter) before replying. An optional error rate returns HTTP 503 so the
+app's fallback paths can be measured too.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from math import atan2, cos, radians, sin, sqrt
+from urllib.parse import parse_qs, urlparse
+
+WEATHER_CONDITIONS = ["Clear", "Clouds", "Rain", "Thunderstorm", "Mist"]
+
+
+@dataclass
+class ProviderProfile:
+    """Latency and failure behaviour of one fake provider."""
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+
+    def wait(self):
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+def _stable_fraction(text: str) -> float:
+    digest = hashlib.md5(text.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "little") / 2 ** 32
+
+
+def _haversine_km(source, dest) -> float:
+    lat1, lon1 = radians(source[1]), radians(source[0])
+    lat2, lon2 = radians(dest[1]), radians(dest[0])
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    profile: ProviderProfile = ProviderProfile()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _begin(self) -> bool:
+        self.profile.wait()
+        if self.profile.should_fail():
+            self._send_json(503, {"error": "injected failure"})
+            return False
+        return True
+
+
+def _fake_route(source, dest):
+    """Road distance (km) and duration (s) for a lane, stable across runs."""
+    road_km = _haversine_km(source, dest) * 1.25
+    # 45-70 km/h depending on the lane
+    speed = 45 + 25 * _stable_fraction(json.dumps([source, dest]))
+    return road_km, road_km / speed * 3600
+
+
+class _RoutingHandler(_FakeHandler):
+    """
+    POST /v2/directions/driving-car — OpenRouteService directions summary.
+    POST /v2/matrix/driving-car     — OpenRouteService matrix (distances in km).
+    """
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self._begin():
+            return
+
+        if urlparse(self.path).path.startswith("/v2/matrix"):
+            locations = body.get("locations", [])
+            routes = [
+                [_fake_route(locations[i], locations[j]) for j in body.get("destinations", [])]
+                for i in body.get("sources", [])
+            ]
+            self._send_json(200, {
+                "distances": [[km for km, _ in row] for row in routes],
+                "durations": [[seconds for _, seconds in row] for row in routes],
+            })
+            return
+
+        source, dest = body.get("coordinates", [[0, 0], [0, 0]])[:2]
+        road_km, duration = _fake_route(source, dest)
+        self._send_json(200, {
+            "features": [{
+                "properties": {
+                    "summary": {"distance": road_km * 1000, "duration": duration}
+                }
+            }]
+        })
+
+
+class _WeatherHandler(_FakeHandler):
+    """GET /data/2.5/weather?q=<city> — OpenWeather current conditions."""
+
+    def do_GET(self):
+        if not self._begin():
+            return
+        city = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        condition = WEATHER_CONDITIONS[int(_stable_fraction(city.lower()) * len(WEATHER_CONDITIONS))]
+        self._send_json(200, {"weather": [{"main": condition}], "name": city})
+
+
+class _GeocodingHandler(_FakeHandler):
+    """GET /search?q=<city> — Nominatim search."""
+
+    def do_GET(self):
+        if not self._begin():
+            return
+        city = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        lat = 8 + 27 * _stable_fraction(city + ":lat")
+        lon = 68 + 29 * _stable_fraction(city + ":lon")
+        self._send_json(200, [{"lat": str(lat), "lon": str(lon), "display_name": city}])
+
+
+class FakeProvider:
+    """A fake provider server running on a background thread."""
+
+    def __init__(self, handler_class, profile: ProviderProfile):
+        handler = type(handler_class.__name__, (handler_class,), {"profile": profile})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeProvider":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_fake_providers(routing: ProviderProfile, weather: ProviderProfile, geocoding: ProviderProfile) -> dict:
+    """
+    Start all three fakes.
+
+    Returns:
+        {'routing': FakeProvider, 'weather': FakeProvider, 'geocoding': FakeProvider}
+    """
+    return {
+        "routing": FakeProvider(_RoutingHandler, routing).start(),
+        "weather": FakeProvider(_WeatherHandler, weather).start(),
+        "geocoding": FakeProvider(_GeocodingHandler, geocoding).start(),
+    }
+
+
+def provider_environment(providers: dict) -> dict:
+    """Environment variables that point the app at the fakes."""
+    return {
+        "OPENROUTESERVICE_URL": providers["routing"].url,
+        "OPENWEATHER_URL": providers["weather"].url,
+        "NOMINATIM_URL": f"{providers['geocoding'].url}/search",
+        "NOMINATIM_RATE_LIMIT_SECONDS": "0",
+    }
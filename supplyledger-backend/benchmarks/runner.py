@@ -0,0 +1,216 @@
+"""
+Benchmark cases, measurement and baseline comparison.
+
+Must be imported after the environment (DATABASE_URL, provider URLs) is
+set, because importing the app binds the database engine.
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.database.database import engine
+from app.main import app
+from app.utils.city_coords import CITY_COORDINATES
+
+# (path, request kwargs) for the i-th request of a case
+RequestFactory = Callable[[int], Tuple[str, dict]]
+
+
+@dataclass
+class Case:
+    name: str
+    method: str
+    make_request: RequestFactory
+
+
+def build_cases(seed, random_seed: int = 7) -> List[Case]:
+    """Endpoint cases exercised by the suite, parameterised by seeded rows."""
+    rng = random.Random(random_seed)
+    cities = [city.title() for city in CITY_COORDINATES]
+    users, orders, shipments = seed.user_ids, seed.order_ids, seed.shipment_ids
+    shipped = seed.shipped_order_ids
+
+    def user(i):
+        return users[i % len(users)]
+
+    def shipment(i):
+        return shipments[rng.randrange(len(shipments))]
+
+    def new_shipment(i):
+        source, destination = rng.sample(cities, 2)
+        return "/shipments/create", {"json": {
+            "order_id": orders[rng.randrange(len(orders))],
+            "source": source,
+            "destination": destination,
+            "distance_km": rng.randint(50, 3000),
+        }}
+
+    def new_shipment_unknown_cities(i):
+        # Cities with no lane row or local coordinates: stored with the given distance, nothing geocoded
+        return "/shipments/create", {"json": {
+            "order_id": orders[rng.randrange(len(orders))],
+            "source": f"Benchville {i}",
+            "destination": f"Benchport {i}",
+            "distance_km": rng.randint(50, 3000),
+        }}
+
+    def order_update(i):
+        index = rng.randrange(len(orders))
+        return f"/orders/update/{orders[index]}?user_id={seed.order_user_ids[index]}", {"json": {
+            "priority": rng.choice(["critical", "high", "medium", "low"]),
+        }}
+
+    def new_order(i):
+        origin, destination = rng.sample(cities, 2)
+        return f"/orders/create?user_id={user(i)}", {"json": {
+            "origin": origin,
+            "destination": destination,
+            "weight": round(rng.uniform(1, 500), 1),
+            "priority": rng.choice(["critical", "high", "medium", "low"]),
+            "due_date": "2030-01-01T00:00:00",
+        }}
+
+    return [
+        Case("create_order", "POST", new_order),
+        Case("create_shipment", "POST", new_shipment),
+        Case("update_order", "PUT", order_update),
+        Case("update_shipment_status", "PATCH", lambda i: (
+            f"/shipments/{shipment(i)}/status", {"json": {"status": rng.choice(["CREATED", "IN_TRANSIT"])}}
+        )),
+        Case("create_shipment_unknown_cities", "POST", new_shipment_unknown_cities),
+        Case("predict_delay", "GET", lambda i: (f"/shipments/{shipment(i)}/predict-delay", {})),
+        Case("predict_delay_live", "GET", lambda i: (f"/shipments/{shipment(i)}/predict-delay?refresh=true", {})),
+        Case("ledger_verify", "GET", lambda i: (f"/shipments/ledger/verify/{shipment(i)}", {})),
+        Case("ledger_all_hashes", "GET", lambda i: (f"/shipments/ledger/all-hashes/{shipped[rng.randrange(len(shipped))]}", {})),
+        Case("orders_list", "GET", lambda i: (f"/orders/list/{user(i)}", {})),
+        Case("analytics_dashboard", "GET", lambda i: (f"/analytics/dashboard/{user(i)}", {})),
+        Case("analytics_user", "GET", lambda i: (f"/analytics/user-analytics/{user(i)}", {})),
+        Case("analytics_status_breakdown", "GET", lambda i: (f"/analytics/order-status-breakdown/{user(i)}", {})),
+        Case("analytics_priority_breakdown", "GET", lambda i: (f"/analytics/priority-breakdown/{user(i)}", {})),
+        Case("analytics_destinations", "GET", lambda i: (f"/analytics/destination-breakdown/{user(i)}", {})),
+        Case("analytics_value_metrics", "GET", lambda i: (f"/analytics/value-metrics/{user(i)}", {})),
+        Case("analytics_timeseries", "GET", lambda i: (f"/analytics/timeseries/{user(i)}?granularity=week", {})),
+        Case("analytics_top_lanes", "GET", lambda i: ("/analytics/lanes/top?k=10", {})),
+    ]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies_ms: List[float], errors: int, elapsed_s: float, commits: int = 0) -> Dict[str, float]:
+    ordered = sorted(latencies_ms)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50), 3),
+        "p95_ms": round(percentile(ordered, 0.95), 3),
+        "p99_ms": round(percentile(ordered, 0.99), 3),
+        "throughput_rps": round(len(ordered) / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+        "commits_per_request": round(commits / len(ordered), 2) if ordered else 0.0,
+    }
+
+
+def run_case(case: Case, requests: int, concurrency: int = 1, warmup: int = 5) -> Dict[str, float]:
+    """Send `requests` calls for a case and summarize their latency and database commits."""
+    local = threading.local()
+
+    def client() -> TestClient:
+        if not hasattr(local, "client"):
+            local.client = TestClient(app)
+        return local.client
+
+    def call(i: int) -> Tuple[float, bool]:
+        path, kwargs = case.make_request(i)
+        started = time.perf_counter()
+        response = client().request(case.method, path, **kwargs)
+        return (time.perf_counter() - started) * 1000, response.status_code < 400
+
+    for i in range(warmup):
+        call(-(i + 1))
+
+    commits = []
+
+    def count_commit(connection):
+        commits.append(1)
+
+    event.listen(engine, "commit", count_commit)
+    started = time.perf_counter()
+    try:
+        if concurrency <= 1:
+            outcomes = [call(i) for i in range(requests)]
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                outcomes = list(pool.map(call, range(requests)))
+    finally:
+        elapsed = time.perf_counter() - started
+        event.remove(engine, "commit", count_commit)
+
+    latencies = [latency for latency, _ in outcomes]
+    errors = sum(1 for _, ok in outcomes if not ok)
+    return summarize(latencies, errors, elapsed, len(commits))
+
+
+def compare(results: Dict[str, dict], baseline: Optional[Dict[str, dict]], threshold: float) -> List[dict]:
+    """
+    Compare each case with the baseline.
+
+    A case regresses when its p95 latency grows, or its throughput drops,
+    by more than `threshold` (a fraction, e.g. 0.2 for 20%).
+    """
+    rows = []
+    for name, current in results.items():
+        row = {"case": name, **current}
+        previous = (baseline or {}).get(name)
+        if previous:
+            p95_change = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] if previous["p95_ms"] else 0.0
+            rps_change = (
+                (current["throughput_rps"] - previous["throughput_rps"]) / previous["throughput_rps"]
+                if previous["throughput_rps"] else 0.0
+            )
+            row["p95_change"] = round(p95_change, 4)
+            row["throughput_change"] = round(rps_change, 4)
+            row["regression"] = p95_change > threshold or rps_change < -threshold
+        rows.append(row)
+    return rows
+
+
+def format_report(rows: List[dict]) -> str:
+    """Plain-text table of the comparison rows."""
+    header = (
+        f"{'case':<30} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'err':>5} "
+        f"{'commits':>8} {'Δp95':>8} {'Δreq/s':>8}"
+    )
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        p95_change = f"{row['p95_change'] * 100:+.1f}%" if "p95_change" in row else "-"
+        rps_change = f"{row['throughput_change'] * 100:+.1f}%" if "throughput_change" in row else "-"
+        flag = "  ⚠️ REGRESSION" if row.get("regression") else ""
+        lines.append(
+            f"{row['case']:<30} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} "
+            f"{row['throughput_rps']:>9.1f} {row['errors']:>5} {row.get('commits_per_request', 0):>8.2f} "
+            f"{p95_change:>8} {rps_change:>8}{flag}"
+        )
+    return "\n".join(lines)
+
+
+def load_baseline(path: str) -> Optional[dict]:
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,188 @@
+"""
+Seed a benchmark database to a configurable size.
+
+Rows go in through Core executemany INSERTs, then the derived tables
+(analytics, daily rollups, lane sketches, lane table, speed
+profiles) are rebuilt once at the end.
+Must be imported after DATABASE_URL has been set.
+"""
+
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, update
+
+from app.analytics.lanes import lane_tracker, rebuild_lane_sketches
+from app.analytics.rollups import rebuild_rollups
+from app.auth.auth_service import hash_password
+from app.blockchain.ledger import generate_blockchain_hash
+from app.database.database import SessionLocal, engine
+from app.database.models import Base, Order, Shipment, User
+from app.orders.order_service import calculate_order_value, generate_order_id, update_user_analytics
+from app.routing.lane_table import build_lane_table
+from app.routing.speed_profiles import rebuild_speed_profiles, speed_profiles
+from app.spatial.spatial_service import order_location_fields, shipment_location_fields
+from app.utils.city_coords import CITY_COORDINATES
+
+PRIORITIES = ["critical", "high", "medium", "low"]
+SHIPMENT_STATUSES = ["CREATED", "IN_TRANSIT", "DELIVERED"]
+
+_BATCH_SIZE = 2000
+
+
+@dataclass
+class SeedConfig:
+    users: int = 20
+    orders_per_user: int = 200
+    shipment_ratio: float = 0.5
+    history_days: int = 365
+    random_seed: int = 42
+
+
+@dataclass
+class SeedResult:
+    user_ids: list
+    order_ids: list
+    order_user_ids: list      # owner of each entry in order_ids
+    shipped_order_ids: list
+    shipment_ids: list
+
+
+def reset_database():
+    """Drop and recreate every table."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+def _flush(db, model, rows):
+    if rows:
+        db.execute(insert(model), rows)
+        rows.clear()
+
+
+def seed_database(config: SeedConfig) -> SeedResult:
+    """Insert users, orders and shipments, then rebuild derived tables."""
+    rng = random.Random(config.random_seed)
+    cities = list(CITY_COORDINATES)
+    now = datetime.utcnow()
+
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [
+            {
+                "email": f"bench{i}@example.com",
+                "password": hash_password("benchmark"),
+                "name": f"Bench User {i}",
+                "company_name": f"Bench Co {i}",
+                "account_type": "Standard",
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(config.users)
+        ])
+        user_ids = list(db.scalars(select(User.id).order_by(User.id)))
+
+        orders, shipments = [], []
+        order_ids, order_user_ids, shipped_order_ids = [], [], []
+        for user_id in user_ids:
+            for _ in range(config.orders_per_user):
+                origin, destination = rng.sample(cities, 2)
+                weight = round(rng.uniform(1, 500), 1)
+                created_at = now - timedelta(days=rng.uniform(0, config.history_days))
+                order_id = generate_order_id(created_at)
+                shipped = rng.random() < config.shipment_ratio
+                status = rng.choice(SHIPMENT_STATUSES) if shipped else "Pending"
+
+                orders.append({
+                    "order_id": order_id,
+                    "user_id": user_id,
+                    "origin": origin.title(),
+                    "destination": destination.title(),
+                    "weight": weight,
+                    "priority": rng.choice(PRIORITIES),
+                    "status": {"Pending": "Pending", "DELIVERED": "Delivered"}.get(status, "In Transit"),
+                    "due_date": created_at + timedelta(days=7),
+                    "value": calculate_order_value(weight),
+                    **order_location_fields(origin, destination),
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                })
+                order_ids.append(order_id)
+                order_user_ids.append(user_id)
+
+                if shipped:
+                    shipped_order_ids.append(order_id)
+                    distance_km = rng.randint(50, 3000)
+                    delivered_at = None
+                    if status == "DELIVERED":
+                        # Slower departures in weekday rush hours, so lanes get a speed profile
+                        rush = created_at.weekday() < 5 and created_at.hour in (7, 8, 9, 16, 17, 18)
+                        speed = rng.uniform(25, 45) * (0.7 if rush else 1.0)
+                        delivered_at = created_at + timedelta(hours=distance_km / speed)
+                    shipments.append({
+                        "order_id": order_id,
+                        "source": origin.title(),
+                        "destination": destination.title(),
+                        "source_coords": CITY_COORDINATES[origin],
+                        "dest_coords": CITY_COORDINATES[destination],
+                        **shipment_location_fields(CITY_COORDINATES[origin], CITY_COORDINATES[destination]),
+                        "distance_km": distance_km,
+                        "status": status,
+                        "estimated_delivery": created_at + timedelta(days=5),
+                        "delivered_at": delivered_at,
+                        "created_at": created_at,
+                        "updated_at": created_at,
+                    })
+
+                if len(orders) >= _BATCH_SIZE:
+                    _flush(db, Order, orders)
+                if len(shipments) >= _BATCH_SIZE:
+                    _flush(db, Shipment, shipments)
+
+        _flush(db, Order, orders)
+        _flush(db, Shipment, shipments)
+
+        # Hashes need the database-assigned shipment IDs
+        rows = db.execute(select(
+            Shipment.id, Shipment.version, Shipment.source, Shipment.destination, Shipment.distance_km, Shipment.status
+        )).all()
+        hashes = [
+            {
+                "id": row.id,
+                "version": row.version,   # versioned bulk update (compare-and-swap)
+                "blockchain_hash": generate_blockchain_hash(
+                    shipment_id=row.id,
+                    source=row.source,
+                    destination=row.destination,
+                    distance_km=row.distance_km,
+                    status=row.status
+                )
+            }
+            for row in rows
+        ]
+        for start in range(0, len(hashes), _BATCH_SIZE):
+            db.execute(update(Shipment), hashes[start:start + _BATCH_SIZE])
+        db.commit()
+
+        # Analytics are computed from the rollups, so rebuild those first
+        rebuild_rollups(db)
+        for user_id in user_ids:
+            update_user_analytics(user_id, db)
+        db.commit()
+        rebuild_lane_sketches(db)
+        lane_tracker.load()
+        build_lane_table(db, offline=True)
+        rebuild_speed_profiles(db)
+        speed_profiles.load()
+
+        return SeedResult(
+            user_ids=user_ids,
+            order_ids=order_ids,
+            order_user_ids=order_user_ids,
+            shipped_order_ids=shipped_order_ids,
+            shipment_ids=[row.id for row in rows]
+        )
+    finally:
+        db.close()
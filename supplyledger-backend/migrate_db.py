@@ -7,6 +7,9 @@ This script ensures the database schema is up-to-date with all new features:
 - timestamp fields for audit trail
 
 Run this before deploying the blockchain module.
+
+This drops all data. To upgrade an existing database in place, run
+`python -m app.database.upgrade` instead (see README).
 """
 from app.database.database import engine
 from app.database.models import Base
@@ -0,0 +1,74 @@
+"""
+Shared fixtures.
+
+app.database.database binds its engine from DATABASE_URL on import, so the
+URL is pointed at a throwaway SQLite file before any test imports the app
+(the benchmarks do the same). Admission control and background tasks are
+off; the test client does not run the lifespan.
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_DATABASE_DIR = tempfile.mkdtemp(prefix="supplyledger-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DATABASE_DIR, 'test.db')}"
+os.environ.pop("READ_DATABASE_URL", None)
+os.environ["ADMISSION_CONTROL"] = "0"
+os.environ["PREDICTION_REFRESH_SECONDS"] = "0"
+os.environ["ARCHIVE_INTERVAL_SECONDS"] = "0"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _database_dir():
+    yield
+    from app.database.database import engine
+    engine.dispose()
+    shutil.rmtree(_DATABASE_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db_engine():
+    """The app's engine, on an empty schema."""
+    from app.database.database import engine
+    from app.database.models import Base
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def client(db_engine):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def user_id(db_engine):
+    from app.database.database import SessionLocal
+    from app.database.models import User
+
+    with SessionLocal() as db:
+        user = User(email="owner@example.com", password="x", name="Owner")
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+@pytest.fixture
+def order(client, user_id):
+    """A freshly created order, as returned by the API."""
+    response = client.post(f"/orders/create?user_id={user_id}", json={
+        "origin": "Delhi",
+        "destination": "Mumbai",
+        "weight": 120,
+        "priority": "high",
+        "due_date": "2030-01-01T00:00:00",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
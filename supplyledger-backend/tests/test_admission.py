@@ -0,0 +1,157 @@
+import asyncio
+
+from app.admission.limiter import (
+    EVICTED,
+    PREFERRED,
+    QUEUE_FULL,
+    QUEUE_TIMEOUT,
+    READ,
+    WRITE,
+    ConcurrencyLimiter,
+    TokenBucketLimiter
+)
+import ipaddress
+
+from app.admission import middleware
+from app.admission.middleware import AdmissionMiddleware, _user_key
+
+
+def test_token_bucket_allows_burst_then_reports_wait():
+    buckets = TokenBucketLimiter(rate=2, burst=3)
+    assert [buckets.try_acquire("user:1", now=0) for _ in range(3)] == [0, 0, 0]
+    assert buckets.try_acquire("user:1", now=0) == 0.5
+    # Other keys have their own bucket
+    assert buckets.try_acquire("user:2", now=0) == 0
+    # Refilled at `rate` tokens per second
+    assert buckets.try_acquire("user:1", now=0.5) == 0
+    assert buckets.try_acquire("user:1", now=0.5) > 0
+
+
+def test_token_bucket_prunes_full_buckets():
+    buckets = TokenBucketLimiter(rate=1, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        buckets.try_acquire(key, now=0)
+    buckets.try_acquire("d", now=10)
+    assert set(buckets._buckets) == {"d"}
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_queued_requests_are_admitted_by_class():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=10)
+        assert await limiter.acquire(WRITE, timeout=1) is None
+        admitted = []
+
+        async def request(request_class):
+            assert await limiter.acquire(request_class, timeout=1) is None
+            admitted.append(request_class)
+            limiter.release(request_class)
+
+        tasks = []
+        for request_class in (READ, WRITE, PREFERRED):
+            tasks.append(asyncio.ensure_future(request(request_class)))
+            await _settle()
+        assert limiter.queued == 3
+
+        limiter.release(WRITE)
+        await asyncio.gather(*tasks)
+        return admitted
+
+    assert asyncio.run(scenario()) == [PREFERRED, WRITE, READ]
+
+
+def test_reads_are_limited_to_their_share():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrency=2, max_queue=10, read_share=0.5)
+        assert await limiter.acquire(READ, timeout=1) is None
+        assert await limiter.acquire(READ, timeout=0.01) == QUEUE_TIMEOUT
+        # The slot reads may not take is still free for a write
+        assert await limiter.acquire(WRITE, timeout=0.01) is None
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_sheds_newest_read_first():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=2)
+        assert await limiter.acquire(WRITE, timeout=1) is None
+
+        first_read = asyncio.ensure_future(limiter.acquire(READ, timeout=1))
+        second_read = asyncio.ensure_future(limiter.acquire(READ, timeout=1))
+        await _settle()
+
+        write = asyncio.ensure_future(limiter.acquire(WRITE, timeout=1))
+        await _settle()
+        assert await second_read == EVICTED
+
+        # Nothing below a read to shed
+        assert await limiter.acquire(READ, timeout=1) == QUEUE_FULL
+
+        preferred = asyncio.ensure_future(limiter.acquire(PREFERRED, timeout=1))
+        await _settle()
+        assert await first_read == EVICTED
+
+        limiter.release(WRITE)
+        assert await preferred is None
+        limiter.release(PREFERRED)
+        assert await write is None
+        limiter.release(WRITE)
+        assert limiter.in_flight == 0 and limiter.queued == 0
+
+    asyncio.run(scenario())
+
+
+class _AuthenticatedUser:
+    is_authenticated = True
+    identity = "42"
+
+
+def test_user_key_binds_claimed_user_id_to_the_client():
+    scope = {"client": ("203.0.113.7", 5000), "query_string": b"user_id=5"}
+    assert _user_key(scope, {}) == "client:203.0.113.7:user:5"
+    assert _user_key({**scope, "query_string": b""}, {"user_id": 5}) == "client:203.0.113.7:user:5"
+    assert _user_key({**scope, "client": ("198.51.100.1", 5000)}, {}) == "client:198.51.100.1:user:5"
+    assert _user_key({**scope, "query_string": b""}, {}) == "client:203.0.113.7"
+    assert _user_key({**scope, "user": _AuthenticatedUser()}, {}) == "user:42"
+
+
+_PROXIES = (ipaddress.ip_network("10.0.0.0/8"),)
+
+
+def _proxied(forwarded_for, peer="10.0.0.2"):
+    return {"client": (peer, 5000), "query_string": b"", "headers": [(b"x-forwarded-for", forwarded_for)]}
+
+
+def test_user_key_uses_forwarded_client_behind_trusted_proxy():
+    # Callers without a user_id behind one proxy get a bucket each
+    assert _user_key(_proxied(b"203.0.113.7"), {}, _PROXIES) == "client:203.0.113.7"
+    assert _user_key(_proxied(b"198.51.100.1"), {}, _PROXIES) == "client:198.51.100.1"
+    # Hops the client prepended are ignored; chained trusted proxies are skipped
+    assert _user_key(_proxied(b"192.0.2.99, 203.0.113.7, 10.0.0.9"), {}, _PROXIES) == "client:203.0.113.7"
+    # Untrusted peers can't pick their bucket
+    assert _user_key(_proxied(b"203.0.113.7", peer="198.51.100.1"), {}, _PROXIES) == "client:198.51.100.1"
+    assert _user_key(_proxied(b"203.0.113.7"), {}, ()) == "client:10.0.0.2"
+
+
+def test_preference_is_decided_without_querying(client, order, monkeypatch):
+    def query(*args):
+        raise AssertionError("queried the database during admission")
+
+    admission = AdmissionMiddleware(app=None, routes=client.app.routes)
+    path_params = {"order_id": order["order_id"]}
+    middleware._priority_cache.clear()
+
+    async def is_preferred():
+        return (await admission._is_preferred({"method": "GET"}, path_params, None))[0]
+
+    monkeypatch.setattr(middleware, "_stored_priority", query)
+    assert asyncio.run(is_preferred()) is False
+
+    monkeypatch.undo()
+    assert middleware._stored_priority("order", order["order_id"]) == "high"
+    monkeypatch.setattr(middleware, "_stored_priority", query)
+    assert asyncio.run(is_preferred()) is True
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app.database import archive
+from app.database.archive import archive_finished_orders
+from app.database.database import SessionLocal
+from app.database.models import ArchivedOrder, ArchivedShipment, Order, Shipment, ShipmentOrder
+
+LONG_AGO = datetime.utcnow() - timedelta(days=365)
+
+
+@pytest.fixture
+def finished_group(db_engine, user_id):
+    """Two delivered orders carried by one consolidated shipment, last touched a year ago."""
+    with SessionLocal() as db:
+        for order_id in ("ORD-A", "ORD-B"):
+            db.add(Order(
+                order_id=order_id, user_id=user_id, origin="Delhi", destination="Mumbai", weight=10,
+                status="Delivered", due_date=LONG_AGO, created_at=LONG_AGO, updated_at=LONG_AGO,
+            ))
+        shipment = Shipment(
+            order_id="ORD-A", source="Delhi", destination="Mumbai", distance_km=1400,
+            status="DELIVERED", blockchain_hash="feedface", created_at=LONG_AGO, updated_at=LONG_AGO,
+        )
+        db.add(shipment)
+        db.flush()
+        db.add_all([ShipmentOrder(shipment_id=shipment.id, order_id=order_id) for order_id in ("ORD-A", "ORD-B")])
+        db.commit()
+        return shipment.id
+
+
+def _hot_order_ids(db):
+    return set(db.scalars(select(Order.order_id)))
+
+
+def test_order_reopened_during_the_move_stays_hot(finished_group, monkeypatch):
+    copy = archive._copy
+
+    def reopen_then_copy(source, target, condition, archived_at):
+        if source is Order:
+            with SessionLocal() as other:
+                other.execute(
+                    update(Order).where(Order.order_id == "ORD-B")
+                    .values(status="Processing", version=Order.version + 1, updated_at=datetime.utcnow())
+                )
+                other.commit()
+        return copy(source, target, condition, archived_at)
+
+    monkeypatch.setattr(archive, "_copy", reopen_then_copy)
+
+    assert archive_finished_orders(session_factory=SessionLocal) == (0, 0)
+    with SessionLocal() as db:
+        assert _hot_order_ids(db) == {"ORD-A", "ORD-B"}
+        assert db.scalar(select(Order.status).where(Order.order_id == "ORD-B")) == "Processing"
+        assert db.get(Shipment, finished_group) is not None
+        assert db.scalar(select(ArchivedOrder.id)) is None
+        assert db.scalar(select(ArchivedShipment.id)) is None
+
+
+def _row(db, model, **filters):
+    return db.query(model).filter_by(**filters).one_or_none()
+
+
+def test_rows_move_with_ids_and_hashes_unchanged(finished_group):
+    with SessionLocal() as db:
+        hot_order_ids = {order_id: db.scalar(select(Order.id).where(Order.order_id == order_id)) for order_id in ("ORD-A", "ORD-B")}
+
+    assert archive_finished_orders(session_factory=SessionLocal) == (2, 1)
+
+    with SessionLocal() as db:
+        assert db.scalar(select(Order.id)) is None and db.scalar(select(Shipment.id)) is None
+        for order_id, id_ in hot_order_ids.items():
+            archived = _row(db, ArchivedOrder, order_id=order_id)
+            assert archived.id == id_ and archived.status == "Delivered" and archived.archived_at is not None
+        archived_shipment = _row(db, ArchivedShipment, id=finished_group)
+        assert archived_shipment.blockchain_hash == "feedface"
+        assert archived_shipment.updated_at == LONG_AGO
+        # Links stay put and still resolve
+        assert db.scalar(select(ShipmentOrder.id).where(ShipmentOrder.shipment_id == finished_group)) is not None
+
+
+def test_consolidated_group_waits_for_every_order(finished_group):
+    with SessionLocal() as db:
+        db.execute(update(Order).where(Order.order_id == "ORD-B").values(status="In Transit"))
+        db.commit()
+
+    # ORD-A is archivable on its own, but shares a shipment with ORD-B
+    assert archive_finished_orders(session_factory=SessionLocal) == (0, 0)
+    with SessionLocal() as db:
+        assert _hot_order_ids(db) == {"ORD-A", "ORD-B"}
+
+    with SessionLocal() as db:
+        db.execute(update(Order).where(Order.order_id == "ORD-B").values(status="Delivered", updated_at=LONG_AGO))
+        db.commit()
+    assert archive_finished_orders(session_factory=SessionLocal) == (2, 1)
+
+
+def test_link_to_a_deleted_order_does_not_block_the_batch(finished_group, user_id):
+    with SessionLocal() as db:
+        # A link left behind by delete_order, and an unrelated finished order in the same batch
+        db.add(ShipmentOrder(shipment_id=finished_group, order_id="ORD-GONE"))
+        db.add(Order(
+            order_id="ORD-C", user_id=user_id, origin="Pune", destination="Agra", weight=5,
+            status="Delivered", due_date=LONG_AGO, created_at=LONG_AGO, updated_at=LONG_AGO,
+        ))
+        db.commit()
+
+    assert archive_finished_orders(session_factory=SessionLocal) == (3, 1)
+    with SessionLocal() as db:
+        assert _hot_order_ids(db) == set()
+        assert set(db.scalars(select(ArchivedOrder.order_id))) == {"ORD-A", "ORD-B", "ORD-C"}
+
+
+def test_lookups_fall_through_to_the_archive(client, finished_group, user_id):
+    archive_finished_orders(session_factory=SessionLocal)
+
+    detail = client.get(f"/orders/detail/ORD-A?user_id={user_id}")
+    assert detail.status_code == 200 and detail.json()["order_id"] == "ORD-A"
+    shipment = client.get(f"/shipments/{finished_group}?user_id={user_id}")
+    assert shipment.status_code == 200 and shipment.json()["id"] == finished_group
+    # ORD-B rides on ORD-A's consolidated shipment
+    assert client.get("/shipments/order/ORD-B").status_code == 200
+    ledger = client.get("/shipments/ledger/all-hashes/ORD-A")
+    assert ledger.status_code == 200 and ledger.json()["total_shipments"] == 1
+    assert client.get(f"/shipments/ledger/hash/{finished_group}").status_code == 200
+
+
+def test_writes_to_archived_rows_conflict(client, finished_group, user_id):
+    archive_finished_orders(session_factory=SessionLocal)
+
+    assert client.put(f"/orders/update/ORD-A?user_id={user_id}", json={"status": "Pending"}).status_code == 409
+    assert client.put(f"/orders/cancel/ORD-A?user_id={user_id}").status_code == 409
+    assert client.delete(f"/orders/delete/ORD-A?user_id={user_id}").status_code == 409
+    assert client.put(f"/shipments/{finished_group}?user_id={user_id}", json={"status": "IN_TRANSIT"}).status_code == 409
+    assert client.patch(f"/shipments/{finished_group}/status", json={"status": "IN_TRANSIT"}).status_code == 409
+    assert client.get("/orders/detail/ORD-NONE?user_id=1").status_code == 404
+
+
+def test_destination_breakdown_counts_active_orders_only(client, finished_group, user_id):
+    assert client.get(f"/analytics/destination-breakdown/{user_id}").json()["destinations"] == [{"name": "Mumbai", "orders": 2}]
+    archive_finished_orders(session_factory=SessionLocal)
+    assert client.get(f"/analytics/destination-breakdown/{user_id}").json()["destinations"] == []
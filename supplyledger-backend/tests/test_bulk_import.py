@@ -0,0 +1,60 @@
+import csv
+import io
+import re
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from app.bulk import importer
+from app.database.database import SessionLocal
+from app.database.models import Order
+
+
+class _CopyCursor:
+    """Replays `COPY table (columns) FROM STDIN WITH (FORMAT csv)` as a raw INSERT, like PostgreSQL would."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def copy_expert(self, sql, buffer):
+        table, columns = re.match(r"COPY (\w+) \((.*?)\) FROM STDIN", sql).groups()
+        # COPY's csv format reads an unquoted empty field as NULL
+        rows = [[value or None for value in row] for row in csv.reader(buffer)]
+        placeholders = ", ".join("?" for _ in columns.split(", "))
+        self._cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+
+    def close(self):
+        self._cursor.close()
+
+
+def _copy_through_raw_sql(db, rows):
+    raw = db.connection().connection
+    session = SimpleNamespace(connection=lambda: SimpleNamespace(
+        connection=SimpleNamespace(cursor=lambda: _CopyCursor(raw.cursor()))
+    ))
+    importer._copy_chunk(session, rows)
+
+
+def test_copy_column_list_covers_every_required_column():
+    required = {
+        column.name for column in Order.__table__.columns
+        if not column.nullable and not column.primary_key and column.server_default is None
+    }
+    assert required <= set(importer.IMPORT_COLUMNS)
+
+
+def test_import_through_copy_column_list(db_engine, user_id, monkeypatch):
+    monkeypatch.setattr(importer, "_insert_chunk", _copy_through_raw_sql)
+    data = io.StringIO(
+        "origin,destination,weight,priority,due_date\n"
+        "Delhi,Mumbai,120,high,2030-01-01T00:00:00\n"
+        "Pune,Chennai,80,low,2030-02-01T00:00:00\n"
+    )
+
+    with SessionLocal() as db:
+        result = importer.import_orders(db, user_id, data)
+        db.commit()
+        versions = db.execute(select(Order.version).where(Order.user_id == user_id)).scalars().all()
+
+    assert result["imported"] == 2 and result["failed"] == 0
+    assert versions == [1, 1]
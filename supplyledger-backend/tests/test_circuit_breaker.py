@@ -0,0 +1,127 @@
+import pytest
+
+from app.utils import circuit_breaker as module
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(module.time, "monotonic", clock)
+    return clock
+
+
+def _breaker(**options):
+    settings = dict(failure_rate_threshold=0.5, slow_call_seconds=2, window_size=4,
+                    minimum_calls=4, open_seconds=30, half_open_probes=1)
+    settings.update(options)
+    return CircuitBreaker("test", **settings)
+
+
+def _open(breaker):
+    for _ in range(breaker.minimum_calls):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_trips_on_failure_rate(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_success(0.1)
+    breaker.record_failure()
+    # 1 bad call in 4 stays below the threshold
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.allow_request() is False
+
+
+def test_waits_for_minimum_calls(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_trips_on_slow_calls(clock):
+    breaker = _breaker()
+    breaker.record_success(0.1)
+    breaker.record_success(0.1)
+    breaker.record_success(2.5)
+    assert breaker.state == CLOSED
+    breaker.record_success(3.0)
+    assert breaker.state == OPEN
+
+
+def test_goes_half_open_after_open_seconds(clock):
+    breaker = _breaker()
+    _open(breaker)
+
+    clock.now += 29.9
+    assert breaker.state == OPEN
+    assert breaker.allow_request() is False
+    clock.now += 0.1
+    assert breaker.state == HALF_OPEN
+
+
+def test_half_open_limits_probes(clock):
+    breaker = _breaker(half_open_probes=2)
+    _open(breaker)
+    clock.now += 30
+
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False
+
+
+def test_good_probe_closes(clock):
+    breaker = _breaker()
+    _open(breaker)
+    clock.now += 30
+
+    assert breaker.allow_request() is True
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    # The window restarted: three failures don't trip it again
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.parametrize("record", [
+    lambda breaker: breaker.record_failure(),
+    lambda breaker: breaker.record_success(5.0),
+])
+def test_bad_probe_reopens(clock, record):
+    breaker = _breaker()
+    _open(breaker)
+    clock.now += 30
+
+    assert breaker.allow_request() is True
+    record(breaker)
+    assert breaker.state == OPEN
+    assert breaker.allow_request() is False
+
+    # Open for another full period from the failed probe
+    clock.now += 29
+    assert breaker.state == OPEN
+    clock.now += 1
+    assert breaker.state == HALF_OPEN
+
+
+def test_track_call_records_exceptions(clock):
+    breaker = _breaker(minimum_calls=1, window_size=1)
+    with pytest.raises(ValueError):
+        with breaker.track_call():
+            raise ValueError("provider down")
+    assert breaker.state == OPEN
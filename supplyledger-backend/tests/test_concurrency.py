@@ -0,0 +1,47 @@
+import pytest
+from fastapi import HTTPException
+
+from app.database.concurrency import flush_or_conflict
+from app.database.database import SessionLocal
+from app.database.models import Order
+from app.schemas import OrderResponse
+
+
+def test_update_with_current_version_bumps_it(client, order, user_id):
+    response = client.put(
+        f"/orders/update/{order['order_id']}?user_id={user_id}",
+        json={"status": "Processing", "version": order["version"]}
+    )
+    assert response.status_code == 200
+    assert response.json()["version"] == order["version"] + 1
+
+
+def test_update_with_stale_version_returns_409_with_current_order(client, order, user_id):
+    url = f"/orders/update/{order['order_id']}?user_id={user_id}"
+    assert client.put(url, json={"priority": "critical", "version": order["version"]}).status_code == 200
+
+    response = client.put(url, json={"status": "Cancelled", "version": order["version"]})
+
+    assert response.status_code == 409
+    detail = response.json()["detail"]
+    assert "modified by another request" in detail["message"]
+    assert detail["current"]["version"] == order["version"] + 1
+    assert detail["current"]["priority"] == "critical"
+    assert detail["current"]["status"] == "Pending"
+
+
+def test_concurrent_write_is_detected_on_flush(order):
+    with SessionLocal() as first, SessionLocal() as second:
+        stale = first.query(Order).filter(Order.order_id == order["order_id"]).one()
+        winner = second.query(Order).filter(Order.order_id == order["order_id"]).one()
+
+        winner.status = "Processing"
+        second.commit()
+
+        stale.status = "Cancelled"
+        with pytest.raises(HTTPException) as raised:
+            flush_or_conflict(first, stale, OrderResponse)
+
+    assert raised.value.status_code == 409
+    assert raised.value.detail["current"]["status"] == "Processing"
+    assert raised.value.detail["current"]["version"] == order["version"] + 1
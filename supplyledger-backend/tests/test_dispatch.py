@@ -0,0 +1,124 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from app.dispatch import scheduler
+from app.dispatch.scheduler import plan_shipments
+
+PendingOrder = namedtuple("PendingOrder", "id order_id user_id origin destination weight priority due_date")
+
+DUE = datetime(2030, 1, 1)
+
+
+def _order(id_, weight=100, priority="medium", due_in_days=0, user_id=1, origin="Delhi", destination="Mumbai"):
+    return PendingOrder(id_, f"ORD-{id_}", user_id, origin, destination, weight, priority, DUE + timedelta(days=due_in_days))
+
+
+def _planned_ids(plans):
+    return [[order.id for order in plan.orders] for plan in plans]
+
+
+def test_every_order_is_planned_once():
+    orders = [_order(i, weight=(i * 37) % 400 + 10, destination=("Mumbai", "Pune")[i % 2]) for i in range(1, 60)]
+    plans = plan_shipments(orders, capacity_kg=500, max_orders=5)
+    planned = [order_id for ids in _planned_ids(plans) for order_id in ids]
+    assert sorted(planned) == [order.id for order in orders]
+
+
+def test_shipments_respect_capacity_and_order_limit():
+    orders = [_order(i, weight=(i * 53) % 300 + 20) for i in range(1, 40)]
+    for plan in plan_shipments(orders, capacity_kg=500, max_orders=4):
+        assert plan.weight <= 500
+        assert len(plan.orders) <= 4
+        assert plan.weight == sum(order.weight for order in plan.orders)
+
+
+def test_order_heavier_than_capacity_ships_alone():
+    plans = plan_shipments([_order(1, weight=1500), _order(2, weight=10)], capacity_kg=1000)
+    assert sorted(_planned_ids(plans)) == [[1], [2]]
+
+
+def test_lighter_orders_fill_remaining_capacity():
+    # 2 does not fit next to 1; the later, lighter 3 does
+    orders = [_order(1, weight=700, due_in_days=0), _order(2, weight=400, due_in_days=1), _order(3, weight=300, due_in_days=2)]
+    assert _planned_ids(plan_shipments(orders, capacity_kg=1000)) == [[1, 3], [2]]
+
+
+def test_orders_only_share_a_shipment_on_the_same_owner_and_lane():
+    orders = [
+        _order(1),
+        _order(2, user_id=2),
+        _order(3, destination="Pune"),
+        _order(4, origin=" delhi ", destination="MUMBAI"),
+    ]
+    plans = plan_shipments(orders)
+    assert sorted(_planned_ids(plans)) == [[1, 4], [2], [3]]
+
+
+def test_shipments_are_planned_most_urgent_first():
+    orders = [
+        _order(1, priority="low", destination="Pune"),
+        _order(2, priority="medium", due_in_days=3, destination="Agra"),
+        _order(3, priority="critical", due_in_days=9, destination="Jaipur"),
+        _order(4, priority="medium", due_in_days=1, destination="Surat"),
+        _order(5, priority="high", destination="Goa"),
+    ]
+    leads = [plan.lead.id for plan in plan_shipments(orders)]
+    assert leads == [3, 5, 4, 2, 1]
+
+
+def test_lead_is_the_most_urgent_order_on_the_lane():
+    orders = [_order(1, priority="low"), _order(2, priority="high", due_in_days=5), _order(3, priority="high")]
+    [plan] = plan_shipments(orders)
+    assert [order.id for order in plan.orders] == [3, 2, 1]
+
+
+def test_max_shipments_keeps_the_most_urgent():
+    orders = [_order(i, weight=600, priority=("low", "critical")[i % 2]) for i in range(1, 7)]
+    plans = plan_shipments(orders, capacity_kg=1000, max_shipments=3)
+    assert len(plans) == 3
+    assert all(plan.lead.priority == "critical" for plan in plans)
+
+
+def test_dispatch_consolidates_pending_orders(client, user_id):
+    order_ids = []
+    for weight in (100, 200, 300):
+        response = client.post(f"/orders/create?user_id={user_id}", json={
+            "origin": "Delhi", "destination": "Mumbai", "weight": weight,
+            "priority": "high", "due_date": "2030-01-01T00:00:00",
+        })
+        order_ids.append(response.json()["order_id"])
+
+    result = client.post("/dispatch/run").json()
+
+    assert result["shipments_created"] == 1
+    assert result["orders_dispatched"] == 3
+    [shipment] = result["shipments"]
+    assert sorted(shipment["order_ids"]) == sorted(order_ids)
+    for order_id in order_ids:
+        assert client.get(f"/orders/detail/{order_id}?user_id={user_id}").json()["status"] == "In Transit"
+        assert client.get(f"/shipments/order/{order_id}").json()["id"] == shipment["shipment_id"]
+    assert client.post("/dispatch/run").json()["shipments_created"] == 0
+
+
+def test_dispatch_survives_losing_the_lead_to_a_concurrent_claim(client, user_id, monkeypatch):
+    lead, other = (
+        client.post(f"/orders/create?user_id={user_id}", json={
+            "origin": origin, "destination": destination, "weight": 100,
+            "priority": priority, "due_date": "2030-01-01T00:00:00",
+        }).json()["order_id"]
+        for origin, destination, priority in (("Delhi", "Mumbai", "critical"), (" delhi ", "MUMBAI", "low"))
+    )
+    claim = scheduler._claim_orders
+
+    def lose_the_lead(db, ids, now):
+        # The lead was dispatched elsewhere; the promoted order spells the lane differently
+        return claim(db, ids[1:], now)
+
+    monkeypatch.setattr(scheduler, "_claim_orders", lose_the_lead)
+
+    result = client.post("/dispatch/run").json()
+
+    assert result["shipments_created"] == 1
+    [shipment] = result["shipments"]
+    assert shipment["order_ids"] == [other]
+    assert client.get(f"/orders/detail/{lead}?user_id={user_id}").json()["status"] == "Pending"
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from app.database.database import SessionLocal
+from app.database.models import Shipment
+from app.routing.eta import recompute_etas
+
+_STALE_ETA = datetime(2000, 1, 1)
+
+
+def _add_shipment(status, pinned=False):
+    with SessionLocal() as db:
+        shipment = Shipment(
+            order_id="ORD-1",
+            source="Delhi",
+            destination="Mumbai",
+            distance_km=1400,
+            status=status,
+            estimated_delivery=_STALE_ETA,
+            estimated_delivery_pinned=pinned,
+        )
+        db.add(shipment)
+        db.commit()
+        return shipment.id
+
+
+def _eta(shipment_id):
+    with SessionLocal() as db:
+        return db.get(Shipment, shipment_id).estimated_delivery
+
+
+def test_only_in_transit_etas_are_recomputed(db_engine):
+    created = _add_shipment("CREATED")
+    in_transit = _add_shipment("IN_TRANSIT")
+    delivered = _add_shipment("DELIVERED")
+
+    assert recompute_etas(["mumbai"]) == (1, 1)
+    assert _eta(in_transit) != _STALE_ETA
+    assert _eta(created) == _eta(delivered) == _STALE_ETA
+
+
+def test_client_set_eta_is_kept(client, order, db_engine):
+    shipment = client.post("/shipments/create", json={
+        "order_id": order["order_id"], "source": "Delhi", "destination": "Mumbai", "distance_km": 1400,
+    }).json()
+    client.patch(f"/shipments/{shipment['id']}/status", json={"status": "IN_TRANSIT"})
+    response = client.put(
+        f"/shipments/{shipment['id']}?user_id={order['user_id']}",
+        json={"estimated_delivery": "2030-06-01T12:00:00"}
+    )
+    assert response.status_code == 200, response.text
+
+    assert recompute_etas(["Mumbai"]) == (0, 0)
+    assert _eta(shipment["id"]) == datetime(2030, 6, 1, 12)
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from app.utils.etags import etag_matches, make_etag
+
+TAG = make_etag("order", "ORD-1", 3, datetime(2024, 1, 1))
+
+
+def test_make_etag_is_quoted_and_tracks_every_field():
+    assert TAG.startswith('"') and TAG.endswith('"')
+    assert TAG == make_etag("order", "ORD-1", 3, datetime(2024, 1, 1))
+    assert TAG != make_etag("order", "ORD-1", 4, datetime(2024, 1, 1))
+    assert TAG != make_etag("shipment", "ORD-1", 3, datetime(2024, 1, 1))
+
+
+def test_etag_matches():
+    assert etag_matches(TAG, TAG)
+    assert etag_matches(f'"other", {TAG}', TAG)
+    assert etag_matches(f"W/{TAG}", TAG)
+    assert etag_matches("*", TAG)
+    assert not etag_matches(None, TAG)
+    assert not etag_matches("", TAG)
+    assert not etag_matches('"other"', TAG)
+    assert not etag_matches(TAG.strip('"'), TAG)
+
+
+def test_order_detail_answers_304_until_the_order_changes(client, order, user_id):
+    url = f"/orders/detail/{order['order_id']}?user_id={user_id}"
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+    client.put(f"/orders/update/{order['order_id']}?user_id={user_id}", json={"status": "Processing"})
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["status"] == "Processing"
@@ -0,0 +1,104 @@
+import csv
+import io
+from datetime import datetime, timedelta
+
+import pyarrow.parquet as pq
+
+from app.bulk import exporter
+from app.database.archive import archive_finished_orders
+from app.database.database import SessionLocal
+from app.database.models import Order, Shipment
+
+LONG_AGO = datetime.utcnow() - timedelta(days=365)
+
+
+def _add_orders(user_id, *specs):
+    """Orders from (order_id, status, created_at) tuples."""
+    with SessionLocal() as db:
+        for order_id, status, created_at in specs:
+            db.add(Order(
+                order_id=order_id, user_id=user_id, origin="Delhi", destination="Mumbai", weight=10.5,
+                priority="high", status=status, value=99.5, due_date=datetime(2030, 1, 1),
+                created_at=created_at, updated_at=created_at,
+            ))
+        db.commit()
+
+
+def _csv(client, path, **params):
+    response = client.get(path, params=params)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/csv")
+    return list(csv.DictReader(io.StringIO(response.text)))
+
+
+def test_orders_csv_round_trip(client, user_id):
+    _add_orders(user_id, ("ORD-1", "Pending", datetime(2030, 1, 1, 8)), ("ORD-2", "Delivered", datetime(2030, 1, 2)))
+
+    rows = _csv(client, "/orders/export")
+
+    assert list(rows[0]) == [column.key for column in exporter.ORDER_EXPORT_COLUMNS]
+    with SessionLocal() as db:
+        orders = db.query(Order).order_by(Order.id).all()
+        assert [row["order_id"] for row in rows] == [order.order_id for order in orders]
+        for row, order in zip(rows, orders):
+            assert row["status"] == order.status
+            assert float(row["weight"]) == order.weight and float(row["value"]) == order.value
+            assert datetime.fromisoformat(row["created_at"]) == order.created_at
+
+
+def test_orders_export_filters(client, user_id):
+    _add_orders(
+        user_id,
+        ("ORD-1", "Pending", datetime(2030, 1, 1)),
+        ("ORD-2", "Delivered", datetime(2030, 1, 2)),
+        ("ORD-3", "Pending", datetime(2030, 1, 3)),
+    )
+    _add_orders(user_id + 1, ("ORD-4", "Pending", datetime(2030, 1, 1)))
+
+    def exported(**params):
+        return [row["order_id"] for row in _csv(client, "/orders/export", **params)]
+
+    assert exported(user_id=user_id) == ["ORD-1", "ORD-2", "ORD-3"]
+    assert exported(status="Pending", user_id=user_id) == ["ORD-1", "ORD-3"]
+    # date_from inclusive, date_to exclusive
+    assert exported(date_from="2030-01-02T00:00:00", date_to="2030-01-03T00:00:00") == ["ORD-2"]
+
+
+def test_shipment_export_filters_on_owner(client, order):
+    response = client.post("/shipments/create", json={
+        "order_id": order["order_id"], "source": "Delhi", "destination": "Mumbai", "distance_km": 1400,
+    })
+    shipment_id = response.json()["id"]
+
+    rows = _csv(client, "/shipments/export", user_id=order["user_id"])
+    assert [int(row["shipment_id"]) for row in rows] == [shipment_id]
+    assert _csv(client, "/shipments/export", user_id=order["user_id"] + 1) == []
+
+
+def test_include_archived(client, user_id):
+    _add_orders(user_id, ("ORD-OLD", "Delivered", LONG_AGO), ("ORD-NEW", "Pending", datetime(2030, 1, 1)))
+    with SessionLocal() as db:
+        db.add(Shipment(
+            order_id="ORD-OLD", source="Delhi", destination="Mumbai", distance_km=1400,
+            status="DELIVERED", created_at=LONG_AGO, updated_at=LONG_AGO,
+        ))
+        db.commit()
+    assert archive_finished_orders(session_factory=SessionLocal) == (1, 1)
+
+    assert [row["order_id"] for row in _csv(client, "/orders/export")] == ["ORD-NEW"]
+    # Archived rows keep their ids, so the union stays in id order
+    assert [row["order_id"] for row in _csv(client, "/orders/export", include_archived=True)] == ["ORD-OLD", "ORD-NEW"]
+    assert _csv(client, "/shipments/export") == []
+    assert [row["order_id"] for row in _csv(client, "/shipments/export", include_archived=True)] == ["ORD-OLD"]
+
+
+def test_parquet_is_written_in_row_groups(user_id):
+    _add_orders(user_id, *[(f"ORD-{i}", "Pending", datetime(2030, 1, 1, i)) for i in range(5)])
+
+    data = b"".join(exporter.export_stream(exporter.ORDERS_EXPORT, exporter.PARQUET_FORMAT, batch_size=2))
+    parquet = pq.ParquetFile(io.BytesIO(data))
+
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.column("order_id").to_pylist() == [f"ORD-{i}" for i in range(5)]
+    assert table.column("created_at").to_pylist()[4] == datetime(2030, 1, 1, 4)
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from app.utils.geohash import (
+    GEOHASH_PRECISION,
+    cover_bbox,
+    encode,
+    haversine_km,
+    haversine_matrix,
+    point_fields,
+    radius_bbox
+)
+
+
+def _covered(ranges, geohash):
+    return any(low <= geohash <= high for low, high in ranges)
+
+
+def test_encode_matches_reference_geohash():
+    assert encode(57.64911, 10.40744) == "u4pruy"
+    assert encode(57.64911, 10.40744, precision=11) == "u4pruydqqvj"
+
+
+@pytest.mark.parametrize("bbox", [
+    (28.50, 77.00, 28.80, 77.40),      # Delhi
+    (18.90, 72.80, 19.30, 73.00),      # Mumbai
+    (-0.20, -0.20, 0.20, 0.20),        # across the equator and prime meridian
+    (10.00, 70.00, 30.00, 90.00),      # wide box, coarse cells
+    (12.97, 77.59, 12.97, 77.59),      # single point
+])
+def test_cover_bbox_contains_every_point_in_the_box(bbox):
+    ranges = cover_bbox(bbox)
+    min_lat, min_lon, max_lat, max_lon = bbox
+    rng = random.Random(42)
+    points = [(min_lat, min_lon), (min_lat, max_lon), (max_lat, min_lon), (max_lat, max_lon)]
+    points += [(rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)) for _ in range(500)]
+
+    for lat, lon in points:
+        assert _covered(ranges, encode(lat, lon)), (lat, lon)
+
+
+def test_cover_bbox_ranges_are_sorted_and_bounded():
+    ranges = cover_bbox((28.50, 77.00, 28.80, 77.40), max_cells=8)
+    assert 1 <= len(ranges) <= 8
+    for low, high in ranges:
+        assert len(low) == len(high) == GEOHASH_PRECISION
+        assert low <= high
+    assert all(previous[1] < current[0] for previous, current in zip(ranges, ranges[1:]))
+
+
+def test_cover_bbox_excludes_far_away_points():
+    ranges = cover_bbox(radius_bbox(28.6139, 77.2090, 10))
+    assert not _covered(ranges, encode(19.0760, 72.8777))
+
+
+def test_radius_bbox_encloses_the_circle():
+    lat, lon, radius = 28.6139, 77.2090, 25
+    min_lat, min_lon, max_lat, max_lon = radius_bbox(lat, lon, radius)
+    for edge_lat, edge_lon in ((min_lat, lon), (max_lat, lon), (lat, min_lon), (lat, max_lon)):
+        assert haversine_km(lat, lon, [edge_lat], [edge_lon])[0] >= radius - 0.1
+
+
+def test_haversine_distances():
+    # Delhi -> Mumbai is about 1150 km great-circle
+    distance = haversine_km(28.6139, 77.2090, [19.0760], [72.8777])[0]
+    assert 1130 < distance < 1170
+
+    matrix = haversine_matrix([28.6139, 19.0760, 12.9716], [77.2090, 72.8777, 77.5946])
+    assert matrix.shape == (3, 3)
+    assert matrix[0, 1] == pytest.approx(distance)
+    assert (matrix == matrix.T).all()
+    assert (matrix.diagonal() == 0).all()
+
+
+def test_point_fields():
+    assert point_fields("origin", [77.2090, 28.6139]) == {
+        "origin_lat": 28.6139,
+        "origin_lon": 77.2090,
+        "origin_geohash": encode(28.6139, 77.2090),
+    }
+    assert point_fields("origin", None) == {"origin_lat": None, "origin_lon": None, "origin_geohash": None}
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+from app.utils.ids import (
+    is_legacy_order_id,
+    new_order_id,
+    new_ulid,
+    normalize_order_id,
+    order_id_created_at,
+    ulid_timestamp
+)
+
+
+def test_ulids_strictly_increase_within_a_process():
+    ulids = [new_ulid() for _ in range(10000)]
+    assert ulids == sorted(ulids)
+    assert len(set(ulids)) == len(ulids)
+
+
+def test_ulid_embeds_its_creation_time():
+    before = datetime.utcnow() - timedelta(milliseconds=1)
+    ulid = new_ulid()
+    after = datetime.utcnow() + timedelta(milliseconds=1)
+    assert len(ulid) == 26
+    assert before <= ulid_timestamp(ulid) <= after
+
+
+def test_historical_ulid_keeps_given_time():
+    at = datetime(2023, 5, 1, 12, 30, 15, 123000)
+    assert ulid_timestamp(new_ulid(at)) == at
+
+
+def test_order_ids_sort_by_creation_time():
+    older = new_order_id(datetime(2023, 1, 1))
+    newer = new_order_id()
+    assert older.startswith("ORD-") and newer.startswith("ORD-")
+    assert older < newer
+    assert order_id_created_at(older) == datetime(2023, 1, 1)
+
+
+def test_normalize_order_id_upper_cases_and_strips():
+    order_id = new_order_id()
+    assert normalize_order_id(f"  {order_id.lower()} ") == order_id
+
+
+def test_normalize_order_id_reads_ambiguous_crockford_letters():
+    assert normalize_order_id("ORD-0IARZ3NDEKTSV4RRFFQ69G5FAV") == "ORD-01ARZ3NDEKTSV4RRFFQ69G5FAV"
+    assert normalize_order_id("ord-0lar23ndektsv4rrffq69g5fav") == "ORD-01AR23NDEKTSV4RRFFQ69G5FAV"
+    assert normalize_order_id("ORD-O1ARZ3NDEKTSV4RRFFQ69G5FAV") == "ORD-01ARZ3NDEKTSV4RRFFQ69G5FAV"
+
+
+def test_legacy_order_ids_are_only_upper_cased():
+    assert normalize_order_id("ord-a1b2c3d4") == "ORD-A1B2C3D4"
+    assert is_legacy_order_id("ORD-A1B2C3D4")
+    assert not is_legacy_order_id(new_order_id())
+    assert order_id_created_at("ORD-A1B2C3D4") is None
@@ -0,0 +1,52 @@
+import pytest
+
+from app.analytics.lanes import ORDER_LANES, lane_tracker
+from app.database.database import SessionLocal
+from app.database.models import Order
+
+
+def _order(destination):
+    return Order(order_id=f"ORD-{destination}", user_id=1, origin="Nagpur", destination=destination, weight=1)
+
+
+def _counted(destination):
+    return lane_tracker.estimate(ORDER_LANES, "Nagpur", destination)
+
+
+def test_lanes_of_a_rolled_back_savepoint_are_not_counted(db_engine):
+    with SessionLocal() as db:
+        db.add(_order("Kochi"))
+        db.flush()
+        with pytest.raises(ValueError):
+            with db.begin_nested():
+                db.add(_order("Madurai"))
+                db.flush()
+                raise ValueError("conflict")
+        with db.begin_nested():
+            db.add(_order("Vellore"))
+        db.commit()
+
+    assert (_counted("Kochi"), _counted("Madurai"), _counted("Vellore")) == (1, 0, 1)
+
+
+def test_released_savepoint_inside_a_rolled_back_one_is_not_counted(db_engine):
+    with SessionLocal() as db:
+        db.connection()
+        with pytest.raises(ValueError):
+            with db.begin_nested():
+                with db.begin_nested():
+                    db.add(_order("Salem"))
+                raise ValueError("conflict")
+        db.commit()
+
+    assert _counted("Salem") == 0
+
+
+def test_rolled_back_session_counts_nothing(db_engine):
+    with SessionLocal() as db:
+        db.add(_order("Trichy"))
+        db.flush()
+        db.rollback()
+        db.commit()
+
+    assert _counted("Trichy") == 0
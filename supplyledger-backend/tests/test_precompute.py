@@ -0,0 +1,67 @@
+from sqlalchemy import delete, select
+
+from app.ai import precompute
+from app.ai.precompute import refresh_predictions
+from app.database.database import SessionLocal
+from app.database.models import Shipment, ShipmentPrediction
+from app.shipments import shipment_routes
+
+
+def _add_shipments(count):
+    with SessionLocal() as db:
+        shipments = [
+            Shipment(
+                order_id=f"ORD-{i}", source="Delhi", destination=f"City {i}", status="IN_TRANSIT",
+                source_coords=[77.2, 28.6], dest_coords=[72.8 + i, 19.0],
+            )
+            for i in range(count)
+        ]
+        db.add_all(shipments)
+        db.commit()
+        return [shipment.id for shipment in shipments]
+
+
+def _predicted_ids():
+    with SessionLocal() as db:
+        return sorted(db.scalars(select(ShipmentPrediction.shipment_id)))
+
+
+def test_shipment_archived_during_the_run_gets_no_prediction(db_engine, monkeypatch):
+    kept, archived = _add_shipments(2)
+
+    def predict_then_archive(*args, **kwargs):
+        # Archival deletes the shipment while its batch is being predicted
+        with SessionLocal() as db:
+            db.execute(delete(Shipment).where(Shipment.id == archived))
+            db.commit()
+        return {"delay_minutes": 5}
+
+    monkeypatch.setattr(precompute, "predict_delay", predict_then_archive)
+
+    assert refresh_predictions(session_factory=SessionLocal) == 1
+    assert _predicted_ids() == [kept]
+
+
+def test_run_deletes_orphan_predictions(db_engine, monkeypatch):
+    [kept] = _add_shipments(1)
+    with SessionLocal() as db:
+        db.add(ShipmentPrediction(shipment_id=kept + 100, prediction={"delay_minutes": 1}))
+        db.commit()
+    monkeypatch.setattr(precompute, "predict_delay", lambda *args, **kwargs: {"delay_minutes": 5})
+
+    refresh_predictions(session_factory=SessionLocal)
+
+    assert _predicted_ids() == [kept]
+
+
+def test_delay_prediction_only_stores_on_refresh(client, monkeypatch):
+    [shipment_id] = _add_shipments(1)
+    monkeypatch.setattr(shipment_routes, "predict_delay", lambda *args, **kwargs: {"delay_minutes": 7})
+
+    live = client.get(f"/shipments/{shipment_id}/predict-delay").json()
+    assert live["prediction"] == {"delay_minutes": 7} and live["cached"] is False
+    assert _predicted_ids() == []
+
+    assert client.get(f"/shipments/{shipment_id}/predict-delay?refresh=true").json()["cached"] is False
+    assert _predicted_ids() == [shipment_id]
+    assert client.get(f"/shipments/{shipment_id}/predict-delay").json()["cached"] is True
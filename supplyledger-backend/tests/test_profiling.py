@@ -0,0 +1,61 @@
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.database.profiling import QueryProfilerMiddleware, install_query_profiler, normalize_sql
+from app.monitoring.middleware import install_query_hooks
+
+
+def test_in_lists_collapse_to_one_placeholder():
+    assert normalize_sql("SELECT * FROM orders WHERE id IN (%(id_1)s, %(id_2)s)") == "SELECT * FROM orders WHERE id IN (?)"
+    assert normalize_sql("SELECT * FROM orders WHERE id IN (?, ?, ?)") == normalize_sql("SELECT * FROM orders WHERE id IN (?)")
+    assert normalize_sql("DELETE FROM shipments WHERE id IN (1, 2, 3)") == "DELETE FROM shipments WHERE id IN (?)"
+
+
+def test_literals_and_whitespace_are_normalized():
+    assert normalize_sql("SELECT *\n  FROM orders\tWHERE status = 'It''s late' AND weight > 12.5") == (
+        "SELECT * FROM orders WHERE status = ? AND weight > ?"
+    )
+    assert normalize_sql("UPDATE orders SET status=:status WHERE id = :id_1") == "UPDATE orders SET status=? WHERE id = ?"
+    # Digits inside identifiers are kept
+    assert normalize_sql("SELECT id_1 FROM orders_2026") == "SELECT id_1 FROM orders_2026"
+
+
+def _profiled_app(queries: int):
+    engine = create_engine("sqlite://")
+    install_query_hooks(engine)
+    install_query_profiler(engine)
+    app = FastAPI()
+
+    @app.get("/lookups")
+    def lookups():
+        with engine.connect() as conn:
+            for order_id in range(queries):
+                conn.execute(text("SELECT :order_id"), {"order_id": order_id})
+        return {"ok": True}
+
+    app.add_middleware(QueryProfilerMiddleware, add_headers=True, report=True)
+    return app
+
+
+def test_query_count_header(caplog):
+    client = TestClient(_profiled_app(queries=4))
+
+    with caplog.at_level(logging.WARNING, logger="app.database.profiling"):
+        response = client.get("/lookups")
+
+    assert response.status_code == 200
+    assert response.headers["X-Query-Count"] == "4"
+    assert float(response.headers["X-Query-Time-Ms"]) >= 0
+    assert "X-Commit-Count" in response.headers
+    assert "Possible N+1 on GET /lookups: 4 x SELECT ?" in caplog.text
+
+
+def test_headers_can_be_turned_off():
+    app = FastAPI()
+    app.get("/ping")(lambda: {"ok": True})
+    app.add_middleware(QueryProfilerMiddleware, add_headers=False, report=False)
+
+    assert "X-Query-Count" not in TestClient(app).get("/ping").headers
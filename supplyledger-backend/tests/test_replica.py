@@ -0,0 +1,68 @@
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from app.database import database, replica
+from app.database.replica import STICKY_COOKIE, ReplicaStickinessMiddleware
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """An app with the stickiness middleware that reports where each read went."""
+    monkeypatch.setattr(database, "read_engine", create_engine("sqlite://"))
+    monkeypatch.setattr(replica, "_recent_writers", {})
+
+    app = FastAPI()
+    app.add_middleware(ReplicaStickinessMiddleware)
+
+    @app.post("/users/{user_id}/orders")
+    def write(user_id: int, fail: bool = False):
+        if fail:
+            raise HTTPException(status_code=400, detail="rejected")
+        return {}
+
+    @app.get("/orders")
+    def read(factory=Depends(database.read_session_factory)):
+        return {"primary": factory is database.SessionLocal}
+
+    return app
+
+
+def _reads_primary(client, **params):
+    return client.get("/orders", params=params).json()["primary"]
+
+
+def test_write_sets_cookie_and_next_read_uses_primary(app):
+    client = TestClient(app)
+    assert _reads_primary(client) is False
+
+    response = client.post("/users/5/orders")
+    assert STICKY_COOKIE in response.cookies
+    assert _reads_primary(client) is True
+
+    # Another client without the cookie still reads from the replica
+    assert _reads_primary(TestClient(app)) is False
+
+
+def test_writer_user_id_is_sticky_without_the_cookie(app):
+    TestClient(app).post("/users/5/orders")
+
+    client = TestClient(app)
+    assert _reads_primary(client, user_id=5) is True
+    assert _reads_primary(client, user_id=6) is False
+
+
+def test_failed_write_is_not_sticky(app):
+    client = TestClient(app)
+    response = client.post("/users/5/orders", params={"fail": True})
+
+    assert response.status_code == 400
+    assert STICKY_COOKIE not in response.cookies
+    assert _reads_primary(client, user_id=5) is False
+
+
+def test_sticky_user_expires(app, monkeypatch):
+    replica.mark_write("5", now=0)
+    monkeypatch.setattr(replica.time, "monotonic", lambda: replica.PRIMARY_STICKY_SECONDS + 1)
+    assert replica.recently_wrote("5") is False
@@ -0,0 +1,77 @@
+from app.database.database import SessionLocal
+from app.database.models import OrderDailyRollup
+from app.dispatch.scheduler import run_dispatch
+
+
+def _rollups(user_id):
+    """{(status, priority): (order_count, total_weight)} for a user, empty rows left out."""
+    with SessionLocal() as db:
+        rows = db.query(OrderDailyRollup).filter(OrderDailyRollup.user_id == user_id)
+        return {
+            (row.status, row.priority): (row.order_count, row.total_weight)
+            for row in rows
+            if row.order_count
+        }
+
+
+def _create(client, user_id, weight=120, priority="high"):
+    response = client.post(f"/orders/create?user_id={user_id}", json={
+        "origin": "Delhi",
+        "destination": "Mumbai",
+        "weight": weight,
+        "priority": priority,
+        "due_date": "2030-01-01T00:00:00",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_created_orders_are_counted(client, user_id):
+    _create(client, user_id, weight=100)
+    _create(client, user_id, weight=50)
+    _create(client, user_id, weight=30, priority="low")
+
+    assert _rollups(user_id) == {("Pending", "high"): (2, 150), ("Pending", "low"): (1, 30)}
+    stats = client.get(f"/orders/stats/{user_id}").json()
+    assert stats["total_orders"] == 3 and stats["pending"] == 3
+
+
+def test_status_and_priority_updates_move_the_order(client, user_id, order):
+    response = client.put(
+        f"/orders/update/{order['order_id']}?user_id={user_id}",
+        json={"status": "In Transit", "priority": "critical"}
+    )
+    assert response.status_code == 200, response.text
+
+    assert _rollups(user_id) == {("In Transit", "critical"): (1, 120)}
+    assert client.get(f"/orders/stats/{user_id}").json()["in_transit"] == 1
+
+
+def test_cancelled_and_deleted_orders(client, user_id, order):
+    other = _create(client, user_id, weight=80)
+
+    assert client.put(f"/orders/cancel/{order['order_id']}?user_id={user_id}").status_code == 200
+    assert _rollups(user_id) == {("Cancelled", "high"): (1, 120), ("Pending", "high"): (1, 80)}
+
+    assert client.delete(f"/orders/delete/{other['order_id']}?user_id={user_id}").status_code == 200
+    assert _rollups(user_id) == {("Cancelled", "high"): (1, 120)}
+    assert client.get(f"/orders/stats/{user_id}").json()["total_orders"] == 1
+
+
+def test_conflicting_update_leaves_rollups_unchanged(client, user_id, order):
+    response = client.put(
+        f"/orders/update/{order['order_id']}?user_id={user_id}",
+        json={"status": "In Transit", "version": order["version"] + 1}
+    )
+    assert response.status_code == 409
+    assert _rollups(user_id) == {("Pending", "high"): (1, 120)}
+
+
+def test_dispatch_moves_orders_through_core_updates(client, user_id):
+    _create(client, user_id, weight=100)
+    _create(client, user_id, weight=60, priority="low")
+
+    result = run_dispatch()
+
+    assert result["orders_dispatched"] == 2
+    assert _rollups(user_id) == {("In Transit", "high"): (1, 100), ("In Transit", "low"): (1, 60)}
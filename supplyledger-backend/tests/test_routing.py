@@ -0,0 +1,86 @@
+import itertools
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.routing.optimizer import distance_matrix, improve, nearest_neighbour, optimize_route, path_length
+
+
+def _random_points(seed, count):
+    rng = np.random.default_rng(seed)
+    return np.column_stack((rng.uniform(70, 90, count), rng.uniform(10, 30, count))).tolist()
+
+
+def _brute_force_km(origin, stops, return_to_origin):
+    distances = distance_matrix([origin, *stops])
+    best = np.inf
+    for order in itertools.permutations(range(1, len(stops) + 1)):
+        path = [0, *order, 0] if return_to_origin else [0, *order]
+        best = min(best, path_length(distances, np.asarray(path)))
+    return best
+
+
+@pytest.mark.parametrize("return_to_origin", [False, True])
+@pytest.mark.parametrize("seed", range(5))
+def test_every_stop_is_visited_once_and_never_worse_than_nearest_neighbour(seed, return_to_origin):
+    origin, *stops = _random_points(seed, 60)
+    result = optimize_route(origin, stops, return_to_origin=return_to_origin, time_budget_ms=5000)
+
+    assert sorted(result["order"]) == list(range(len(stops)))
+    assert [leg["stop"] for leg in result["legs"]] == result["order"] + ([None] if return_to_origin else [])
+    assert result["total_distance_km"] <= result["initial_distance_km"]
+    assert result["legs"][-1]["cumulative_km"] == result["total_distance_km"]
+    assert result["converged"]
+
+
+@pytest.mark.parametrize("return_to_origin", [False, True])
+def test_small_route_is_never_shorter_than_the_optimum(return_to_origin):
+    origin, *stops = _random_points(7, 7)
+    result = optimize_route(origin, stops, return_to_origin=return_to_origin)
+    optimum = _brute_force_km(origin, stops, return_to_origin)
+    assert optimum - 0.01 <= result["total_distance_km"] <= result["initial_distance_km"]
+
+
+def test_improvement_fixes_a_nearest_neighbour_detour():
+    # Along the equator: nearest neighbour goes east first, then doubles back west
+    result = optimize_route([80, 0], [[81, 0], [78.5, 0], [83, 0]])
+    assert result["order"] == [1, 0, 2]
+    assert result["total_distance_km"] < result["initial_distance_km"]
+    assert result["total_distance_km"] == pytest.approx(_brute_force_km([80, 0], [[81, 0], [78.5, 0], [83, 0]], False), abs=0.01)
+
+
+def test_nearest_neighbour_ends_at_the_terminal():
+    distances = distance_matrix(_random_points(3, 6))
+    path = nearest_neighbour(distances, terminal=0)
+    assert path[0] == 0 and path[-1] == 0
+    assert sorted(path[1:-1]) == [1, 2, 3, 4, 5]
+
+
+def test_improve_without_time_leaves_the_path_unchanged():
+    distances = distance_matrix(_random_points(3, 6))
+    path = nearest_neighbour(distances, terminal=0)
+    improved, passes, converged = improve(distances, path, time_budget_ms=0)
+    assert improved.tolist() == path.tolist()
+    assert passes == 0 and not converged
+
+
+def test_etas_include_service_time_at_earlier_stops():
+    departure = datetime(2030, 1, 1, 8)
+    without = optimize_route([80, 0], [[81, 0], [82, 0]], departure=departure, service_minutes=0)
+    with_service = optimize_route([80, 0], [[81, 0], [82, 0]], departure=departure, service_minutes=60)
+    first, second = (leg["eta"] for leg in with_service["legs"])
+    assert first == without["legs"][0]["eta"]
+    assert (second - without["legs"][1]["eta"]).total_seconds() == 3600
+
+
+def test_optimize_endpoint_returns_every_stop(client):
+    stops = [{"city": "Mumbai"}, {"city": "Kolkata"}, {"lat": 28.4, "lon": 77.3, "name": "Depot"}]
+    response = client.post("/routing/optimize", json={"origin": {"city": "Delhi"}, "stops": stops})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert sorted(leg["stop_index"] for leg in body["legs"]) == [0, 1, 2]
+    assert body["total_distance_km"] <= body["initial_distance_km"]
+
+    unknown = client.post("/routing/optimize", json={"origin": {"city": "Delhi"}, "stops": [{"city": "Atlantis"}]})
+    assert unknown.status_code == 400
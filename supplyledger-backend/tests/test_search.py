@@ -0,0 +1,74 @@
+from datetime import datetime
+
+from app.database.database import SessionLocal
+from app.database.models import Order
+
+CREATED = datetime(2030, 1, 1)
+
+
+def _add_orders(user_id, origins, created_at=CREATED):
+    with SessionLocal() as db:
+        orders = [
+            Order(order_id=f"ORD-{origin.upper()}-{i}", user_id=user_id, origin=origin, destination="Mumbai",
+                  weight=10, value=100, status="Pending", due_date=CREATED, created_at=created_at)
+            for i, origin in enumerate(origins)
+        ]
+        db.add_all(orders)
+        db.commit()
+        return [order.order_id for order in orders]
+
+
+def _search(client, path, **params):
+    response = client.get(f"/search/{path}", params=params)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    return [row.get("order_id") or row.get("email") for row in body["results"]], body["next_cursor"]
+
+
+def test_prefix_and_contains_are_case_insensitive(client, user_id):
+    _add_orders(user_id, ["Delhi", "New Delhi", "Pune"])
+
+    assert sorted(_search(client, "orders", q="delhi", match="prefix")[0]) == ["ORD-DELHI-0"]
+    assert sorted(_search(client, "orders", q="DELHI")[0]) == ["ORD-DELHI-0", "ORD-NEW DELHI-1"]
+
+
+def test_fuzzy_falls_back_to_contains_without_pg_trgm(client, user_id):
+    _add_orders(user_id, ["Delhi", "Pune"])
+
+    assert _search(client, "orders", q="elh", match="fuzzy")[0] == ["ORD-DELHI-0"]
+    # No trigram similarity on SQLite, so a typo finds nothing
+    assert _search(client, "orders", q="dleh", match="fuzzy")[0] == []
+
+
+def test_like_wildcards_in_the_query_are_literal(client, user_id):
+    _add_orders(user_id, ["Delhi"])
+
+    assert _search(client, "orders", q="d_lhi")[0] == []
+    assert _search(client, "orders", q="%%%")[0] == []
+
+
+def test_orders_match_on_owner_email(client, user_id):
+    _add_orders(user_id, ["Delhi"])
+
+    assert _search(client, "orders", q="owner@example")[0] == ["ORD-DELHI-0"]
+    assert _search(client, "users", q="OWNER@")[0] == ["owner@example.com"]
+
+
+def test_queries_shorter_than_the_minimum_are_rejected(client):
+    assert client.get("/search/orders", params={"q": " ab "}).status_code == 400
+    assert client.get("/search/orders", params={"q": "abc", "match": "regex"}).status_code == 400
+    assert client.get("/search/orders", params={"q": "abc", "cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_cursor_pages_are_stable(client, user_id):
+    # Same created_at throughout, so pages are split on id
+    expected = list(reversed(_add_orders(user_id, ["Agra"] * 7)))
+
+    first, cursor = _search(client, "orders", q="agra", limit=3)
+    # Newer rows arriving between pages don't shift later pages
+    _add_orders(user_id, ["Agra Cantt"], created_at=datetime(2031, 1, 1))
+    second, cursor = _search(client, "orders", q="agra", limit=3, cursor=cursor)
+    third, cursor = _search(client, "orders", q="agra", limit=3, cursor=cursor)
+
+    assert first + second + third == expected
+    assert len(third) == 1 and cursor is None
@@ -0,0 +1,103 @@
+import msgpack
+import pyarrow as pa
+import pytest
+
+from app.utils.serialization import (
+    ARROW_MEDIA_TYPE,
+    JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    negotiate_media_type
+)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, JSON_MEDIA_TYPE),
+    ("", JSON_MEDIA_TYPE),
+    ("*/*", JSON_MEDIA_TYPE),
+    ("text/html", JSON_MEDIA_TYPE),
+    ("application/msgpack", MSGPACK_MEDIA_TYPE),
+    ("Application/X-MsgPack", MSGPACK_MEDIA_TYPE),
+    ("application/vnd.apache.arrow.stream", ARROW_MEDIA_TYPE),
+    # Highest q wins, whatever the order
+    ("application/json;q=0.5, application/x-msgpack", MSGPACK_MEDIA_TYPE),
+    ("application/x-msgpack;q=0.2, application/vnd.apache.arrow.stream;q=0.9", ARROW_MEDIA_TYPE),
+    ("application/x-msgpack;q=0.5, application/json", JSON_MEDIA_TYPE),
+    # Ties keep header order
+    ("application/vnd.apache.arrow.stream, application/x-msgpack", ARROW_MEDIA_TYPE),
+    # q=0 means "not acceptable"; malformed q counts as 0
+    ("application/x-msgpack;q=0, */*;q=0.1", JSON_MEDIA_TYPE),
+    ("application/x-msgpack;q=high", JSON_MEDIA_TYPE),
+    # Wildcards ranked above a binary type resolve to JSON
+    ("*/*, application/x-msgpack;q=0.9", JSON_MEDIA_TYPE),
+    ("text/plain, application/x-msgpack;q=0.9", MSGPACK_MEDIA_TYPE),
+])
+def test_negotiate_media_type(accept, expected):
+    assert negotiate_media_type(accept) == expected
+
+
+def _created_orders(client, order, count=3):
+    orders = [order]
+    for _ in range(count - 1):
+        response = client.post(f"/orders/create?user_id={order['user_id']}", json={
+            "origin": "Pune", "destination": "Agra", "weight": 40, "priority": "low", "due_date": "2030-02-01T00:00:00",
+        })
+        orders.append(response.json())
+    return orders
+
+
+def test_order_list_msgpack_matches_json(client, order):
+    _created_orders(client, order)
+    url = f"/orders/list/{order['user_id']}"
+    expected = client.get(url).json()
+
+    response = client.get(url, headers={"Accept": "application/x-msgpack"})
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    assert "Accept" in response.headers["vary"]
+    payload = msgpack.unpackb(response.content)
+
+    assert payload["user_id"] == order["user_id"]
+    assert [dict(zip(payload["columns"], row)) for row in payload["rows"]] == expected
+
+
+def test_order_list_arrow_matches_json(client, order):
+    _created_orders(client, order)
+    url = f"/orders/list/{order['user_id']}"
+    expected = client.get(url).json()
+
+    response = client.get(url, headers={"Accept": ARROW_MEDIA_TYPE})
+    assert response.headers["content-type"] == ARROW_MEDIA_TYPE
+    table = pa.ipc.open_stream(response.content).read_all()
+
+    assert table.schema.metadata[b"user_id"] == str(order["user_id"]).encode()
+    assert table.column_names == list(expected[0])
+    assert table.column("order_id").to_pylist() == [row["order_id"] for row in expected]
+    assert table.column("weight").to_pylist() == [row["weight"] for row in expected]
+    assert [value.isoformat() for value in table.column("created_at").to_pylist()] == [row["created_at"] for row in expected]
+
+
+def test_empty_order_list_arrow_keeps_schema(client, user_id):
+    response = client.get(f"/orders/list/{user_id}", headers={"Accept": ARROW_MEDIA_TYPE})
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.num_rows == 0 and "order_id" in table.column_names
+
+
+@pytest.mark.parametrize("accept", [MSGPACK_MEDIA_TYPE, ARROW_MEDIA_TYPE])
+def test_ledger_binary_round_trip(client, order, accept):
+    for _ in range(2):
+        response = client.post("/shipments/create", json={
+            "order_id": order["order_id"], "source": "Delhi", "destination": "Mumbai", "distance_km": 1400,
+        })
+        assert response.status_code == 200, response.text
+    url = f"/shipments/ledger/all-hashes/{order['order_id']}"
+    expected = client.get(url).json()
+
+    response = client.get(url, headers={"Accept": accept})
+    assert response.status_code == 200
+    if accept == MSGPACK_MEDIA_TYPE:
+        payload = msgpack.unpackb(response.content)
+        assert payload["total_shipments"] == expected["total_shipments"] == 2
+        assert [dict(zip(payload["columns"], row)) for row in payload["rows"]] == expected["shipments"]
+    else:
+        table = pa.ipc.open_stream(response.content).read_all()
+        assert table.schema.metadata[b"total_shipments"] == b"2"
+        assert table.column("blockchain_hash").to_pylist() == [row["blockchain_hash"] for row in expected["shipments"]]
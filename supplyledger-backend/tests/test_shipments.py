@@ -0,0 +1,76 @@
+import pytest
+
+from app.database.database import SessionLocal
+from app.database.models import LaneRoute, Order, Shipment
+from app.routing.lane_table import build_lane_table, lookup_lane
+from app.shipments import shipment_routes
+from app.utils import city_coords
+
+
+@pytest.fixture(autouse=True)
+def no_geocoding(monkeypatch):
+    def geocode(city_name):
+        raise AssertionError(f"geocoded {city_name!r} on the request path")
+
+    monkeypatch.setattr(city_coords, "_get_from_nominatim", geocode)
+
+
+def _create_shipment(client, order, **fields):
+    response = client.post("/shipments/create", json={"order_id": order["order_id"], **fields})
+    assert response.status_code == 200, response.text
+    with SessionLocal() as db:
+        return db.get(Shipment, response.json()["id"])
+
+
+def test_shipment_on_a_known_lane_takes_its_coordinates(client, order):
+    with SessionLocal() as db:
+        db.add(LaneRoute(
+            origin="nashik", destination="surat", distance_km=250, duration_min=300, source="haversine",
+            origin_coords=[73.79, 19.99], destination_coords=[72.83, 21.17],
+        ))
+        db.commit()
+
+    shipment = _create_shipment(client, order, source="Nashik", destination="Surat")
+
+    assert shipment.distance_km == 250
+    assert shipment.source_coords == [73.79, 19.99]
+    assert shipment.dest_coords == [72.83, 21.17]
+
+
+def test_shipment_without_a_lane_uses_local_coordinates(client, order):
+    shipment = _create_shipment(client, order, source="Delhi", destination="Mumbai")
+
+    assert shipment.source_coords == city_coords.CITY_COORDINATES["delhi"]
+    assert shipment.dest_coords == city_coords.CITY_COORDINATES["mumbai"]
+    assert shipment.distance_km > 0
+
+
+def test_unknown_cities_are_not_geocoded(client, order):
+    shipment = _create_shipment(client, order, source="Nashik", destination="Surat", distance_km=250)
+    assert shipment.source_coords is None and shipment.dest_coords is None
+
+    response = client.post("/shipments/create", json={"order_id": order["order_id"], "source": "Nashik", "destination": "Surat"})
+    assert response.status_code == 400
+
+
+def test_lane_table_keeps_city_coordinates(db_engine):
+    with SessionLocal() as db:
+        build_lane_table(db, offline=True)
+        lane = lookup_lane(db, "Delhi", "Mumbai")
+
+    assert lane.origin_coords == city_coords.CITY_COORDINATES["delhi"]
+    assert lane.destination_coords == city_coords.CITY_COORDINATES["mumbai"]
+
+
+def test_order_status_conflict_rolls_back_the_shipment_update(client, order, user_id, monkeypatch):
+    shipment = _create_shipment(client, order, source="Delhi", destination="Mumbai")
+    # As if the order changed underneath on every attempt
+    monkeypatch.setattr(shipment_routes, "retry_on_conflict", lambda db, apply: False)
+
+    response = client.put(f"/shipments/{shipment.id}?user_id={user_id}", json={"status": "DELIVERED"})
+
+    assert response.status_code == 409
+    assert "orders kept changing" in response.json()["detail"]["message"]
+    with SessionLocal() as db:
+        assert db.get(Shipment, shipment.id).status == "CREATED"
+        assert db.get(Order, order["id"]).status == "In Transit"
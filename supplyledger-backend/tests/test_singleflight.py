@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def _wait_for_callers(flight, key, count):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        with flight._lock:
+            call = flight._calls.get(key)
+            if call is not None and call.callers == count:
+                return
+        time.sleep(0.005)
+    raise AssertionError(f"{count} callers never joined the call")
+
+
+def _run_concurrently(flight, key, func):
+    """Start CALLERS threads on flight.do(key, func) and wait until all share one call; returns join()."""
+    outcomes = [None] * CALLERS
+
+    def call(index):
+        try:
+            outcomes[index] = ("result", flight.do(key, func))
+        except Exception as e:
+            outcomes[index] = ("error", e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    _wait_for_callers(flight, key, CALLERS)
+
+    def join():
+        for thread in threads:
+            thread.join(timeout=5)
+        return outcomes
+
+    return join
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    runs = []
+
+    def compute():
+        runs.append(1)
+        release.wait(timeout=5)
+        return {"distance_km": 1400}
+
+    join = _run_concurrently(flight, "lane", compute)
+    release.set()
+    outcomes = join()
+
+    assert len(runs) == 1
+    results = [value for kind, value in outcomes if kind == "result"]
+    assert len(results) == CALLERS
+    assert all(result is results[0] for result in results)
+
+
+def test_leader_exception_reaches_every_waiter():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def fail():
+        release.wait(timeout=5)
+        raise RuntimeError("upstream down")
+
+    join = _run_concurrently(flight, "lane", fail)
+    release.set()
+    outcomes = join()
+
+    assert [kind for kind, _ in outcomes] == ["error"] * CALLERS
+    assert all(str(error) == "upstream down" for _, error in outcomes)
+
+
+def test_key_is_released_after_the_call():
+    flight = SingleFlight("test")
+    counter = iter(range(10))
+
+    assert flight.do("lane", lambda: next(counter)) == 0
+    assert flight.do("lane", lambda: next(counter)) == 1
+    with pytest.raises(ValueError):
+        flight.do("lane", lambda: int("not a number"))
+    assert flight.do("lane", lambda: next(counter)) == 2
+    assert flight._calls == {}
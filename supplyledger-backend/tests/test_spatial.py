@@ -0,0 +1,53 @@
+import random
+
+from sqlalchemy import event
+
+from app.database.database import SessionLocal
+from app.database.models import Shipment
+from app.spatial import spatial_service
+from app.spatial.spatial_service import find_nearby
+from app.utils.geohash import haversine_km, point_fields
+
+_CENTER = (19.07, 72.88)   # Mumbai
+
+
+def _add_shipments(points):
+    with SessionLocal() as db:
+        for lat, lon in points:
+            db.add(Shipment(order_id="ORD-1", status="IN_TRANSIT", **point_fields("dest", [lon, lat])))
+        db.commit()
+
+
+def test_nearby_returns_the_nearest_without_reading_the_whole_box(db_engine, monkeypatch):
+    rng = random.Random(7)
+    points = [(_CENTER[0] + rng.uniform(-3, 3), _CENTER[1] + rng.uniform(-3, 3)) for _ in range(300)]
+    _add_shipments(points)
+    distances = sorted(float(haversine_km(*_CENTER, [lat], [lon])[0]) for lat, lon in points)
+
+    fetched = []
+
+    def count_rows(conn, cursor, statement, parameters, context, executemany):
+        if "ORDER BY" in statement:
+            fetched.append(statement)
+
+    monkeypatch.setattr(spatial_service, "SPATIAL_CANDIDATE_FACTOR", 2)
+    event.listen(db_engine, "after_cursor_execute", count_rows)
+    try:
+        with SessionLocal() as db:
+            matches = find_nearby(db, Shipment, "dest", *_CENTER, radius_km=400, limit=10)
+    finally:
+        event.remove(db_engine, "after_cursor_execute", count_rows)
+
+    assert [round(distance, 6) for _, distance in matches] == [round(d, 6) for d in distances[:10]]
+    # Candidates are ranked and capped by the database
+    assert len(fetched) == 1 and "LIMIT" in fetched[0]
+
+
+def test_nearby_drops_candidates_outside_the_radius(db_engine):
+    # Box corner: inside the bounding box, outside the circle
+    _add_shipments([(_CENTER[0] + 0.4, _CENTER[1] + 0.4), (_CENTER[0] + 0.1, _CENTER[1])])
+
+    with SessionLocal() as db:
+        matches = find_nearby(db, Shipment, "dest", *_CENTER, radius_km=50, limit=10)
+
+    assert len(matches) == 1 and matches[0][1] < 12
@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.database.database import SessionLocal
+from app.database.models import JobRun, LaneSpeedProfile
+from app.routing import speed_profiles as module
+from app.routing.speed_profiles import HOURS_PER_WEEK, refresh_speed_profiles, speed_profiles
+
+
+@pytest.fixture
+def published(db_engine, monkeypatch):
+    events = []
+    monkeypatch.setattr(module, "publish", lambda event, **payload: events.append(payload))
+    yield events
+    speed_profiles.load()
+
+
+def _store_profile(updated_at):
+    with SessionLocal() as db:
+        db.add(LaneSpeedProfile(
+            lane="delhi|mumbai",
+            distance_km=1400,
+            base_duration_min=1500,
+            factors=np.zeros(HOURS_PER_WEEK, dtype=np.float32).tobytes(),
+            sample_count=30,
+            updated_at=updated_at,
+        ))
+        db.commit()
+
+
+def _mark_rebuilt(finished_at):
+    with SessionLocal() as db:
+        db.add(JobRun(job=module.SPEED_PROFILE_JOB, finished_at=finished_at))
+        db.commit()
+
+
+def test_recent_rebuild_elsewhere_is_only_reloaded(published):
+    _store_profile(datetime.utcnow() - timedelta(days=7))
+    _mark_rebuilt(datetime.utcnow())
+
+    assert refresh_speed_profiles(interval_seconds=3600) is False
+    assert published == []
+    assert speed_profiles.lanes() == ["delhi|mumbai"]
+
+
+def test_due_rebuild_is_announced(published):
+    _store_profile(datetime.utcnow() - timedelta(hours=2))
+    _mark_rebuilt(datetime.utcnow() - timedelta(hours=2))
+
+    assert refresh_speed_profiles(interval_seconds=3600) is True
+    # No deliveries to learn from, so the stale profile is gone
+    assert published == [{"lanes": []}]
+    assert speed_profiles.lanes() == []
+
+
+def test_rebuild_without_qualifying_lanes_still_counts(published):
+    # No deliveries, so the rebuild stores no profiles at all
+    assert refresh_speed_profiles(interval_seconds=3600) is True
+    assert refresh_speed_profiles(interval_seconds=3600) is False
+    assert published == [{"lanes": []}]
+
+
+def test_worker_without_the_lock_only_reloads(published, monkeypatch):
+    @contextmanager
+    def held_elsewhere(bind, key):
+        yield False
+
+    monkeypatch.setattr(module, "advisory_lock", held_elsewhere)
+    _store_profile(datetime.utcnow() - timedelta(hours=2))
+
+    assert refresh_speed_profiles(interval_seconds=3600) is False
+    assert published == []
+    assert speed_profiles.lanes() == ["delhi|mumbai"]
@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from app.database.database import SessionLocal
+from app.database.models import CityWeatherFactor
+from app.utils import weather as module
+from app.utils.events import WEATHER_FACTOR_CHANGED, event_bus
+
+
+class _Response:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"weather": [{"main": "Rain"}]}
+
+
+@pytest.fixture
+def changes(db_engine, monkeypatch):
+    """WEATHER_FACTOR_CHANGED payloads; other events go to the real bus."""
+    events = []
+
+    def publish(topic, **payload):
+        if topic == WEATHER_FACTOR_CHANGED:
+            events.append(payload)
+        else:
+            event_bus.publish(topic, **payload)
+
+    monkeypatch.setattr(module, "publish", publish)
+    monkeypatch.setattr(module.requests, "get", lambda url, timeout: _Response())
+    module.weather_breaker.reset()
+    return events
+
+
+def test_reading_is_stored_by_the_event_bus_thread(changes, monkeypatch):
+    threads = []
+    store_factor = module._store_factor
+
+    def recording_store_factor(key, factor):
+        threads.append(threading.current_thread().name)
+        return store_factor(key, factor)
+
+    monkeypatch.setattr(module, "_store_factor", recording_store_factor)
+
+    assert module.fetch_weather_factor("Pune") == (0.15, module.WEATHER_SOURCE_LIVE)
+    event_bus.flush()
+
+    assert threads == ["event-bus"]
+    with SessionLocal() as db:
+        assert db.query(CityWeatherFactor.city, CityWeatherFactor.factor).all() == [("pune", 0.15)]
+    assert changes == [{"city": "pune", "factor": 0.15, "previous": 0.0}]
+
+
+def test_unchanged_reading_is_not_announced(changes):
+    module.fetch_weather_factor("Pune")
+    event_bus.flush()
+    module.fetch_weather_factor("Pune")
+    event_bus.flush()
+
+    assert len(changes) == 1